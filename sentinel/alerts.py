@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Despacho de alertas - Sentinel Dashboard
+Escalado programado, deduplicación, envío por lotes y conexiones reutilizadas
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import smtplib
+import ssl
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEDUPE_WINDOW = 600
+DEFAULT_BATCH_WINDOW = 2.0
+DEFAULT_MAX_PER_HOUR = 50
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_DIGEST_THRESHOLD = 10
+DEFAULT_MAX_CONNECTIONS = 10
+
+SEVERITY_ORDER = ("critical", "high", "medium", "low")
+# Severidades que se aceptan aunque se haya alcanzado max_pending
+PRIORITY_SEVERITIES = ("critical", "high")
+
+
+def fingerprint(alert: Dict) -> Tuple:
+    """Clave de deduplicación: alertas idénticas comparten huella"""
+    return (alert.get("severity"), alert.get("type"), alert.get("source_ip"), alert.get("description"))
+
+
+def format_alert(alert: Dict) -> str:
+    repeat = f" (x{alert['count']})" if alert.get("count", 1) > 1 else ""
+    return (f"[{alert.get('severity', '?').upper()}] {alert.get('type', 'alerta')} "
+            f"{alert.get('source_ip') or ''}: {alert.get('description', '')}{repeat}")
+
+
+class WebhookChannel:
+    """POST JSON por lote sobre un cliente HTTP con keep-alive"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10, retries: int = 3,
+                 headers: Optional[Dict] = None, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.url = url
+        self.retries = retries
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            headers=headers or {},
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+
+    async def send(self, alerts: List[Dict]):
+        payload = {
+            "text": "\n".join(format_alert(a) for a in alerts),
+            "alerts": alerts,
+        }
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.post(self.url, json=payload)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = str(e) or e.__class__.__name__
+            if attempt < self.retries:
+                await asyncio.sleep(min(2 ** attempt * 0.5, 30))
+        raise RuntimeError(f"Webhook falló tras {self.retries + 1} intentos: {error}")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class EmailChannel:
+    """Correo SMTP con una sola sesión por lote (en un hilo)"""
+
+    name = "email"
+
+    def __init__(self, email_config: Dict, digest_threshold: int = DEFAULT_DIGEST_THRESHOLD):
+        self.config = email_config
+        self.digest_threshold = digest_threshold
+
+    def _messages(self, alerts: List[Dict]) -> List[EmailMessage]:
+        prefix = self.config.get("subject_prefix", "[SENTINEL]")
+        # Una tormenta de alertas se resume en un único mensaje
+        if len(alerts) > self.digest_threshold:
+            groups = [(f"{prefix} {len(alerts)} alertas", alerts)]
+        else:
+            groups = [(f"{prefix} {format_alert(a)[:150]}", [a]) for a in alerts]
+        messages = []
+        for subject, group in groups:
+            message = EmailMessage()
+            message["Subject"] = subject
+            message["From"] = self.config.get("from_address", "sentinel@localhost")
+            message["To"] = ", ".join(self.config.get("to_addresses", []))
+            message.set_content("\n".join(format_alert(a) for a in group))
+            messages.append(message)
+        return messages
+
+    def _send_sync(self, alerts: List[Dict]):
+        config = self.config
+        with smtplib.SMTP(config.get("smtp_server", "localhost"), config.get("smtp_port", 25),
+                          timeout=config.get("timeout", 30)) as smtp:
+            if config.get("use_tls", False):
+                smtp.starttls(context=ssl.create_default_context())
+            password = config.get("password")
+            if config.get("username") and password and not password.startswith("${"):
+                smtp.login(config["username"], password)
+            for message in self._messages(alerts):
+                smtp.send_message(message)
+
+    async def send(self, alerts: List[Dict]):
+        await asyncio.to_thread(self._send_sync, alerts)
+
+    async def close(self):
+        pass
+
+
+class SmsChannel:
+    """SMS vía API de Twilio: un resumen por lote y destinatario"""
+
+    name = "sms"
+
+    def __init__(self, sms_config: Dict, timeout: float = 10):
+        self.config = sms_config
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            auth=(sms_config.get("account_sid", ""), sms_config.get("auth_token", "")),
+        )
+
+    async def send(self, alerts: List[Dict]):
+        url = (f"https://api.twilio.com/2010-04-01/Accounts/"
+               f"{self.config.get('account_sid', '')}/Messages.json")
+        body = format_alert(alerts[0]) if len(alerts) == 1 else f"Sentinel: {len(alerts)} alertas"
+        for number in self.config.get("to_numbers", []):
+            response = await self.client.post(url, data={
+                "From": self.config.get("from_number", ""), "To": number, "Body": body[:320],
+            })
+            response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class DashboardChannel:
+    """Publicación en los clientes WebSocket conectados"""
+
+    name = "dashboard"
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    async def send(self, alerts: List[Dict]):
+        self.hub.publish({"type": "alerts", "alerts": alerts, "timestamp": time.time()})
+
+    async def close(self):
+        pass
+
+
+class AlertDispatcher:
+    """Programador de escalado con deduplicación, coalescencia y límite horario"""
+
+    def __init__(self, rules: Dict[str, Dict], channels: Dict[str, object],
+                 dedupe_window: float = DEFAULT_DEDUPE_WINDOW,
+                 batch_window: float = DEFAULT_BATCH_WINDOW,
+                 max_per_hour: int = DEFAULT_MAX_PER_HOUR,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        self.rules = rules
+        self.channels = channels
+        self.dedupe_window = dedupe_window
+        self.batch_window = batch_window
+        self.max_per_hour = max_per_hour
+        self.max_pending = max_pending
+        self._heap: List[Tuple[float, int, Tuple]] = []
+        # huella -> (secuencia de su entrada en el montículo, alerta)
+        self._pending: Dict[Tuple, Tuple[int, Dict]] = {}
+        self._recent: Dict[Tuple, float] = {}
+        self._sent_times: deque = deque()
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {"submitted": 0, "coalesced": 0, "suppressed": 0,
+                      "rate_limited": 0, "dropped": 0, "sent": 0, "failed": 0, "batches": 0}
+
+    @classmethod
+    def from_config(cls, alerts_config: Dict, security_config: Dict, hub=None) -> "AlertDispatcher":
+        """Crear el despachador a partir de `alerts` y `security.max_alerts_per_hour`"""
+        channels = {}
+        webhook = alerts_config.get("webhook", {})
+        if webhook.get("enabled", False):
+            channels["webhook"] = WebhookChannel(
+                webhook["url"], webhook.get("timeout", 10), webhook.get("retries", 3),
+                webhook.get("headers"), webhook.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+            )
+        email = alerts_config.get("email", {})
+        if email.get("enabled", False):
+            channels["email"] = EmailChannel(email)
+        sms = alerts_config.get("sms", {})
+        if sms.get("enabled", False):
+            channels["sms"] = SmsChannel(sms)
+        if hub is not None:
+            channels["dashboard"] = DashboardChannel(hub)
+        return cls(
+            alerts_config.get("escalation_rules", {}),
+            channels,
+            dedupe_window=alerts_config.get("dedupe_window_minutes", DEFAULT_DEDUPE_WINDOW / 60) * 60,
+            batch_window=alerts_config.get("batch_window_seconds", DEFAULT_BATCH_WINDOW),
+            max_per_hour=security_config.get("max_alerts_per_hour", DEFAULT_MAX_PER_HOUR),
+            max_pending=alerts_config.get("max_pending", DEFAULT_MAX_PENDING),
+        )
+
+    def _delay(self, severity: str) -> float:
+        rule = self.rules.get(severity, {})
+        if rule.get("immediate", False):
+            return 0.0
+        return rule.get("delay_minutes", 0) * 60
+
+    def submit(self, alert: Dict, now: Optional[float] = None) -> bool:
+        """Encolar una alerta sin bloquear; devuelve False si se fusionó o suprimió"""
+        now = time.time() if now is None else now
+        self.stats["submitted"] += 1
+        key = fingerprint(alert)
+
+        entry = self._pending.get(key)
+        if entry is not None:
+            pending = entry[1]
+            pending["count"] += 1
+            pending["last_seen"] = now
+            self.stats["coalesced"] += 1
+            return False
+
+        last_sent = self._recent.get(key)
+        if last_sent is not None and now - last_sent < self.dedupe_window:
+            self.stats["suppressed"] += 1
+            return False
+
+        # Cola llena (p. ej. un barrido con huellas distintas): solo entran las graves
+        if len(self._pending) >= self.max_pending and \
+                alert.get("severity") not in PRIORITY_SEVERITIES:
+            self.stats["dropped"] += 1
+            return False
+
+        seq = next(self._seq)
+        self._pending[key] = (seq, dict(alert, count=1, first_seen=now, last_seen=now))
+        heapq.heappush(self._heap, (now + self._delay(alert.get("severity")), seq, key))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def submit_many(self, alerts: List[Dict]) -> int:
+        return sum(self.submit(alert) for alert in alerts)
+
+    def resolve(self, alert: Dict) -> bool:
+        """Cancelar una alerta aún no escalada (su entrada del montículo queda huérfana)"""
+        if self._pending.pop(fingerprint(alert), None) is None:
+            return False
+        if len(self._heap) > 2 * max(len(self._pending), self.max_pending):
+            # Demasiadas entradas huérfanas: reconstruir el montículo con las vigentes
+            pending = self._pending
+            self._heap = [item for item in self._heap
+                          if item[2] in pending and pending[item[2]][0] == item[1]]
+            heapq.heapify(self._heap)
+        return True
+
+    def _take_due(self, now: float) -> List[Dict]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._pending.get(key)
+            # Una entrada de una alerta resuelta y vuelta a enviar no la adelanta
+            if entry is None or entry[0] != seq:
+                continue
+            del self._pending[key]
+            self._recent[key] = now
+            due.append(entry[1])
+        return due
+
+    def _apply_rate_limit(self, alerts: List[Dict], now: float) -> List[Dict]:
+        """Respetar max_alerts_per_hour priorizando las más graves"""
+        sent_times = self._sent_times
+        while sent_times and now - sent_times[0] >= 3600:
+            sent_times.popleft()
+        room = max(0, self.max_per_hour - len(sent_times))
+        if len(alerts) > room:
+            alerts = sorted(alerts, key=lambda a: SEVERITY_ORDER.index(a.get("severity"))
+                            if a.get("severity") in SEVERITY_ORDER else len(SEVERITY_ORDER))
+            self.stats["rate_limited"] += len(alerts) - room
+            alerts = alerts[:room]
+        sent_times.extend([now] * len(alerts))
+        return alerts
+
+    def _expire_recent(self, now: float):
+        if len(self._recent) > 10000:
+            self._recent = {k: t for k, t in self._recent.items() if now - t < self.dedupe_window}
+
+    async def dispatch(self, alerts: List[Dict]):
+        """Enviar un lote por los canales de cada severidad, en paralelo"""
+        by_channel: Dict[str, List[Dict]] = {}
+        for alert in alerts:
+            for channel in self.rules.get(alert.get("severity"), {}).get("channels", []):
+                if channel in self.channels:
+                    by_channel.setdefault(channel, []).append(alert)
+        if not by_channel:
+            return
+        names = list(by_channel)
+        results = await asyncio.gather(
+            *(self.channels[name].send(by_channel[name]) for name in names),
+            return_exceptions=True,
+        )
+        self.stats["batches"] += 1
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                self.stats["failed"] += len(by_channel[name])
+                logger.error(f"Error enviando alertas por {name}: {result}")
+            else:
+                self.stats["sent"] += len(by_channel[name])
+
+    async def run(self):
+        """Bucle del programador: despierta en el próximo vencimiento o al llegar alertas"""
+        self._wakeup = asyncio.Event()
+        while True:
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+            else:
+                timeout = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._heap or self._heap[0][0] > time.time():
+                continue
+
+            # Pequeña ventana para agrupar la ráfaga en un solo lote
+            await asyncio.sleep(self.batch_window)
+            now = time.time()
+            alerts = self._apply_rate_limit(self._take_due(now), now)
+            self._expire_recent(now)
+            if alerts:
+                try:
+                    await self.dispatch(alerts)
+                except Exception as e:
+                    logger.error(f"Error despachando alertas: {e}")
+
+    async def close(self):
+        for channel in self.channels.values():
+            await channel.close()
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, pending=len(self._pending))
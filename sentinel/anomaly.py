@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Detección de anomalías - Sentinel Dashboard
+EWMA y z-score vectorizados (NumPy) sobre las series de tráfico y firewall
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("low", "medium", "high", "critical")
+DEFAULT_THRESHOLDS = {"low": 3.0, "medium": 4.5, "high": 6.0, "critical": 9.0}
+
+DEFAULT_STEP = 60
+DEFAULT_LENGTH = 1440
+
+
+class SeriesWindow:
+    """Ventana circular de buckets: una fila por bucket, una columna por serie
+
+    La matriz se guarda ordenada por tiempo para que el detector recorra
+    filas contiguas sin transponer.
+    """
+
+    def __init__(self, step: int = DEFAULT_STEP, length: int = DEFAULT_LENGTH):
+        self.step = step
+        self.length = length
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.sums = np.zeros((length, 0), dtype=np.float64)
+        self.counts = np.zeros((length, 0), dtype=np.uint16)
+        # Inicio del bucket que ocupa cada fila (-1 = vacía)
+        self.buckets = np.full(length, -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _column(self, name: str) -> int:
+        column = self.index.get(name)
+        if column is None:
+            column = self.index[name] = len(self.names)
+            self.names.append(name)
+            capacity = self.sums.shape[1]
+            if column >= capacity:
+                # Crecer por duplicación: las series nuevas son raras
+                size = max(8, 2 * capacity)
+                sums = np.zeros((self.length, size), dtype=self.sums.dtype)
+                counts = np.zeros((self.length, size), dtype=self.counts.dtype)
+                sums[:, :capacity] = self.sums
+                counts[:, :capacity] = self.counts
+                self.sums, self.counts = sums, counts
+        return column
+
+    def _row(self, ts: float) -> Optional[int]:
+        bucket = int(ts) - int(ts) % self.step
+        row = (bucket // self.step) % self.length
+        current = self.buckets[row]
+        if bucket > current:
+            # El bucket anterior de esta fila salió de la ventana
+            self.sums[row] = 0
+            self.counts[row] = 0
+            self.buckets[row] = bucket
+        elif bucket < current:
+            return None
+        return row
+
+    def add(self, values: Dict[str, Optional[float]], ts: Optional[float] = None):
+        """Acumular un conjunto de muestras en el bucket de `ts`"""
+        row = self._row(time.time() if ts is None else ts)
+        if row is None:
+            return
+        for name, value in values.items():
+            if value is None:
+                continue
+            column = self._column(name)
+            self.sums[row, column] += value
+            self.counts[row, column] += 1
+
+    def backfill(self, rows: Iterable[Tuple[str, int, float, int]]):
+        """Cargar agregados ya calculados (serie, bucket, suma, cuenta)"""
+        for name, bucket, total, count in rows:
+            row = self._row(bucket)
+            if row is None:
+                continue
+            column = self._column(name)
+            self.sums[row, column] = total
+            self.counts[row, column] = min(count, np.iinfo(np.uint16).max)
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(series, buckets, valores buckets x series) en orden cronológico; NaN sin muestras"""
+        names = list(self.names)
+        order = np.argsort(self.buckets, kind="stable")
+        # Filas vacías o de buckets que ya quedaron fuera de la ventana
+        oldest = self.buckets.max() - self.length * self.step
+        order = order[self.buckets[order] > max(oldest, -1)]
+        columns = len(names)
+        sums = self.sums[order, :columns]
+        counts = self.counts[order, :columns]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(counts > 0, sums / counts, np.nan)
+        return names, self.buckets[order], values
+
+
+class AnomalyDetector:
+    """EWMA con línea base horaria; una pasada evalúa todas las series a la vez"""
+
+    def __init__(self, alpha: float = 0.1, variance_alpha: float = 0.02,
+                 thresholds: Optional[Dict[str, float]] = None,
+                 min_severity: str = "medium", min_samples: int = 30,
+                 min_std: float = 1.0, relative_std: float = 0.01,
+                 counters: Sequence[str] = (), max_events: int = 50):
+        self.alpha = alpha
+        # La varianza se adapta más despacio que la media: menos falsos positivos
+        self.variance_alpha = variance_alpha
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        if min_severity not in self.thresholds:
+            logger.warning(f"Severidad mínima desconocida: {min_severity}; se usa 'medium'")
+            min_severity = "medium"
+        self.min_severity = min_severity
+        self.min_samples = min_samples
+        self.min_std = min_std
+        self.relative_std = relative_std
+        # Contadores acumulados: se evalúa su incremento por bucket
+        self.counters = frozenset(counters)
+        self.max_events = max_events
+        # Media por hora del día (UTC) de cada serie
+        self.profiles: Dict[str, np.ndarray] = {}
+        self.profiled_at = 0.0
+        # Último bucket evaluado: cada bucket se juzga una sola vez
+        self.checked_until = -1
+
+    @classmethod
+    def from_config(cls, security_config: Dict) -> "AnomalyDetector":
+        """Crear el detector a partir de la sección `security`"""
+        anomaly_config = security_config.get("anomaly", {})
+        return cls(
+            alpha=anomaly_config.get("alpha", 0.1),
+            variance_alpha=anomaly_config.get("variance_alpha", 0.02),
+            thresholds=anomaly_config.get("z_thresholds"),
+            min_severity=security_config.get("threat_threshold", "medium"),
+            min_samples=anomaly_config.get("min_samples", 30),
+            min_std=anomaly_config.get("min_std", 1.0),
+            relative_std=anomaly_config.get("relative_std", 0.01),
+            counters=anomaly_config.get("counters", ()),
+            max_events=anomaly_config.get("max_events", 50),
+        )
+
+    def severity(self, z: float) -> Optional[str]:
+        """Severidad más alta cuyo umbral alcanza |z|"""
+        level = None
+        for name in SEVERITIES:
+            if abs(z) >= self.thresholds[name]:
+                level = name
+        return level
+
+    def load_profiles(self, rows: Iterable[Tuple[str, int, float, int]], now: Optional[float] = None):
+        """Perfiles desde `TimeSeriesStore.hourly_profile`; solo series con las 24 horas"""
+        partial: Dict[str, np.ndarray] = {}
+        for name, hour, mean, _count in rows:
+            profile = partial.get(name)
+            if profile is None:
+                profile = partial[name] = np.full(24, np.nan)
+            profile[int(hour)] = mean
+        self.profiles = {name: p for name, p in partial.items() if not np.isnan(p).any()}
+        self.profiled_at = time.time() if now is None else now
+
+    def _baseline(self, names: Sequence[str], buckets: np.ndarray) -> Optional[np.ndarray]:
+        if not self.profiles:
+            return None
+        table = np.zeros((24, len(names)))
+        for column, name in enumerate(names):
+            profile = self.profiles.get(name)
+            if profile is not None:
+                table[:, column] = profile
+        return table[(buckets // 3600) % 24]
+
+    def _prepare(self, names: Sequence[str], values: np.ndarray) -> np.ndarray:
+        columns = [column for column, name in enumerate(names) if name in self.counters]
+        if not columns:
+            return values
+        values = np.array(values, dtype=np.float64)
+        increments = np.diff(values[:, columns], axis=0, prepend=np.nan)
+        # Un incremento negativo es un reinicio del contador
+        increments[increments < 0] = np.nan
+        values[:, columns] = increments
+        return values
+
+    def score(self, values: np.ndarray, baseline: Optional[np.ndarray] = None,
+              start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pico de |z| por serie en los buckets [start, stop): (z, bucket, esperado)
+
+        Cada bucket se compara con la media y la varianza EWMA previas y
+        después las actualiza; el bucle recorre el tiempo y las series van en
+        paralelo. Sin pico (muestras ausentes o menos de min_samples previas)
+        z es 0 y el bucket -1.
+        """
+        samples = values - baseline if baseline is not None else values
+        stop = len(samples) if stop is None else stop
+        count = samples.shape[1]
+        absent = np.isnan(samples)
+        # Arranque en la primera muestra de cada serie
+        mean = samples[0].copy()
+        late = np.flatnonzero(absent[0])
+        if len(late):
+            first = (~absent[:, late]).argmax(axis=0)
+            mean[late] = np.nan_to_num(samples[first, late])
+        var = np.zeros(count)
+        # (1 - beta)^n: corrige el sesgo de la varianza, que arranca en 0
+        decay = np.ones(count)
+        seen = np.zeros(count)
+        alpha, beta = self.alpha, self.variance_alpha
+        peak = np.zeros(count)
+        peak_z = np.zeros(count)
+        peak_row = np.full(count, -1)
+        peak_expected = np.zeros(count)
+        std = np.empty(count)
+        z = np.empty(count)
+        magnitude = np.empty(count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for t in range(stop):
+                diff = samples[t] - mean
+                if t >= start:
+                    np.sqrt(var / (1 - decay), out=std)
+                    np.maximum(std, np.maximum(self.min_std, self.relative_std * np.abs(mean)), out=std)
+                    np.divide(diff, std, out=z)
+                    np.abs(z, out=magnitude)
+                    # NaN (muestra ausente) nunca supera al pico
+                    better = (magnitude > peak) & (seen >= self.min_samples)
+                    np.copyto(peak, magnitude, where=better)
+                    np.copyto(peak_z, z, where=better)
+                    np.copyto(peak_row, t, where=better)
+                    np.copyto(peak_expected, mean, where=better)
+                present = ~absent[t]
+                np.copyto(diff, 0.0, where=absent[t])
+                mean += alpha * diff
+                var += beta * diff * diff
+                np.multiply(var, 1 - beta, out=var, where=present)
+                np.multiply(decay, 1 - beta, out=decay, where=present)
+                seen += present
+        if baseline is not None:
+            found = peak_row >= 0
+            peak_expected[found] += baseline[peak_row[found], np.flatnonzero(found)]
+        return peak_z, peak_row, peak_expected
+
+    def detect(self, names: Sequence[str], buckets: np.ndarray, values: np.ndarray,
+               now: Optional[float] = None) -> List[Dict]:
+        """Amenazas de los buckets completos aún no evaluados (como mucho una por serie)"""
+        if not len(names) or not len(buckets):
+            return []
+        now = time.time() if now is None else now
+        step = int(buckets[-1] - buckets[-2]) if len(buckets) > 1 else DEFAULT_STEP
+        # El bucket en curso aún recibe muestras: se evalúa en la siguiente pasada
+        current = int(now) - int(now) % step
+        start = int(np.searchsorted(buckets, self.checked_until, side="right"))
+        stop = int(np.searchsorted(buckets, current, side="left"))
+        if start >= stop:
+            return []
+        values = self._prepare(names, values)
+        z, rows, expected = self.score(values, self._baseline(names, buckets), start, stop)
+        self.checked_until = int(buckets[stop - 1])
+
+        flagged = np.flatnonzero(np.abs(z) >= self.thresholds[self.min_severity])
+        flagged = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")][:self.max_events]
+        return [
+            self._event(names[column], float(values[rows[column], column]),
+                        float(expected[column]), float(z[column]), int(buckets[rows[column]]))
+            for column in flagged
+        ]
+
+    def _event(self, name: str, value: float, expected: float, z: float, bucket: int) -> Dict:
+        source_ip = None
+        if name.startswith("device."):
+            # device.<host:puerto>.<métrica>
+            target = name[len("device."):].rsplit(".", 1)[0]
+            source_ip = target.rsplit(":", 1)[0] if ":" in target else target
+        direction = "por encima" if z > 0 else "por debajo"
+        return {
+            "type": "anomaly",
+            "source_ip": source_ip,
+            "severity": self.severity(z),
+            "description": (f"Anomalía en {name}: {value:.1f}, {direction} de lo esperado "
+                            f"({expected:.1f}, z={z:+.1f})"),
+            "timestamp": datetime.fromtimestamp(bucket).isoformat(),
+        }
@@ -7,17 +7,46 @@ Desarrollado por YovoyTech SRL para BCR
 import json
 import asyncio
 import logging
+import multiprocessing
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+from discovery import SubnetScanner
+from ports import PortAuditor, summarize_audit
+from pinger import Pinger
+from cache import SnapshotStore
+from broadcast import BroadcastHub
+from storage import ROLLUP_STEPS, TimeSeriesStore, parse_duration
+from threat_intel import ThreatIntel
+from threatlog import ThreatLog
+from firewall_log import FirewallLogMonitor
+from proxy_log import ProxyLogMonitor
+from syslog_server import SyslogServer, SyslogThreatSink, relay_threats, run_worker
+from snmp import SnmpPoller, format_bps, parse_target
+from alerts import AlertDispatcher
+from inventory import DeviceInventory
+from oui import VendorIndex
+from anomaly import AnomalyDetector, SeriesWindow
+from maintenance import MaintenanceWorker, configure_logging
+from reports import ReportGenerator
+from export import (DEVICE_COLUMNS, MEDIA_TYPES, ROLLUP_COLUMNS, SAMPLE_COLUMNS,
+                    THREAT_COLUMNS, device_rows, encode, filename, time_bounds)
+from cluster import ClusterNode
+from middleware import (Compressor, CompressionMiddleware, RateLimiter,
+                        RateLimitMiddleware)
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, timed
+from serialization import (DevicesSnapshot, FastJSONResponse, NetworkStats,
+                           ThreatsSnapshot, iso_timestamp)
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,7 +57,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Sentinel Dashboard",
     description="Dashboard de Monitoreo de Red para BCR",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configurar CORS
@@ -40,9 +70,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión y limitación de peticiones (se configuran al iniciar con `performance`)
+compressor = Compressor()
+rate_limiter = RateLimiter()
+
+# Métricas internas expuestas en /metrics
+metrics = MetricsRegistry()
+HTTP_DURATION = metrics.histogram(
+    "sentinel_http_request_duration_seconds", "Latencia de los handlers HTTP", ("method", "route")
+)
+HTTP_REQUESTS = metrics.counter(
+    "sentinel_http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+SCAN_DURATION = metrics.histogram("sentinel_scan_duration_seconds", "Duración de scan_devices")
+PING_DURATION = metrics.histogram("sentinel_ping_duration_seconds", "Duración de ping_host")
+THREAT_SCAN_DURATION = metrics.histogram(
+    "sentinel_threat_scan_duration_seconds", "Duración de la pasada de detección de anomalías"
+)
+MONITOR_ITERATIONS = metrics.counter(
+    "sentinel_background_iterations_total", "Iteraciones del monitoreo de fondo", ("result",)
+)
+MONITOR_DURATION = metrics.histogram(
+    "sentinel_background_iteration_seconds", "Duración de cada iteración del monitoreo de fondo"
+)
+BROADCAST_DURATION = metrics.histogram(
+    "sentinel_broadcast_fanout_seconds", "Tiempo de reparto de una trama WebSocket",
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+
+app.add_middleware(CompressionMiddleware, compressor=compressor)
+app.add_middleware(MetricsMiddleware, duration=HTTP_DURATION, requests=HTTP_REQUESTS)
+# Añadido al final: es el más externo y descarta el exceso antes que nada
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+# Inicio del proceso (para el uptime de /health)
+started_at = time.time()
+
 # Configuración global
 config = {}
-connected_clients = set()
 
 def load_config():
     """Cargar configuración desde archivo JSON"""
@@ -66,7 +131,7 @@ class NetworkMonitor:
     """Clase para monitoreo de red"""
     
     def __init__(self):
-        self.devices = []
+        self.inventory = DeviceInventory()
         self.network_stats = {
             "packets_in": 0,
             "packets_out": 0,
@@ -75,73 +140,133 @@ class NetworkMonitor:
             "errors": 0
         }
         self.security_events = []
+        self.port_audit = {}
+        self.port_results: List[Dict] = []
+        self.auditor: Optional[PortAuditor] = None
+        self.pinger: Optional[Pinger] = None
+        self.snmp: Optional[SnmpPoller] = None
+        self.vendors: Optional[VendorIndex] = None
         
+    @property
+    def devices(self) -> List[Dict]:
+        """Lista de dispositivos conocidos"""
+        return self.inventory.devices()
+
+    @timed(SCAN_DURATION)
     async def scan_devices(self):
-        """Simular escaneo de dispositivos"""
-        import random
-        
-        # Dispositivos simulados
-        mock_devices = [
-            {
-                "ip": "192.168.1.1",
-                "mac": "00:1B:44:11:3A:B7",
-                "name": "Router Principal",
-                "type": "router",
-                "status": "online",
-                "manufacturer": "TP-Link",
-                "last_seen": datetime.now().isoformat()
-            },
-            {
-                "ip": "192.168.1.2", 
-                "mac": "00:1B:44:11:3A:B8",
-                "name": "Switch-01",
-                "type": "switch",
-                "status": "online",
-                "manufacturer": "Cisco",
-                "last_seen": datetime.now().isoformat()
-            },
-            {
-                "ip": "192.168.1.3",
-                "mac": "00:1B:44:11:3A:B9", 
-                "name": "Firewall",
-                "type": "firewall",
-                "status": "online",
-                "manufacturer": "SonicWall",
-                "last_seen": datetime.now().isoformat()
-            },
-            {
-                "ip": f"192.168.1.{random.randint(100, 200)}",
-                "mac": f"00:1B:44:11:3A:{random.randint(10, 99):02X}",
-                "name": f"PC-{random.randint(1, 50):03d}",
-                "type": "computer",
-                "status": random.choice(["online", "offline", "warning"]),
-                "manufacturer": random.choice(["Dell", "HP", "Lenovo"]),
-                "last_seen": (datetime.now() - timedelta(minutes=random.randint(0, 60))).isoformat()
-            }
-        ]
-        
-        self.devices = mock_devices
+        """Escanear las subredes configuradas y fusionar los resultados en el inventario"""
+        network_config = config.get("network", {})
+        scanner = SubnetScanner.from_config(network_config)
+        self.inventory.device_timeout = network_config.get("device_timeout", 300)
+        vendors = await self._get_vendors()
+        seen = set()
+
+        async for result in scanner.scan(network_config.get("subnet_ranges", [])):
+            if result.get("mac") and vendors is not None:
+                manufacturer = vendors.lookup(result["mac"])
+                if manufacturer:
+                    result["manufacturer"] = manufacturer
+            self.inventory.observe(result)
+            seen.add(self.inventory.lookup(result.get("mac"), result["ip"]).key)
+
+        # Los no vistos pasan a offline y, tras device_timeout, salen del inventario
+        self.inventory.expire(seen)
         return self.devices
-    
+
+    async def _get_vendors(self) -> Optional[VendorIndex]:
+        """Índice OUI compartido; se construye y mapea en un hilo la primera vez"""
+        if self.vendors is None:
+            self.vendors = VendorIndex.from_config(config.get("network", {}).get("oui", {}))
+        if not self.vendors.loaded:
+            try:
+                await asyncio.to_thread(self.vendors.load)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error cargando el índice OUI: {e}")
+                return None
+        return self.vendors
+
+    async def audit_ports(self, hosts: Optional[List[str]] = None):
+        """Auditar los puertos monitoreados en los hosts indicados"""
+        if hosts is None:
+            hosts = [r.ip_text for r in self.inventory.records.values() if r.status == "online"]
+
+        # Un solo auditor: el estimador de RTT conserva lo aprendido entre auditorías
+        if self.auditor is None:
+            self.auditor = PortAuditor.from_config(config.get("network", {}))
+        results = await self.auditor.audit(hosts)
+        self.port_results = results
+        return summarize_audit(results, hosts, len(self.auditor.ports), datetime.now().isoformat())
+
+    def port_audit_for(self, host: str) -> Dict:
+        """Resultado de la última auditoría restringido a un host"""
+        results = [r for r in self.port_results if r["host"] == host]
+        return summarize_audit(results, [host], self.port_audit.get("ports_checked", 0),
+                               self.port_audit.get("timestamp"))
+
+    def _get_pinger(self) -> Pinger:
+        """Obtener el pinger compartido (un único socket ICMP)"""
+        if self.pinger is None:
+            self.pinger = Pinger.from_config(config.get("network", {}))
+        return self.pinger
+
+    @timed(PING_DURATION)
     async def ping_host(self, host: str):
-        """Simular ping a host"""
-        import random
-        await asyncio.sleep(0.1)  # Simular latencia
-        
-        latency = random.randint(10, 150)
-        status = "online" if latency < 100 else "warning"
-        
-        return {
-            "host": host,
-            "latency": latency,
-            "status": status,
-            "timestamp": datetime.now().isoformat()
-        }
-    
+        """Hacer ping a un host (ICMP, o conexión TCP si no hay privilegios)"""
+        result = await self._get_pinger().ping(host)
+        result["timestamp"] = datetime.now().isoformat()
+        return result
+
+    async def ping_targets(self, targets: List[Dict]):
+        """Hacer ping a todos los objetivos configurados en paralelo"""
+        results = await self._get_pinger().ping_many([t["host"] for t in targets])
+        timestamp = datetime.now().isoformat()
+        for target, result in zip(targets, results):
+            result.update({
+                "name": target.get("name", target["host"]),
+                "critical": target.get("critical", False),
+                "timestamp": timestamp
+            })
+        return results
+
+    async def poll_snmp(self):
+        """Sondear por SNMP los equipos de integration.snmp.targets"""
+        snmp_config = config.get("integration", {}).get("snmp", {})
+        if self.snmp is None:
+            interval = config.get("network", {}).get("ping_interval", 10)
+            self.snmp = SnmpPoller.from_config(snmp_config, interval)
+        return await self.snmp.poll_all(snmp_config.get("targets", []))
+
+    def get_router_status(self) -> Optional[Dict]:
+        """Último sondeo SNMP del equipo con rol de router"""
+        if self.snmp is None:
+            return None
+        for target in config.get("integration", {}).get("snmp", {}).get("targets", []):
+            if isinstance(target, dict) and target.get("role") == "router":
+                host, port = parse_target(target)
+                return self.snmp.results.get(f"{host}:{port}")
+        return None
+
     def get_network_stats(self):
         """Obtener estadísticas de red"""
         import random
         
+        summary = self.snmp.summary() if self.snmp is not None else None
+        if summary and summary["online"]:
+            # Contadores reales: deltas del último intervalo de sondeo SNMP
+            totals = summary["totals"]
+            self.network_stats.update({
+                "packets_in": int(totals.get("in_packets", 0)),
+                "packets_out": int(totals.get("out_packets", 0)),
+                "bytes_in": int(totals.get("in_octets", 0)),
+                "bytes_out": int(totals.get("out_octets", 0)),
+                "errors": int(totals.get("in_errors", 0)),
+                "in_bps": round(totals.get("in_bps", 0.0), 1),
+                "out_bps": round(totals.get("out_bps", 0.0), 1),
+                "source": "snmp",
+                "timestamp": datetime.now().isoformat()
+            })
+            return self.network_stats
+        
         # Simular estadísticas en tiempo real
         self.network_stats.update({
             "packets_in": random.randint(1000, 5000),
@@ -158,50 +283,297 @@ class SecurityMonitor:
     """Clase para monitoreo de seguridad"""
     
     def __init__(self):
-        self.threats = []
+        self.threat_log = ThreatLog()
+        self.firewall_log: Optional[FirewallLogMonitor] = None
+        self.proxy_log: Optional[ProxyLogMonitor] = None
+        self.alerts: Optional[AlertDispatcher] = None
+        self.intel: Optional[ThreatIntel] = None
+        # (IP, indicador) de dispositivos ya notificados -> momento del aviso
+        self.intel_reported: Dict[Tuple[str, str], float] = {}
+        # Buckets por minuto de las series vigiladas y detector EWMA
+        self.series = SeriesWindow()
+        self.anomalies = AnomalyDetector()
         self.firewall_stats = {
             "blocked_connections": 0,
             "active_rules": 156,
             "status": "active"
         }
     
+    def configure_anomalies(self, security_config: Dict, store: TimeSeriesStore):
+        """Crear la ventana y el detector y recargar la ventana desde los agregados"""
+        anomaly_config = security_config.get("anomaly", {})
+        step = anomaly_config.get("step", 60)
+        window = parse_duration(anomaly_config.get("window", "24h"))
+        self.series = SeriesWindow(step, max(1, window // step))
+        self.anomalies = AnomalyDetector.from_config(security_config)
+        if step in ROLLUP_STEPS:
+            self.series.backfill(store.rollups(step, time.time() - window))
+    
+    @timed(THREAT_SCAN_DURATION)
+    def detect_anomalies(self, store: Optional[TimeSeriesStore] = None) -> List[Dict]:
+        """Pasada vectorizada sobre la ventana; no toca el loop (apta para un hilo)"""
+        now = time.time()
+        refresh = config.get("security", {}).get("anomaly", {}).get("profile_refresh", 3600)
+        if store is not None and now - self.anomalies.profiled_at >= refresh:
+            days = config.get("security", {}).get("anomaly", {}).get("profile_days", 7)
+            self.anomalies.load_profiles(store.hourly_profile(now - days * 86400), now)
+        names, buckets, values = self.series.snapshot()
+        return self.anomalies.detect(names, buckets, values, now)
+    
+    def match_devices(self, records: Iterable, now: Optional[float] = None) -> List[Dict]:
+        """Amenazas por dispositivos del inventario cuya IP o nombre figura en los feeds
+
+        Cada coincidencia se notifica una vez por intervalo de recarga de los
+        feeds; los avisos más antiguos caducan y la coincidencia se repite si
+        sigue vigente.
+        """
+        if self.intel is None:
+            return []
+        now = time.time() if now is None else now
+        ttl = self.intel.update_interval
+        self.intel_reported = {key: ts for key, ts in self.intel_reported.items() if now - ts < ttl}
+        threats = []
+        match = self.intel.indicators.match
+        for record in records:
+            for value in (record.ip_text, record.name):
+                found = match(value)
+                if found is not None and (record.ip_text, found[0]) not in self.intel_reported:
+                    self.intel_reported[(record.ip_text, found[0])] = now
+                    threats.append(self.intel.threat(value, found, "Dispositivo en la red"))
+        return threats
+    
+    async def record_threats(self, threats: List[Dict]):
+        """Registrar las amenazas en un hilo (la escritura no bloquea el loop) y notificarlas"""
+        if threats:
+            await asyncio.to_thread(self.threat_log.add_many, threats)
+            self.notify(threats)
+    
     def scan_threats(self):
-        """Escanear amenazas de seguridad"""
-        import random
-        
-        # Simular detección ocasional de amenazas
-        if random.random() < 0.1:  # 10% de probabilidad
-            threat = {
-                "type": random.choice(["malware", "phishing", "intrusion"]),
-                "source_ip": f"192.168.1.{random.randint(1, 254)}",
-                "severity": random.choice(["low", "medium", "high"]),
-                "description": "Actividad sospechosa detectada",
-                "timestamp": datetime.now().isoformat()
-            }
-            self.threats.append(threat)
-            
-            # Mantener solo las últimas 100 amenazas
-            if len(self.threats) > 100:
-                self.threats = self.threats[-100:]
-        
+        """Escanear amenazas de seguridad (anomalías en las series vigiladas)"""
+        threats = self.detect_anomalies()
+        if threats:
+            self.threat_log.add_many(threats)
+            self.notify(threats)
         return self.threats
     
+    def notify(self, threats: List[Dict]):
+        """Entregar amenazas al despachador de alertas (no bloquea)"""
+        if self.alerts is not None:
+            self.alerts.submit_many(threats)
+    
+    @property
+    def threats(self) -> List[Dict]:
+        """Últimas amenazas registradas"""
+        return self.threat_log.recent(100)
+    
+    def prune_threats(self):
+        """Eliminar amenazas fuera de security.alert_retention_days"""
+        retention = config.get("security", {}).get("alert_retention_days", 30)
+        return self.threat_log.prune(retention)
+    
     def get_firewall_stats(self):
         """Obtener estadísticas del firewall"""
-        import random
-        
-        self.firewall_stats.update({
-            "blocked_connections": random.randint(1000, 2000),
-            "active_rules": random.randint(150, 160),
-            "status": "active",
-            "last_update": datetime.now().isoformat()
-        })
+        firewall_log = self.firewall_log
+        if firewall_log is not None:
+            analyzer = firewall_log.analyzer
+            self.firewall_stats.update({
+                "blocked_connections": analyzer.blocked_connections,
+                "allowed_connections": analyzer.allowed_connections,
+                "log_lines": analyzer.lines,
+                "status": "active" if firewall_log.available else "log_unavailable"
+            })
         
+        self.firewall_stats["last_update"] = datetime.now().isoformat()
         return self.firewall_stats
+    
+    def get_proxy_stats(self) -> Dict:
+        """Bloqueos y caché del proxy en la ventana deslizante"""
+        if self.proxy_log is None:
+            return {"status": "disabled", "last_update": datetime.now().isoformat()}
+        stats = self.proxy_log.stats()
+        if not config.get("security", {}).get("proxy", {}).get("cache_monitoring", True):
+            stats["cache_hit_ratio"] = stats["byte_hit_ratio"] = None
+        stats["status"] = "active" if stats["available"] else "log_unavailable"
+        stats["last_update"] = datetime.now().isoformat()
+        return stats
+    
+    async def follow_proxy_log(self):
+        """Seguir el access.log del proxy (el atraso grande se reparte entre procesos)"""
+        proxy_config = config.get("security", {}).get("proxy", {})
+        self.proxy_log = await asyncio.to_thread(ProxyLogMonitor.from_config, proxy_config)
+        interval = proxy_config.get("poll_interval", 1)
+        
+        while True:
+            try:
+                await asyncio.to_thread(self.proxy_log.poll)
+            except Exception as e:
+                logger.error(f"Error leyendo log del proxy: {e}")
+            await asyncio.sleep(interval)
+    
+    async def follow_firewall_log(self):
+        """Seguir el log del firewall y registrar las amenazas detectadas"""
+        firewall_config = config.get("security", {}).get("firewall", {})
+        self.firewall_log = FirewallLogMonitor.from_config(firewall_config, intel=self.intel)
+        interval = firewall_config.get("poll_interval", 1)
+        
+        while True:
+            try:
+                threats = await asyncio.to_thread(self.firewall_log.poll)
+                await self.record_threats(threats)
+            except Exception as e:
+                logger.error(f"Error leyendo log del firewall: {e}")
+            await asyncio.sleep(interval)
 
 # Instancias globales
 network_monitor = NetworkMonitor()
 security_monitor = SecurityMonitor()
+snapshots = SnapshotStore()
+broadcast_hub = BroadcastHub()
+timeseries = TimeSeriesStore()
+syslog_server: Optional[SyslogServer] = None
+cluster: Optional[ClusterNode] = None
+reports: Optional[ReportGenerator] = None
+maintenance: Optional[MaintenanceWorker] = None
+
+# Medidores leídos en el momento de exponer /metrics
+broadcast_hub.fanout_seconds = BROADCAST_DURATION
+metrics.gauge("sentinel_devices", "Dispositivos en el inventario").set_function(
+    lambda: len(network_monitor.inventory))
+metrics.gauge("sentinel_websocket_clients", "Clientes WebSocket conectados").set_function(
+    lambda: len(broadcast_hub))
+metrics.gauge("sentinel_websocket_queued_frames", "Tramas pendientes en las colas WebSocket").set_function(
+    lambda: broadcast_hub.stats()["queued"])
+metrics.counter("sentinel_websocket_dropped_frames_total", "Tramas descartadas por clientes lentos").set_function(
+    lambda: broadcast_hub.dropped)
+metrics.gauge("sentinel_syslog_queue_depth", "Mensajes syslog en cola").set_function(
+    lambda: len(syslog_server.queue) if syslog_server is not None else 0)
+metrics.counter("sentinel_syslog_dropped_total", "Mensajes syslog descartados").set_function(
+    lambda: syslog_server.queue.dropped if syslog_server is not None else 0)
+metrics.gauge("sentinel_alerts_pending", "Alertas pendientes de escalado").set_function(
+    lambda: security_monitor.alerts.get_stats()["pending"] if security_monitor.alerts else 0)
+metrics.counter("sentinel_rate_limited_total", "Peticiones rechazadas con 429").set_function(
+    lambda: rate_limiter.rejected)
+metrics.gauge("sentinel_threats_total", "Amenazas registradas").set_function(
+    lambda: security_monitor.threat_log.total)
+
+# Series almacenadas para el historial de estadísticas
+NETWORK_SERIES = ("packets_in", "packets_out", "bytes_in", "bytes_out", "errors")
+FIREWALL_SERIES = ("blocked_connections",)
+# Contadores SNMP por equipo vigilados por el detector de anomalías
+DEVICE_SERIES = {
+    "bytes_in": "in_octets",
+    "bytes_out": "out_octets",
+    "packets_in": "in_packets",
+    "packets_out": "out_packets",
+    "errors": "in_errors",
+}
+
+def report_series(pings: List[Dict], audit: Dict) -> Dict[str, Optional[float]]:
+    """Muestras del ciclo de escaneo que alimentan los informes"""
+    records = tuple(network_monitor.inventory.records.values())
+    online = [r for r in records if r.status == "online"]
+    latencies = [r.latency for r in online if r.latency is not None]
+    values = {
+        "inventory.total": len(records),
+        "inventory.online": len(online),
+        "inventory.latency": sum(latencies) / len(latencies) if latencies else None,
+        "ports.probes": audit["probes"],
+        "ports.deviations": audit["total_deviations"],
+        "ports.critical": audit["critical_deviations"],
+    }
+    for result in pings:
+        # "warning" es latencia alta, no caída: solo "offline" cuenta como no disponible
+        values[f"ping.{result['host']}.up"] = 0.0 if result["status"] == "offline" else 1.0
+        values[f"ping.{result['host']}.latency"] = result["latency"]
+    return values
+
+def device_series(results: List[Dict]) -> Dict[str, float]:
+    """Series device.<host:puerto>.<métrica> del último sondeo SNMP"""
+    values = {}
+    for result in results:
+        # El primer sondeo de un equipo aún no tiene deltas
+        if result["status"] != "online" or not result.get("interfaces"):
+            continue
+        totals = result["totals"]
+        for metric, column in DEVICE_SERIES.items():
+            values[f"device.{result['target']}.{metric}"] = totals.get(column)
+    return values
+
+def build_devices_snapshot() -> DevicesSnapshot:
+    """Construir la instantánea de dispositivos desde la tabla en memoria"""
+    devices = tuple(network_monitor.devices)
+    return {
+        "devices": devices,
+        "version": network_monitor.inventory.version,
+        "total": len(devices),
+        "online": len([d for d in devices if d["status"] == "online"]),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def build_threats_snapshot() -> ThreatsSnapshot:
+    """Construir la instantánea de amenazas sin volver a escanear"""
+    threat_log = security_monitor.threat_log
+    return {
+        "threats": tuple(security_monitor.threats),
+        "total": threat_log.total,
+        "critical": threat_log.count(severity="high"),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def build_stats_snapshot() -> NetworkStats:
+    """Construir la instantánea de estadísticas de red"""
+    return dict(network_monitor.get_network_stats())
+
+async def leader_read(name: str, **args):
+    """Lectura del estado en memoria, que solo existe en el proceso monitor
+
+    Un seguidor del clúster la reenvía al líder; sin clúster (o en el líder)
+    se resuelve localmente con el manejador de LEADER_READS.
+    """
+    if cluster is not None and not cluster.is_leader:
+        return await cluster.request(name, args)
+    return LEADER_READS[name](**args)
+
+async def load_overview():
+    return await leader_read("overview")
+
+async def snapshot_response(key: str, loader) -> FastJSONResponse:
+    """Servir una instantánea con su cuerpo JSON ya codificado (sin jsonable_encoder)"""
+    snapshot = await snapshots.get_or_refresh(key, loader)
+    return FastJSONResponse(snapshots.encoded(key, snapshot))
+
+def publish_snapshots():
+    """Publicar las instantáneas que sirven los endpoints REST"""
+    snapshots.publish("devices", build_devices_snapshot())
+    snapshots.publish("threats", build_threats_snapshot())
+    snapshots.publish("stats", build_stats_snapshot())
+    snapshots.publish("overview", build_overview())
+
+async def run_scan_cycle():
+    """Ejecutar un ciclo completo de escaneo y publicar los resultados"""
+    await network_monitor.scan_devices()
+    
+    # Enviar a los clientes WebSocket solo lo que cambió en el inventario
+    delta = network_monitor.inventory.take_delta()
+    if delta is not None:
+        broadcast_hub.publish(dict(delta, type="device_delta"))
+    
+    # Auditar puertos de los dispositivos activos
+    network_monitor.port_audit = await network_monitor.audit_ports()
+    
+    # Historial de disponibilidad, latencia y cumplimiento para los informes
+    targets = config.get("network", {}).get("ping_targets", [])
+    pings = await network_monitor.ping_targets(targets) if targets else []
+    timeseries.record(report_series(pings, network_monitor.port_audit))
+    
+    # Detectar anomalías fuera del loop; el registro y las alertas, en el loop
+    threats = await asyncio.to_thread(security_monitor.detect_anomalies, timeseries)
+    threats += security_monitor.match_devices(network_monitor.inventory.records.values())
+    await security_monitor.record_threats(threats)
+    await asyncio.to_thread(security_monitor.prune_threats)
+    
+    publish_snapshots()
+    snapshots.publish("scan_status", {"completed_at": time.time()})
 
 # Montar archivos estáticos
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -249,42 +621,67 @@ async def dashboard():
 @app.get("/health")
 async def health_check():
     """Verificación de salud del sistema"""
-    return {
+    scan_status = snapshots.get("scan_status")
+    last_scan_age = (round(time.time() - scan_status.value["completed_at"], 1)
+                     if scan_status is not None else None)
+    return FastJSONResponse({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "version": "1.0.0",
-        "uptime": "running"
-    }
+        "uptime": round(time.time() - started_at, 1),
+        "last_scan_age": last_scan_age
+    })
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas internas en formato de exposición Prometheus"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
 @app.get("/api/overview")
 async def get_overview():
     """Obtener resumen general del sistema"""
+    return await snapshot_response("overview", load_overview)
+
+def proxy_status(stats: Dict) -> str:
+    """Estado del proxy para el resumen general"""
+    if stats["status"] == "disabled":
+        return "Desactivado"
+    if not stats["available"]:
+        return "Log no disponible"
+    return "Protegido" if stats["filtering"] else "Sin filtrado"
+
+def build_overview():
+    """Construir el resumen general a partir del último sondeo SNMP y del log del proxy"""
+    router = network_monitor.get_router_status() or {}
+    online = router.get("status") == "online"
+    totals = network_monitor.snmp.summary()["totals"] if network_monitor.snmp else {}
+    proxy = security_monitor.get_proxy_stats()
+    hit_ratio = proxy.get("cache_hit_ratio")
     return {
         "internet_status": "Conectado",
         "internet_latency": "15ms",
-        "router_status": "Operativo", 
-        "router_cpu": "25%",
-        "router_ram": "40%",
-        "proxy_status": "Protegido",
+        "router_status": "Operativo" if online else ("Sin respuesta" if router else "Desconocido"),
+        "router_cpu": f"{router['cpu']}%" if "cpu" in router else "N/D",
+        "router_ram": f"{router['ram']}%" if "ram" in router else "N/D",
+        "proxy_status": proxy_status(proxy),
+        "proxy_blocked": proxy["window"]["blocked"] if "window" in proxy else 0,
+        "proxy_cache_hit": f"{hit_ratio * 100:.1f}%" if hit_ratio is not None else "N/D",
         "threats_blocked": 247,
-        "lan_devices": f"{len(network_monitor.devices)} dispositivos",
-        "lan_traffic": "1.2 Mbps",
+        "lan_devices": f"{len(network_monitor.inventory)} dispositivos",
+        "lan_traffic": (format_bps(totals.get("in_bps", 0.0) + totals.get("out_bps", 0.0))
+                        if "in_bps" in totals else "N/D"),
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/api/network/devices")
-async def get_devices():
-    """Obtener lista de dispositivos"""
-    devices = await network_monitor.scan_devices()
-    return {
-        "devices": devices,
-        "total": len(devices),
-        "online": len([d for d in devices if d["status"] == "online"]),
-        "timestamp": datetime.now().isoformat()
-    }
+async def get_devices(since: Optional[int] = None):
+    """Obtener lista de dispositivos, o solo los cambios posteriores a `since`"""
+    if since is not None:
+        return FastJSONResponse(await leader_read("devices_since", since=since))
+    return await snapshot_response("devices", build_devices_snapshot)
 
 @app.get("/api/network/ping")
-async def ping_host(host: str):
+async def ping_host(host: Optional[str] = None):
     """Hacer ping a un host específico"""
     if not host:
         raise HTTPException(status_code=400, detail="Host parameter required")
@@ -292,54 +689,229 @@ async def ping_host(host: str):
     result = await network_monitor.ping_host(host)
     return result
 
+@app.get("/api/network/ping/batch")
+async def ping_all_targets():
+    """Hacer ping a todos los ping_targets en una sola petición"""
+    targets = config.get("network", {}).get("ping_targets", [])
+    results = await network_monitor.ping_targets(targets)
+    return {
+        "results": results,
+        "total": len(results),
+        "online": len([r for r in results if r["status"] == "online"]),
+        "critical_down": len([r for r in results if r["critical"] and r["status"] == "offline"]),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/network/ports")
+async def get_port_audit(host: Optional[str] = None):
+    """Obtener desviaciones de puertos de la última auditoría (sin sondear en la lectura)"""
+    audit = await leader_read("port_audit", host=host)
+    if audit is None:
+        # Solo hosts del inventario: el endpoint no sondea direcciones arbitrarias
+        raise HTTPException(status_code=404, detail=f"Host desconocido: {host}")
+    return audit
+
 @app.get("/api/network/stats")
 async def get_network_stats():
     """Obtener estadísticas de red"""
-    stats = network_monitor.get_network_stats()
-    return stats
+    return await snapshot_response("stats", build_stats_snapshot)
+
+@app.get("/api/network/stats/history")
+async def get_network_stats_history(timerange: Optional[str] = Query(None, alias="range"),
+                                    step: Optional[str] = None,
+                                    metrics: Optional[str] = None):
+    """Obtener el historial de estadísticas desde los agregados precalculados"""
+    dashboard_config = config.get("dashboard", {})
+    timerange = timerange or dashboard_config.get("default_timerange", "24h")
+    try:
+        range_seconds = parse_duration(timerange)
+        step_seconds = parse_duration(step) if step else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if metrics:
+        series = [m if "." in m else f"network.{m}" for m in metrics.split(",")]
+    else:
+        series = [f"network.{m}" for m in NETWORK_SERIES] + [f"firewall.{m}" for m in FIREWALL_SERIES]
+    
+    points = dashboard_config.get("chart_data_points", 50)
+    history = await asyncio.to_thread(
+        timeseries.history, series, range_seconds, points, step_seconds
+    )
+    history.update({
+        "range": timerange,
+        "timestamps": [iso_timestamp(b) for b in history.pop("buckets")],
+        "timestamp": datetime.now().isoformat()
+    })
+    return FastJSONResponse(history)
 
 @app.get("/api/security/threats")
-async def get_threats():
-    """Obtener amenazas de seguridad"""
-    threats = security_monitor.scan_threats()
-    return {
-        "threats": threats,
-        "total": len(threats),
-        "critical": len([t for t in threats if t.get("severity") == "high"]),
+async def get_threats(severity: Optional[str] = None, type: Optional[str] = None,
+                      source_ip: Optional[str] = None, since: Optional[str] = None,
+                      cursor: Optional[int] = None, limit: int = 50):
+    """Obtener amenazas de seguridad (filtradas y paginadas por cursor)"""
+    threat_log = security_monitor.threat_log
+    if not any((severity, type, source_ip, since, cursor)):
+        return await snapshot_response("threats", build_threats_snapshot)
+    
+    try:
+        page = await asyncio.to_thread(
+            threat_log.search, severity, type, source_ip, since, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "threats": page["items"],
+        "next_cursor": page["next_cursor"],
+        "total": threat_log.total,
+        "critical": threat_log.count(severity="high"),
         "timestamp": datetime.now().isoformat()
-    }
+    })
+
+@app.get("/api/export/{dataset}")
+async def export_data(dataset: str, format: str = "csv",
+                      timerange: Optional[str] = Query(None, alias="range"),
+                      since: Optional[str] = None, until: Optional[str] = None,
+                      step: Optional[str] = None, metrics: Optional[str] = None,
+                      severity: Optional[str] = None, type: Optional[str] = None,
+                      source_ip: Optional[str] = None):
+    """Exportar dispositivos, amenazas o estadísticas por partes (CSV, NDJSON o Parquet)"""
+    dashboard_config = config.get("dashboard", {})
+    if not dashboard_config.get("features", {}).get("export_data", False):
+        raise HTTPException(status_code=404, detail="Exportación deshabilitada")
+    batch_size = dashboard_config.get("export", {}).get("batch_size", 5000)
+    
+    try:
+        start, end = time_bounds(timerange, since, until)
+        if dataset == "devices":
+            columns = DEVICE_COLUMNS
+            rows = await leader_read("device_rows", since=start, until=end)
+        elif dataset == "threats":
+            columns = THREAT_COLUMNS
+            rows = security_monitor.threat_log.iter_rows(
+                start, end, severity, type, source_ip, batch_size
+            )
+        elif dataset == "stats":
+            step_seconds = parse_duration(step) if step else 0
+            if step_seconds and step_seconds not in ROLLUP_STEPS:
+                raise ValueError(f"Resolución no disponible: {step}; use 1m o 1h")
+            if metrics:
+                series = [m if "." in m else f"network.{m}" for m in metrics.split(",")]
+            else:
+                series = await asyncio.to_thread(timeseries.series_names)
+            columns = ROLLUP_COLUMNS if step_seconds else SAMPLE_COLUMNS
+            rows = timeseries.iter_rows(
+                series, start or 0, end or time.time() + 1, step_seconds, batch_size
+            )
+        else:
+            raise HTTPException(status_code=404, detail=f"Conjunto desconocido: {dataset}")
+        body = encode(format, columns, rows)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Iterador síncrono: Starlette lo consume en el pool de hilos, bloque a bloque
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers={
+        "Content-Disposition": f'attachment; filename="{filename(dataset, format)}"'
+    })
+
+@app.get("/api/reports/{period}")
+async def get_report(period: str, day: Optional[str] = Query(None, alias="date")):
+    """Informe diario o semanal de disponibilidad, latencia, amenazas y puertos"""
+    if reports is None:
+        raise HTTPException(status_code=404, detail="Informes deshabilitados")
+    try:
+        if day:
+            first_day = date.fromisoformat(day)
+        else:
+            # Por defecto el periodo que termina hoy (el día en curso no se guarda en caché)
+            first_day = date.today() - timedelta(days=6 if period == "weekly" else 0)
+        report = await reports.generate(period, first_day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(report)
 
 @app.get("/api/security/firewall")
 async def get_firewall_status():
     """Obtener estado del firewall"""
-    stats = security_monitor.get_firewall_stats()
-    return stats
+    return await leader_read("firewall_stats")
 
-@app.post("/api/network/scan")
-async def scan_network():
-    """Ejecutar escaneo manual de red"""
-    devices = await network_monitor.scan_devices()
-    threats = security_monitor.scan_threats()
+@app.get("/api/security/proxy")
+async def get_proxy_status():
+    """Obtener bloqueos, categorías y tasa de aciertos de caché del proxy"""
+    return await leader_read("proxy_stats")
+
+@app.get("/api/security/alerts")
+async def get_alert_status():
+    """Obtener contadores del despachador de alertas"""
+    return await leader_read("alert_stats")
+
+def devices_since(since: int):
+    """Cambios del inventario posteriores a la versión indicada"""
+    return dict(network_monitor.inventory.since(since), timestamp=datetime.now().isoformat())
+
+def port_audit_view(host: Optional[str] = None) -> Optional[Dict]:
+    """Última auditoría de puertos; con `host`, solo si está en el inventario (si no, None)"""
+    if host:
+        if network_monitor.inventory.lookup(ip=host) is None:
+            return None
+        return network_monitor.port_audit_for(host)
+    return network_monitor.port_audit or summarize_audit([], [], 0, datetime.now().isoformat())
+
+def alert_stats() -> Dict:
+    """Contadores del despachador de alertas"""
+    if security_monitor.alerts is None:
+        return {"enabled": False, "timestamp": datetime.now().isoformat()}
+    return dict(security_monitor.alerts.get_stats(), enabled=True,
+                timestamp=datetime.now().isoformat())
+
+def device_export_rows(since: Optional[float] = None, until: Optional[float] = None) -> List:
+    """Filas de exportación del inventario (materializadas: viajan al seguidor)"""
+    return list(device_rows(tuple(network_monitor.inventory.records.values()), since, until))
+
+# Lecturas que un seguidor del clúster reenvía al proceso monitor
+LEADER_READS = {
+    "overview": build_overview,
+    "devices_since": devices_since,
+    "device_rows": device_export_rows,
+    "port_audit": port_audit_view,
+    "firewall_stats": security_monitor.get_firewall_stats,
+    "proxy_stats": security_monitor.get_proxy_stats,
+    "alert_stats": alert_stats,
+}
+
+async def trigger_scan():
+    """Escaneo manual: varias peticiones simultáneas comparten un único barrido"""
+    await snapshots.coalesce("scan", run_scan_cycle)
+    devices = len(network_monitor.inventory)
+    threats = security_monitor.threat_log.total
     
     # Notificar a clientes WebSocket
-    if connected_clients:
-        scan_result = {
-            "type": "scan_complete",
-            "devices": len(devices),
-            "threats": len(threats),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        for client in connected_clients.copy():
-            try:
-                await client.send_text(json.dumps(scan_result))
-            except:
-                connected_clients.discard(client)
+    broadcast_hub.publish({
+        "type": "scan_complete",
+        "devices": devices,
+        "threats": threats,
+        "timestamp": datetime.now().isoformat()
+    })
     
     return {
         "status": "completed",
-        "devices_found": len(devices),
-        "threats_detected": len(threats),
+        "devices_found": devices,
+        "threats_detected": threats,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/api/network/scan")
+async def scan_network():
+    """Ejecutar escaneo manual de red"""
+    if cluster is not None and not cluster.is_leader:
+        return await cluster.request("scan")
+    return await trigger_scan()
+
+def build_network_update():
+    """Mensaje periódico de estadísticas para los clientes WebSocket"""
+    return {
+        "type": "network_update",
+        "stats": network_monitor.get_network_stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -347,74 +919,244 @@ async def scan_network():
 async def websocket_endpoint(websocket: WebSocket):
     """Endpoint WebSocket para datos en tiempo real"""
     await websocket.accept()
-    connected_clients.add(websocket)
+    
+    # Los clientes nuevos reciben de inmediato el último estado retenido
+    # (en un seguidor del clúster lo aporta el proceso monitor)
+    if "network_update" not in broadcast_hub.retained and not snapshots.read_only:
+        broadcast_hub.publish(build_network_update(), retain=True)
+    subscriber = broadcast_hub.subscribe(websocket)
     
     try:
+        # El hub se encarga de los envíos; aquí solo se detecta la desconexión
         while True:
-            # Enviar datos de red en tiempo real
-            network_data = {
-                "type": "network_update",
-                "stats": network_monitor.get_network_stats(),
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            await websocket.send_text(json.dumps(network_data))
-            await asyncio.sleep(5)  # Enviar cada 5 segundos
-            
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        connected_clients.discard(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        connected_clients.discard(websocket)
+    finally:
+        broadcast_hub.unsubscribe(subscriber)
 
 async def background_monitor():
     """Tarea de fondo para monitoreo continuo"""
     while True:
+        started = time.perf_counter()
         try:
-            # Escanear dispositivos periódicamente
-            await network_monitor.scan_devices()
-            
-            # Verificar amenazas de seguridad
-            security_monitor.scan_threats()
+            # Escanear y publicar instantáneas periódicamente
+            await snapshots.coalesce("scan", run_scan_cycle)
             
             # Notificar a clientes conectados
-            if connected_clients:
-                update_data = {
-                    "type": "periodic_update",
-                    "devices": len(network_monitor.devices),
-                    "threats": len(security_monitor.threats),
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                for client in connected_clients.copy():
-                    try:
-                        await client.send_text(json.dumps(update_data))
-                    except:
-                        connected_clients.discard(client)
+            broadcast_hub.publish({
+                "type": "periodic_update",
+                "devices": len(network_monitor.inventory),
+                "threats": security_monitor.threat_log.total,
+                "timestamp": datetime.now().isoformat()
+            })
+            MONITOR_ITERATIONS.labels("success").inc()
+            MONITOR_DURATION.observe(time.perf_counter() - started)
             
             # Esperar intervalo configurado
             interval = config.get("network", {}).get("scan_interval", 60)
             await asyncio.sleep(interval)
             
         except Exception as e:
+            MONITOR_ITERATIONS.labels("error").inc()
             logger.error(f"Error en monitoreo de fondo: {e}")
             await asyncio.sleep(10)
 
+async def stats_sampler():
+    """Registrar periódicamente las estadísticas de red y firewall"""
+    while True:
+        try:
+            stats = network_monitor.get_network_stats()
+            firewall = security_monitor.get_firewall_stats()
+            values = {f"network.{m}": stats.get(m) for m in NETWORK_SERIES}
+            values.update({f"firewall.{m}": firewall.get(m) for m in FIREWALL_SERIES})
+            snapshots.publish("stats", dict(stats))
+            # Mantiene al día los campos del proxy en todos los workers
+            snapshots.publish("overview", build_overview())
+            security_monitor.series.add(values)
+            if timeseries.record(values):
+                await timeseries.flush_async()
+        except Exception as e:
+            logger.error(f"Error registrando estadísticas: {e}")
+        
+        interval = config.get("database", {}).get("sample_interval", 10)
+        await asyncio.sleep(interval)
+
+async def snmp_monitor():
+    """Sondear los equipos SNMP una vez por ping_interval"""
+    while True:
+        interval = config.get("network", {}).get("ping_interval", 10)
+        started = asyncio.get_running_loop().time()
+        try:
+            results = await network_monitor.poll_snmp()
+            values = device_series(results)
+            security_monitor.series.add(values)
+            timeseries.record(values)
+            snapshots.publish("overview", build_overview())
+            offline = [r["target"] for r in results if r["status"] != "online"]
+            if offline:
+                logger.warning(f"SNMP sin respuesta: {', '.join(offline[:10])}")
+        except Exception as e:
+            logger.error(f"Error en sondeo SNMP: {e}")
+        elapsed = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(max(0.0, interval - elapsed))
+
+async def start_syslog_receiver():
+    """Iniciar el receptor syslog en el loop actual o en un proceso aparte"""
+    global syslog_server
+    syslog_config = config.get("integration", {}).get("syslog", {})
+    host = syslog_config.get("listen_address", "0.0.0.0")
+    port = syslog_config.get("listen_port", 514)
+    queue_size = syslog_config.get("queue_size", 100000)
+    batch_size = syslog_config.get("batch_size", 5000)
+    threat_severity = syslog_config.get("threat_severity", 3)
+    
+    if syslog_config.get("mode", "inline") == "process":
+        db_path = config.get("database", {}).get("path", "data/sentinel.db")
+        # El proceso carga sus propios feeds
+        intel_config = config.get("security", {}).get("threat_intelligence", {})
+        intel_config = intel_config if intel_config.get("enabled", False) else None
+        # Las amenazas vuelven por una cola para llegar al despachador de alertas
+        # spawn: hacer fork de un proceso con hilos (SQLite, to_thread) no es seguro
+        context = multiprocessing.get_context("spawn")
+        threat_queue = context.Queue(syslog_config.get("notify_queue_size", 1000))
+        process = context.Process(
+            target=run_worker,
+            args=(host, port, db_path, queue_size, batch_size, threat_severity, intel_config,
+                  threat_queue),
+            name="sentinel-syslog",
+            daemon=True
+        )
+        process.start()
+        asyncio.create_task(relay_threats(threat_queue, security_monitor.notify))
+        logger.info(f"Receptor syslog iniciado en proceso {process.pid}")
+        return
+    
+    server = SyslogServer(
+        SyslogThreatSink(security_monitor.threat_log, threat_severity, security_monitor.notify,
+                         security_monitor.intel),
+        queue_size, batch_size
+    )
+    try:
+        await server.start(host, port)
+    except OSError as e:
+        logger.error(f"No se pudo abrir el puerto syslog {host}:{port}: {e}")
+        return
+    syslog_server = server
+
+async def start_monitors():
+    """Lanzar las tareas de monitoreo (una sola vez en todo el despliegue)"""
+    global maintenance
+    database_config = config.get("database", {})
+    asyncio.create_task(timeseries.run_flusher(database_config.get("flush_interval", 5)))
+    security_monitor.configure_anomalies(config.get("security", {}), timeseries)
+    
+    # Feeds de indicadores (antes de los receptores que los consultan)
+    intel_config = config.get("security", {}).get("threat_intelligence", {})
+    if intel_config.get("enabled", False):
+        security_monitor.intel = ThreatIntel.from_config(intel_config)
+        asyncio.create_task(security_monitor.intel.run())
+    asyncio.create_task(stats_sampler())
+    
+    # Receptor syslog
+    if config.get("integration", {}).get("syslog", {}).get("enabled", False):
+        await start_syslog_receiver()
+    
+    # Despacho de alertas
+    alerts_config = config.get("alerts", {})
+    if alerts_config.get("enabled", False):
+        security_monitor.alerts = AlertDispatcher.from_config(
+            alerts_config, config.get("security", {}), broadcast_hub
+        )
+        asyncio.create_task(security_monitor.alerts.run())
+    
+    # Sondeo SNMP de routers y switches
+    if config.get("integration", {}).get("snmp", {}).get("enabled", False):
+        asyncio.create_task(snmp_monitor())
+    
+    # Seguir el log del firewall
+    if config.get("security", {}).get("firewall", {}).get("monitor_enabled", False):
+        asyncio.create_task(security_monitor.follow_firewall_log())
+    
+    # Seguir el log del proxy
+    if config.get("security", {}).get("proxy", {}).get("monitor_enabled", False):
+        asyncio.create_task(security_monitor.follow_proxy_log())
+    
+    # Informes programados
+    if reports is not None:
+        asyncio.create_task(reports.run())
+    
+    # Retención, compactación y copias de seguridad
+    maintenance = MaintenanceWorker.from_config(
+        timeseries, config.get("maintenance", {}), config.get("logging", {}),
+        config.get("database", {})
+    )
+    asyncio.create_task(maintenance.run())
+    
+    # Iniciar monitoreo de fondo
+    asyncio.create_task(background_monitor())
+    
+    # Difusión periódica de estadísticas a los clientes WebSocket
+    update_interval = config.get("dashboard", {}).get("websocket", {}).get("update_interval", 5)
+    asyncio.create_task(broadcast_hub.run_ticker(build_network_update, update_interval))
+
+def start_cluster(cluster_config: Dict):
+    """Unirse al clúster local: seguir al monitor elegido o asumir ese papel"""
+    global cluster
+    cluster = ClusterNode.from_config(cluster_config)
+    cluster.commands["scan"] = trigger_scan
+    cluster.commands.update(LEADER_READS)
+    cluster.on_snapshot = snapshots.publish
+    cluster.on_frame = broadcast_hub.publish_frame
+    
+    async def on_elected():
+        # El líder reenvía a los seguidores todo lo que publica
+        snapshots.read_only = False
+        snapshots.listeners.append(cluster.publish_snapshot)
+        broadcast_hub.listeners.append(cluster.publish_frame)
+        await start_monitors()
+    
+    cluster.on_elected = on_elected
+    snapshots.read_only = True
+    cluster.start()
+
 @app.on_event("startup")
 async def startup_event():
     """Eventos de inicio de la aplicación"""
+    global reports
     logger.info("🚀 Iniciando Sentinel Dashboard...")
     
     # Cargar configuración
     load_config()
+    configure_logging(config.get("logging", {}))
+    snapshots.configure(config.get("performance", {}))
+    compressor.configure(config.get("performance", {}))
+    rate_limiter.configure(config.get("performance", {}), config.get("integration", {}).get("api", {}))
     
     # Crear directorios necesarios
     os.makedirs("data", exist_ok=True)
     os.makedirs("logs", exist_ok=True)
     os.makedirs("backups", exist_ok=True)
     
-    # Iniciar monitoreo de fondo
-    asyncio.create_task(background_monitor())
+    # Abrir la base de datos (todos los procesos leen; solo el monitor escribe)
+    database_config = config.get("database", {})
+    timeseries.open(database_config.get("path", "data/sentinel.db"))
+    security_monitor.threat_log.open(database_config.get("path", "data/sentinel.db"))
+    if config.get("dashboard", {}).get("features", {}).get("reporting", False):
+        reports = ReportGenerator.from_config(
+            database_config.get("path", "data/sentinel.db"),
+            config.get("performance", {}), config.get("reporting", {})
+        )
+    broadcast_hub.configure(config.get("dashboard", {}).get("websocket", {}))
+    
+    # Con varios workers solo el proceso elegido ejecuta los monitores
+    cluster_config = config.get("application", {}).get("cluster", {})
+    if cluster_config.get("enabled", False) or os.environ.get("SENTINEL_CLUSTER") == "1":
+        start_cluster(cluster_config)
+    else:
+        await start_monitors()
     
     logger.info("✅ Sentinel Dashboard iniciado correctamente")
 
@@ -424,12 +1166,34 @@ async def shutdown_event():
     logger.info("🛑 Cerrando Sentinel Dashboard...")
     
     # Cerrar conexiones WebSocket
-    for client in connected_clients.copy():
-        try:
-            await client.close()
-        except:
-            pass
-    connected_clients.clear()
+    await broadcast_hub.close()
+    
+    # Abandonar el clúster (libera el cerrojo para otro proceso)
+    if cluster is not None:
+        await cluster.stop()
+    
+    # Cerrar los clientes de alertas
+    if security_monitor.alerts is not None:
+        await security_monitor.alerts.close()
+    
+    # Detener el receptor syslog
+    if syslog_server is not None:
+        await syslog_server.stop()
+    
+    # Detener el pool de informes
+    if reports is not None:
+        reports.close()
+    
+    # Escribir las muestras pendientes
+    await timeseries.flush_async()
+    timeseries.close()
+    security_monitor.threat_log.close()
+    
+    # Liberar los sockets ICMP y SNMP
+    if network_monitor.pinger is not None:
+        network_monitor.pinger.close()
+    if network_monitor.snmp is not None:
+        network_monitor.snmp.close()
     
     logger.info("✅ Sentinel Dashboard cerrado correctamente")
 
@@ -440,6 +1204,11 @@ if __name__ == "__main__":
     # Configuración del servidor
     host = config.get("application", {}).get("host", "0.0.0.0")
     port = config.get("application", {}).get("port", 8080)
+    workers = config.get("application", {}).get("workers", 1)
+    
+    # Con varios workers el modo clúster evita escaneos duplicados
+    if workers > 1:
+        os.environ["SENTINEL_CLUSTER"] = "1"
     
     print(f"""
     🛡️  SENTINEL DASHBOARD
@@ -459,6 +1228,7 @@ if __name__ == "__main__":
         "app:app",
         host=host,
         port=port,
-        reload=True,
+        reload=workers == 1,
+        workers=workers,
         log_level="info"
     )
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Comparador de resultados - Sentinel Dashboard
+Detecta regresiones entre dos ejecuciones de sentinel_bench.py
+
+Uso:
+    python benchmarks/compare.py baseline.json results.json --threshold 0.15
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_THRESHOLD = 0.15
+
+# Sufijos de métrica y si un valor mayor es mejor
+HIGHER_IS_BETTER = ("_per_second",)
+LOWER_IS_BETTER = ("_ms", "_bytes")
+# Métricas demasiado ruidosas para decidir una regresión por sí solas
+IGNORED = ("max_ms", "mean_ms", "peak_bytes")
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    """Aplanar los resultados anidados en claves 'escenario.métrica'"""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def direction(metric: str) -> Optional[int]:
+    """+1 si mayor es mejor, -1 si menor es mejor, None si no se compara"""
+    leaf = metric.rsplit(".", 1)[-1]
+    if leaf in IGNORED:
+        return None
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def compare(baseline: Dict, current: Dict,
+            threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[str, float, float, float, bool]]:
+    """Filas (métrica, base, actual, cambio relativo, regresión)"""
+    before = flatten(baseline.get("results", {}))
+    after = flatten(current.get("results", {}))
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        sign = direction(metric)
+        if sign is None:
+            continue
+        old, new = before[metric], after[metric]
+        if old == 0:
+            change = 0.0 if new == 0 else float("inf")
+        else:
+            change = (new - old) / abs(old)
+        # Una mejora en la dirección buena nunca es regresión
+        regression = -sign * change > threshold
+        rows.append((metric, old, new, change, regression))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar dos resultados de rendimiento")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="cambio relativo tolerado (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    rows = compare(baseline, current, args.threshold)
+
+    print(f"{baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    for metric, old, new, change, regression in rows:
+        flag = "REGRESIÓN" if regression else ""
+        print(f"{metric:60} {old:>14.3f} {new:>14.3f} {change:>+8.1%} {flag}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas de rendimiento - Sentinel Dashboard
+API REST, difusión WebSocket, motor de escaneo, detección de anomalías y memoria
+
+Uso:
+    python benchmarks/sentinel_bench.py --output results.json
+    python benchmarks/sentinel_bench.py --quick --only rest,broadcast
+    python benchmarks/sentinel_bench.py --url http://127.0.0.1:8080 --only rest
+    python benchmarks/compare.py baseline.json results.json
+"""
+
+import argparse
+import asyncio
+import gc
+import ipaddress
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+from anomaly import AnomalyDetector  # noqa: E402
+from broadcast import BroadcastHub  # noqa: E402
+from discovery import SubnetScanner  # noqa: E402
+from inventory import DeviceInventory  # noqa: E402
+from proxy_log import ProxyLogParser  # noqa: E402
+from threat_intel import IndicatorSet, parse_indicator  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+DEFAULT_ENDPOINTS = (
+    "/health",
+    "/api/overview",
+    "/api/network/devices",
+    "/api/network/stats",
+    "/api/security/threats",
+)
+
+# Tamaños completos y reducidos (--quick) de cada escenario
+PROFILES = {
+    "full": {
+        "rest_requests": 5000, "rest_concurrency": 50, "rest_devices": 1000,
+        "subscribers": (100, 1000, 5000), "broadcast_messages": 50,
+        "scan_subnet": "10.0.0.0/20", "scan_concurrency": 512,
+        "anomaly_series": 10000, "anomaly_samples": 1440,
+        "intel_indicators": 1_000_000, "intel_events": 1_000_000,
+        "proxy_lines": 2_000_000,
+        "memory_iterations": 200,
+    },
+    "quick": {
+        "rest_requests": 300, "rest_concurrency": 10, "rest_devices": 200,
+        "subscribers": (100, 1000), "broadcast_messages": 10,
+        "scan_subnet": "10.0.0.0/24", "scan_concurrency": 128,
+        "anomaly_series": 1000, "anomaly_samples": 1440,
+        "intel_indicators": 100_000, "intel_events": 100_000,
+        "proxy_lines": 200_000,
+        "memory_iterations": 20,
+    },
+}
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Percentil por rango más cercano (muestras sin ordenar)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(samples: Sequence[float]) -> Dict:
+    """Resumen en milisegundos de una lista de latencias en segundos"""
+    return {
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def fake_device(index: int) -> Dict:
+    """Resultado de barrido sintético y determinista"""
+    ip = str(ipaddress.IPv4Address("10.0.0.0") + index + 1)
+    mac = ":".join(f"{b:02x}" for b in (0x02, 0, (index >> 16) & 255, (index >> 8) & 255, index & 255, 1))
+    return {"ip": ip, "mac": mac, "latency": round(1 + (index % 50) / 10, 2)}
+
+
+# --- API REST ----------------------------------------------------------------
+
+def seed_app(devices: int, data_dir: str):
+    """Cargar la aplicación con un inventario y un registro de amenazas sintéticos"""
+    os.chdir(ROOT)
+    import app as sentinel_app
+
+    sentinel_app.load_config()
+    performance = sentinel_app.config.get("performance", {})
+    sentinel_app.snapshots.configure(performance)
+    sentinel_app.compressor.configure(performance)
+    # Sin limitación: medimos la aplicación, no el token bucket
+    sentinel_app.rate_limiter.enabled = False
+
+    path = os.path.join(data_dir, "bench.db")
+    sentinel_app.timeseries.open(path)
+    threat_log = sentinel_app.security_monitor.threat_log
+    threat_log.open(path)
+    threat_log.add_many({
+        "type": ("malware", "phishing", "intrusion")[i % 3],
+        "source_ip": f"192.168.1.{i % 254 + 1}",
+        "severity": ("low", "medium", "high")[i % 3],
+        "description": "Evento sintético",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    } for i in range(500))
+
+    inventory = sentinel_app.network_monitor.inventory
+    for index in range(devices):
+        inventory.observe(fake_device(index))
+    inventory.take_delta()
+    sentinel_app.publish_snapshots()
+    return sentinel_app
+
+
+async def _load_client(client, endpoints: Sequence[str], total: int, concurrency: int) -> Dict:
+    """Repartir `total` peticiones entre `concurrency` clientes concurrentes"""
+    latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in endpoints}
+    errors = 0
+    remaining = [total]
+
+    async def worker(offset: int):
+        nonlocal errors
+        position = offset
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            endpoint = endpoints[position % len(endpoints)]
+            position += 1
+            started = time.perf_counter()
+            response = await client.get(endpoint, headers={"Accept-Encoding": "gzip"})
+            await response.aread()
+            latencies[endpoint].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    result = {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        "overall": latency_summary(everything),
+        "endpoints": {endpoint: latency_summary(samples) for endpoint, samples in latencies.items()},
+    }
+    return result
+
+
+async def bench_rest(requests: int, concurrency: int, devices: int,
+                     endpoints: Sequence[str] = DEFAULT_ENDPOINTS,
+                     url: Optional[str] = None) -> Dict:
+    """Rendimiento y latencias p50/p99 de los endpoints REST
+
+    Sin `url` la aplicación se ejecuta en proceso (ASGI, sin red) con datos
+    sintéticos; con `url` se mide un servidor ya desplegado.
+    """
+    import httpx
+
+    if url:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+            result = await _load_client(client, endpoints, requests, concurrency)
+        result["target"] = url
+        return result
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        sentinel_app = seed_app(devices, data_dir)
+        transport = httpx.ASGITransport(app=sentinel_app.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                # Calentamiento: primera construcción de instantáneas y rutas
+                for endpoint in endpoints:
+                    await client.get(endpoint)
+                result = await _load_client(client, endpoints, requests, concurrency)
+        finally:
+            sentinel_app.security_monitor.threat_log.close()
+            sentinel_app.timeseries.close()
+    result.update({"target": "asgi", "devices": devices})
+    return result
+
+
+# --- Difusión WebSocket --------------------------------------------------------
+
+class _TimingSocket:
+    """WebSocket simulado que anota cuándo recibe cada trama"""
+
+    __slots__ = ("published_at", "latencies")
+
+    def __init__(self, published_at: Dict[str, float], latencies: List[float]):
+        self.published_at = published_at
+        self.latencies = latencies
+
+    async def send_text(self, frame: str):
+        self.latencies.append(time.perf_counter() - self.published_at[frame])
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class _NullSocket:
+    """WebSocket simulado que descarta lo que recibe"""
+
+    async def send_text(self, frame: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def bench_broadcast(subscribers: int, messages: int, payload_devices: int = 50) -> Dict:
+    """Latencia desde publish() hasta send_text() de cada suscriptor"""
+    hub = BroadcastHub(queue_size=max(16, messages))
+    published_at: Dict[str, float] = {}
+    latencies: List[float] = []
+    for _ in range(subscribers):
+        hub.subscribe(_TimingSocket(published_at, latencies))
+    await asyncio.sleep(0)
+
+    devices = [fake_device(i) for i in range(payload_devices)]
+    fanout: List[float] = []
+    expected = subscribers * messages
+    started = time.perf_counter()
+    for sequence in range(messages):
+        frame = hub.serializer({"type": "network_update", "sequence": sequence, "devices": devices})
+        published_at[frame] = time.perf_counter()
+        hub.publish_frame(frame)
+        fanout.append(time.perf_counter() - published_at[frame])
+        # Ceder al loop como haría el ticker entre publicaciones
+        await asyncio.sleep(0)
+    while len(latencies) < expected and time.perf_counter() - started < 60:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    dropped = hub.stats()["dropped"]
+    await hub.close()
+
+    result = latency_summary(latencies)
+    result.update({
+        "subscribers": subscribers,
+        "messages": messages,
+        "delivered": len(latencies),
+        "dropped": dropped,
+        "frames_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "fanout_p99_ms": round(percentile(fanout, 0.99) * 1000, 3),
+    })
+    return result
+
+
+# --- Motor de escaneo ----------------------------------------------------------
+
+def fake_network(alive_ratio: float = 0.25, seed: int = 7,
+                 latency: Sequence[float] = (0.001, 0.005), timeout: float = 0.02):
+    """Sonda simulada: hosts activos deterministas y latencias acotadas"""
+    rng = random.Random(seed)
+    alive: Dict[str, float] = {}
+
+    async def probe(ip: str, ports: Sequence[int], host_timeout: float) -> Optional[float]:
+        if ip not in alive:
+            alive[ip] = rng.uniform(*latency) if rng.random() < alive_ratio else -1.0
+        delay = alive[ip]
+        if delay < 0:
+            # Un host inexistente consume el timeout completo, como en la red real
+            await asyncio.sleep(min(timeout, host_timeout))
+            return None
+        await asyncio.sleep(delay)
+        return delay * 1000
+
+    return probe
+
+
+async def bench_scan(subnet: str, concurrency: int) -> Dict:
+    """Hosts por segundo del barrido más la fusión en el inventario"""
+    scanner = SubnetScanner(max_concurrent=concurrency, host_timeout=0.02, probe=fake_network())
+    inventory = DeviceInventory()
+    hosts = max(1, ipaddress.ip_network(subnet).num_addresses - 2)
+
+    started = time.perf_counter()
+    seen = set()
+    async for result in scanner.scan([{"range": subnet}]):
+        inventory.observe(result)
+        seen.add(inventory.lookup(result.get("mac"), result["ip"]).key)
+    inventory.expire(seen)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "subnet": subnet,
+        "hosts": hosts,
+        "online": len(seen),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "hosts_per_second": round(hosts / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+# --- Anomalías ------------------------------------------------------------------
+
+def bench_anomaly(series: int, samples: int, step: int = 60) -> Dict:
+    """Pasada del detector sobre series x muestras por minuto con picos inyectados
+
+    La pasada en frío recorre toda la ventana; la incremental, solo el
+    último bucket (el caso de cada ciclo de escaneo).
+    """
+    rng = np.random.default_rng(7)
+    values = rng.normal(1000.0, 50.0, (samples, series))
+    spikes = rng.choice(series, size=max(1, series // 1000), replace=False)
+    values[samples - 10, spikes] *= 4
+    names = [f"device.10.{i // 65536}.{i // 256 % 256}.{i % 256}:161.bytes_in" for i in range(series)]
+    buckets = np.arange(samples, dtype=np.int64) * step + 1_700_000_000
+
+    detector = AnomalyDetector(min_severity="low")
+    started = time.perf_counter()
+    events = detector.detect(names, buckets[:-1], values[:-1], now=buckets[-1])
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    detector.detect(names, buckets, values, now=buckets[-1] + step)
+    incremental = time.perf_counter() - started
+
+    flagged = {event["source_ip"] for event in events}
+    return {
+        "series": series,
+        "samples": samples,
+        "cold_pass_ms": round(cold * 1000, 3),
+        "incremental_pass_ms": round(incremental * 1000, 3),
+        "spikes_detected": sum(names[i][len("device."):].split(":")[0] in flagged for i in spikes),
+        "spikes": len(spikes),
+    }
+
+
+# --- Inteligencia de amenazas ----------------------------------------------------
+
+def bench_intel(indicators: int, events: int) -> Dict:
+    """Construcción del índice y consulta de eventos (IPs en su mayoría distintas)
+
+    Los indicadores son un 90 % IPs, un 5 % redes de /16 a /28 y un 5 % dominios.
+    """
+    rng = np.random.default_rng(11)
+
+    def ip_text(values):
+        return [f"{v >> 24}.{v >> 16 & 255}.{v >> 8 & 255}.{v & 255}" for v in values.tolist()]
+
+    ips = indicators * 90 // 100
+    lines = ip_text(rng.integers(0, 1 << 32, ips, dtype=np.uint64))
+    prefixes = rng.choice((16, 20, 24, 28), indicators * 5 // 100)
+    lines += [f"{net}/{bits}" for net, bits in zip(ip_text(rng.integers(0, 1 << 32, len(prefixes),
+                                                                         dtype=np.uint64)), prefixes)]
+    lines += [f"host{i}.bad{i % 1000}.example" for i in range(indicators - len(lines))]
+
+    started = time.perf_counter()
+    index = IndicatorSet(["bench"])
+    for line in lines:
+        parsed = parse_indicator(line)
+        index.add(parsed[0], parsed[1], 0)
+    index.freeze()
+    build = time.perf_counter() - started
+
+    queries = ip_text(rng.integers(0, 1 << 32, events, dtype=np.uint64))
+    match = index.match
+    started = time.perf_counter()
+    matched = sum(match(value) is not None for value in queries)
+    elapsed = time.perf_counter() - started
+    return {
+        "indicators": len(index),
+        "events": events,
+        "build_ms": round(build * 1000, 3),
+        "match_ms": round(elapsed * 1000, 3),
+        "events_per_second": round(events / elapsed, 1) if elapsed else 0.0,
+        "matched": matched,
+    }
+
+
+# --- Log del proxy ---------------------------------------------------------------
+
+def bench_proxy(lines: int, chunk_lines: int = 10000) -> Dict:
+    """Interpretación y clasificación de un access.log de Squid en un solo proceso
+
+    El análisis de un día completo reparte tramos del archivo entre procesos;
+    aquí se mide el coste por línea de cada uno.
+    """
+    from threat_intel import IndicatorSet
+    categories = IndicatorSet(["malware"])
+    for i in range(10000):
+        categories.add("domain", f"bad{i}.example", 0)
+    categories.freeze()
+    parser = ProxyLogParser(categories, ["malware"])
+    codes = ("TCP_MISS/200", "TCP_HIT/200", "TCP_MEM_HIT/200", "TCP_TUNNEL/200", "TCP_DENIED/403")
+    chunks = []
+    for start in range(0, lines, chunk_lines):
+        chunks.append("".join(
+            f"{1_760_000_000 + i // 50}.{i % 1000:03d}    {i % 500} 10.0.{i // 256 % 256}.{i % 256} "
+            f"{codes[i % 5]} {100 + i % 9000} GET http://{'bad' if i % 40 == 0 else 'site'}{i % 5000}"
+            f".example/p/{i % 97} - HIER_DIRECT/93.184.216.34 text/html\n"
+            for i in range(start, min(start + chunk_lines, lines))
+        ).encode())
+
+    started = time.perf_counter()
+    blocked = sum(sum(counts[1] for counts in parser.parse(chunk)["buckets"].values()) for chunk in chunks)
+    elapsed = time.perf_counter() - started
+    return {
+        "lines": lines,
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(lines / elapsed, 1) if elapsed else 0.0,
+        "blocked": blocked,
+    }
+
+
+# --- Memoria --------------------------------------------------------------------
+
+async def bench_memory(iterations: int, devices: int = 500, subscribers: int = 100) -> Dict:
+    """Crecimiento de memoria en ciclos repetidos de escaneo y difusión
+
+    Cada ciclo cambia una parte del inventario, toma el delta y lo difunde.
+    Tras un calentamiento, un crecimiento sostenido indica una fuga.
+    """
+    inventory = DeviceInventory(device_timeout=5.0)
+    hub = BroadcastHub()
+    for _ in range(subscribers):
+        hub.subscribe(_NullSocket())
+
+    clock = [time.time()]
+
+    async def cycle(number: int):
+        clock[0] += 1.0
+        seen = set()
+        # Rotar un 10 % de los dispositivos para generar altas, cambios y bajas
+        for index in range(devices):
+            device = fake_device(index + (number % 10) * devices // 10)
+            inventory.observe(device, clock[0])
+            seen.add(inventory.lookup(device["mac"], device["ip"]).key)
+        inventory.expire(seen, clock[0])
+        delta = inventory.take_delta()
+        if delta is not None:
+            hub.publish(dict(delta, type="device_delta"))
+        await asyncio.sleep(0)
+
+    warmup = max(5, iterations // 10)
+    for number in range(warmup):
+        await cycle(number)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    middle = baseline
+    for number in range(warmup, warmup + iterations):
+        await cycle(number)
+        if number == warmup + iterations // 2:
+            middle, _ = tracemalloc.get_traced_memory()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await hub.close()
+
+    growth = current - baseline
+    # Las estructuras acotadas (historial de versiones) se llenan en la primera
+    # mitad; lo que sigue creciendo en la segunda es una fuga
+    late_iterations = max(1, iterations - iterations // 2 - 1)
+    return {
+        "iterations": iterations,
+        "devices": devices,
+        "subscribers": subscribers,
+        "growth_bytes": growth,
+        "growth_per_iteration_bytes": round(growth / iterations, 1),
+        "late_growth_per_iteration_bytes": round((current - middle) / late_iterations, 1),
+        "peak_bytes": peak - baseline,
+        "cycle_ms": round(elapsed / iterations * 1000, 3),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+# --- Ejecución ------------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+            text=True, timeout=10, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run_suite(quick: bool = False, only: Optional[Sequence[str]] = None,
+                    url: Optional[str] = None) -> Dict:
+    """Ejecutar los escenarios seleccionados y devolver el documento de resultados"""
+    profile = PROFILES["quick" if quick else "full"]
+    selected = set(only or ("rest", "broadcast", "scan", "anomaly", "intel", "proxy", "memory"))
+    results: Dict[str, Dict] = {}
+
+    if "rest" in selected:
+        results["rest"] = await bench_rest(profile["rest_requests"], profile["rest_concurrency"],
+                                           profile["rest_devices"], url=url)
+    if "broadcast" in selected:
+        results["broadcast"] = {
+            str(count): await bench_broadcast(count, profile["broadcast_messages"])
+            for count in profile["subscribers"]
+        }
+    if "scan" in selected:
+        results["scan"] = await bench_scan(profile["scan_subnet"], profile["scan_concurrency"])
+    if "anomaly" in selected:
+        results["anomaly"] = bench_anomaly(profile["anomaly_series"], profile["anomaly_samples"])
+    if "intel" in selected:
+        results["intel"] = bench_intel(profile["intel_indicators"], profile["intel_events"])
+    if "proxy" in selected:
+        results["proxy"] = bench_proxy(profile["proxy_lines"])
+    if "memory" in selected:
+        results["memory"] = await bench_memory(profile["memory_iterations"])
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "profile": "quick" if quick else "full",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de Sentinel")
+    parser.add_argument("--quick", action="store_true", help="tamaños reducidos (CI)")
+    parser.add_argument("--only", help="escenarios separados por comas: rest,broadcast,scan,anomaly,intel,proxy,memory")
+    parser.add_argument("--url", help="medir un servidor desplegado en lugar de la app en proceso")
+    parser.add_argument("--output", help="archivo JSON de resultados (por defecto stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    only = [name.strip() for name in args.only.split(",")] if args.only else None
+    document = asyncio.run(run_suite(args.quick, only, args.url))
+    text = json.dumps(document, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
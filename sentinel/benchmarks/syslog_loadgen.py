@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Generador de carga Syslog - Sentinel Dashboard
+Envía mensajes RFC 3164/5424 por UDP o TCP y mide el rendimiento del receptor
+
+Uso:
+    python benchmarks/syslog_loadgen.py --self-test --protocol tcp --messages 1000000
+    python benchmarks/syslog_loadgen.py --target 127.0.0.1:514 --protocol udp --rate 100000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from syslog_server import SyslogServer  # noqa: E402
+
+SAMPLE_MESSAGES = (
+    b"<34>Oct 11 22:14:15 gw01 sshd[1234]: Failed password for root from 10.0.0.5 port 2222 ssh2",
+    b"<165>1 2025-10-11T22:14:15.003Z fw01 kernel - ID47 - [UFW BLOCK] SRC=10.0.0.9 DST=192.168.1.1 PROTO=TCP DPT=22",
+    b"<13>Oct 11 22:14:16 sw02 ifmgr: Interface Gi0/1 changed state to up",
+    b"<190>1 2025-10-11T22:14:17Z proxy squid 811 - - TCP_MISS/200 512 GET http://example.com/",
+)
+
+
+def build_payload(protocol: str, batch: int) -> bytes:
+    """Construir un bloque TCP con framing por salto de línea"""
+    lines = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(batch)]
+    return b"\n".join(lines) + b"\n"
+
+
+def generate(host: str, port: int, protocol: str, messages: int, rate: int = 0) -> float:
+    """Enviar `messages` mensajes y devolver los segundos empleados"""
+    start = time.perf_counter()
+    if protocol == "tcp":
+        batch = 1000
+        payload = build_payload(protocol, batch)
+        with socket.create_connection((host, port)) as sock:
+            for _ in range(messages // batch):
+                sock.sendall(payload)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        target = (host, port)
+        interval = 1.0 / rate if rate else 0.0
+        next_send = time.perf_counter()
+        for i in range(messages):
+            sock.sendto(SAMPLE_MESSAGES[i & 3], target)
+            if interval and i % 100 == 0:
+                next_send += interval * 100
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        sock.close()
+    return time.perf_counter() - start
+
+
+def _server_process(port_queue, result_queue, expected: int, timeout: float):
+    """Proceso receptor con sumidero de conteo"""
+
+    async def main():
+        server = SyslogServer(lambda messages: None)
+        await server.start("127.0.0.1", 0)
+        port_queue.put(server.ports)
+
+        first = last = None
+        seen = 0
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+            now = time.perf_counter()
+            if server.queue.received != seen:
+                seen = server.queue.received
+                first = first or now
+                last = now
+            if server.processed + server.queue.dropped >= expected:
+                break
+            # Sin tráfico durante 2 s: los emisores terminaron (UDP puede perder en el kernel)
+            if last is not None and now - last > 2.0 and not len(server.queue):
+                break
+        elapsed = (last - first) if first else 0.0
+        stats = server.stats()
+        stats["elapsed"] = elapsed
+        await server.stop()
+        result_queue.put(stats)
+
+    asyncio.run(main())
+
+
+def self_test(protocol: str, messages: int, senders: int, timeout: float) -> dict:
+    """Levantar un receptor en otro proceso y saturarlo desde `senders` procesos"""
+    ctx = multiprocessing.get_context("spawn")
+    port_queue, result_queue = ctx.Queue(), ctx.Queue()
+    server = ctx.Process(target=_server_process,
+                         args=(port_queue, result_queue, messages, timeout))
+    server.start()
+    ports = port_queue.get(timeout=10)
+
+    per_sender = messages // senders
+    workers = [
+        ctx.Process(target=generate, args=("127.0.0.1", ports[protocol], protocol, per_sender))
+        for _ in range(senders)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    stats = result_queue.get(timeout=timeout + 10)
+    server.join()
+    stats.update({
+        "protocol": protocol,
+        "sent": per_sender * senders,
+        "lost_in_kernel": per_sender * senders - stats["received"],
+        "senders": senders,
+        "msgs_per_second": round(stats["processed"] / stats["elapsed"]) if stats["elapsed"] else None,
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga syslog")
+    parser.add_argument("--target", help="host:puerto de un receptor existente")
+    parser.add_argument("--self-test", action="store_true", help="levantar un receptor local")
+    parser.add_argument("--protocol", choices=("udp", "tcp"), default="tcp")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--senders", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    parser.add_argument("--rate", type=int, default=0, help="mensajes/s por emisor UDP (0 = sin límite)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.self_test:
+        print(json.dumps(self_test(args.protocol, args.messages, args.senders, args.timeout), indent=2))
+        return
+
+    if not args.target:
+        parser.error("indique --target host:puerto o --self-test")
+    host, port = args.target.rsplit(":", 1)
+    elapsed = generate(host, int(port), args.protocol, args.messages, args.rate)
+    print(json.dumps({
+        "protocol": args.protocol,
+        "sent": args.messages,
+        "elapsed": round(elapsed, 3),
+        "msgs_per_second": round(args.messages / elapsed),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Hub de difusión WebSocket - Sentinel Dashboard
+Cada actualización se serializa una vez y se reparte a todos los suscriptores
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from serialization import dumps_text
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_SEND_TIMEOUT = 10.0
+
+
+def serialize(message: Dict) -> str:
+    """Serializar un mensaje a texto JSON compacto"""
+    return dumps_text(message)
+
+
+class Subscriber:
+    """Cliente WebSocket con cola de envío acotada y tarea de escritura propia"""
+
+    def __init__(self, hub: "BroadcastHub", websocket: Any, queue_size: int, policy: str):
+        self.hub = hub
+        self.websocket = websocket
+        self.queue_size = queue_size
+        self.policy = policy
+        self.queue: deque = deque()
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._writer())
+
+    def offer(self, frame: str):
+        """Encolar una trama ya serializada sin bloquear al publicador"""
+        if self.closed:
+            return
+        if len(self.queue) >= self.queue_size:
+            if self.policy == DISCONNECT:
+                logger.warning("Cliente WebSocket lento desconectado")
+                self.hub.unsubscribe(self, close=True)
+                return
+            self.queue.popleft()
+            self.dropped += 1
+            self.hub.dropped += 1
+        self.queue.append(frame)
+        self._wakeup.set()
+
+    async def _writer(self):
+        """Vaciar la cola hacia el socket"""
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                frame = self.queue.popleft()
+                await asyncio.wait_for(
+                    self.websocket.send_text(frame), self.hub.send_timeout
+                )
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Error enviando a cliente WebSocket: {e}")
+            self.hub.unsubscribe(self, close=True)
+
+    async def close(self):
+        """Detener la tarea de escritura y cerrar el socket"""
+        self.closed = True
+        self._wakeup.set()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
+class BroadcastHub:
+    """Difusión de actualizaciones a todos los clientes WebSocket"""
+
+    def __init__(
+        self,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: str = DROP_OLDEST,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        serializer: Callable[[Dict], str] = serialize,
+    ):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.serializer = serializer
+        self.subscribers: Set[Subscriber] = set()
+        self.retained: Dict[str, str] = {}
+        self.published = 0
+        # Acumulado de tramas descartadas, también de clientes ya desconectados
+        self.dropped = 0
+        # Funciones llamadas con (trama, clave retenida) en cada publicación
+        self.listeners: List[Callable[[str, Optional[str]], None]] = []
+        # Histograma opcional (observe) del tiempo de reparto de cada trama
+        self.fanout_seconds = None
+
+    def configure(self, websocket_config: Dict):
+        """Aplicar la sección `dashboard.websocket` de la configuración"""
+        self.queue_size = websocket_config.get("queue_size", DEFAULT_QUEUE_SIZE)
+        self.policy = websocket_config.get("slow_client_policy", DROP_OLDEST)
+        self.send_timeout = websocket_config.get("send_timeout", DEFAULT_SEND_TIMEOUT)
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
+
+    def subscribe(self, websocket: Any) -> Subscriber:
+        """Registrar un cliente y enviarle las últimas tramas retenidas"""
+        subscriber = Subscriber(self, websocket, self.queue_size, self.policy)
+        self.subscribers.add(subscriber)
+        for frame in self.retained.values():
+            subscriber.offer(frame)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber, close: bool = False):
+        """Dar de baja a un cliente (y cerrar su socket si se indica)"""
+        self.subscribers.discard(subscriber)
+        if close and not subscriber.closed:
+            asyncio.ensure_future(subscriber.close())
+        else:
+            subscriber.closed = True
+            subscriber._wakeup.set()
+
+    def publish(self, message: Dict, retain: bool = False) -> str:
+        """Serializar el mensaje una sola vez y repartirlo a todos"""
+        frame = self.serializer(message)
+        self.publish_frame(frame, message.get("type", "") if retain else None)
+        return frame
+
+    def publish_frame(self, frame: str, retain_key: Optional[str] = None):
+        """Repartir una trama ya serializada a todas las colas"""
+        if retain_key is not None:
+            self.retained[retain_key] = frame
+        self.published += 1
+        started = time.perf_counter()
+        for listener in self.listeners:
+            listener(frame, retain_key)
+        for subscriber in list(self.subscribers):
+            subscriber.offer(frame)
+        if self.fanout_seconds is not None:
+            self.fanout_seconds.observe(time.perf_counter() - started)
+
+    async def run_ticker(self, producer: Callable[[], Dict], interval: float,
+                         retain: bool = True):
+        """Publicar periódicamente el mensaje generado por `producer`"""
+        while True:
+            try:
+                if self.subscribers or self.listeners:
+                    self.publish(producer(), retain=retain)
+            except Exception as e:
+                logger.error(f"Error generando actualización WebSocket: {e}")
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        """Cerrar todas las conexiones"""
+        subscribers = list(self.subscribers)
+        self.subscribers.clear()
+        await asyncio.gather(*(s.close() for s in subscribers), return_exceptions=True)
+
+    def stats(self) -> Dict:
+        """Estadísticas del hub"""
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "queued": sum(len(s.queue) for s in self.subscribers),
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Caché de instantáneas - Sentinel Dashboard
+Última instantánea inmutable por clave, alimentada por el monitoreo de fondo
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+
+Loader = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class Snapshot(NamedTuple):
+    """Instantánea publicada; su valor no debe mutarse una vez publicado"""
+    value: Any
+    version: int
+    created_at: float
+    timestamp: str
+
+
+class SnapshotStore:
+    """Almacén de instantáneas con lecturas O(1) y refrescos coalescidos"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, enabled: bool = True):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version = 0
+        self._encoded: Dict[str, Tuple[int, bytes]] = {}
+        # Funciones llamadas con (clave, valor) en cada publicación
+        self.listeners: List[Callable[[str, Any], None]] = []
+        # En un seguidor del clúster las instantáneas solo llegan desde el líder
+        self.read_only = False
+
+    def configure(self, performance_config: Dict):
+        """Aplicar la sección `performance` de la configuración"""
+        self.ttl = performance_config.get("cache_ttl", DEFAULT_TTL)
+        self.enabled = performance_config.get("cache_enabled", True)
+
+    def publish(self, key: str, value: Any) -> Snapshot:
+        """Publicar una nueva instantánea para la clave"""
+        self._version += 1
+        snapshot = Snapshot(value, self._version, time.monotonic(), datetime.now().isoformat())
+        self._snapshots[key] = snapshot
+        for listener in self.listeners:
+            listener(key, value)
+        return snapshot
+
+    def get(self, key: str) -> Optional[Snapshot]:
+        """Obtener la última instantánea publicada (puede estar vencida)"""
+        return self._snapshots.get(key)
+
+    def encoded(self, key: str, snapshot: Snapshot) -> bytes:
+        """Cuerpo JSON de la instantánea, codificado una sola vez por versión"""
+        cached = self._encoded.get(key)
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        body = dumps(snapshot.value)
+        self._encoded[key] = (snapshot.version, body)
+        return body
+
+    def is_fresh(self, snapshot: Optional[Snapshot]) -> bool:
+        """Indicar si la instantánea sigue dentro del TTL"""
+        if snapshot is None or not self.enabled:
+            return False
+        return time.monotonic() - snapshot.created_at < self.ttl
+
+    def age(self, key: str) -> Optional[float]:
+        """Segundos desde la última publicación de la clave"""
+        snapshot = self._snapshots.get(key)
+        return None if snapshot is None else time.monotonic() - snapshot.created_at
+
+    async def coalesce(self, key: str, loader: Loader) -> Any:
+        """Ejecutar `loader` una sola vez aunque haya llamadas concurrentes"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await _resolve(loader())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar "exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_refresh(self, key: str, loader: Loader) -> Snapshot:
+        """Devolver la instantánea vigente o refrescarla una sola vez"""
+        snapshot = self._snapshots.get(key)
+        if self.is_fresh(snapshot) or (self.read_only and snapshot is not None):
+            return snapshot
+
+        async def refresh():
+            return self.publish(key, await _resolve(loader()))
+
+        return await self.coalesce(key, refresh)
+
+
+async def _resolve(value: Any) -> Any:
+    """Esperar el valor si es awaitable"""
+    if inspect.isawaitable(value):
+        return await value
+    return value
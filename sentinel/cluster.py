@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Modo multi-proceso - Sentinel Dashboard
+Elección de un único proceso de monitoreo (flock) y difusión de estado por socket Unix
+"""
+
+import asyncio
+import fcntl
+import inspect
+import itertools
+import logging
+import os
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_PATH = "data/sentinel.lock"
+DEFAULT_SOCKET_PATH = "data/sentinel.sock"
+DEFAULT_RETRY_INTERVAL = 2.0
+DEFAULT_REQUEST_TIMEOUT = 120.0
+MAX_FOLLOWER_BUFFER = 16 * 1024 * 1024
+
+HEADER = struct.Struct(">I")
+
+LEADER = "leader"
+FOLLOWER = "follower"
+
+
+def encode_frame(message: Dict) -> bytes:
+    """Trama con prefijo de longitud y cuerpo JSON"""
+    body = dumps(message)
+    return HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return loads(await reader.readexactly(length))
+
+
+class ClusterNode:
+    """Nodo de un despliegue con varios workers: líder elegido o seguidor"""
+
+    def __init__(self, lock_path: str = DEFAULT_LOCK_PATH,
+                 socket_path: str = DEFAULT_SOCKET_PATH,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        self.lock_path = lock_path
+        self.socket_path = socket_path
+        self.retry_interval = retry_interval
+        self.role = FOLLOWER
+        self.on_elected: Optional[Callable[[], Awaitable[None]]] = None
+        self.on_snapshot: Optional[Callable[[str, Any], None]] = None
+        self.on_frame: Optional[Callable[[str, Optional[str]], None]] = None
+        self.commands: Dict[str, Callable[..., Any]] = {}
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._followers: Set[asyncio.StreamWriter] = set()
+        self._snapshot_frames: Dict[str, bytes] = {}
+        self._retained_frames: Dict[str, bytes] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._replies: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, cluster_config: Dict) -> "ClusterNode":
+        """Crear el nodo a partir de `application.cluster`"""
+        return cls(
+            lock_path=cluster_config.get("lock_path", DEFAULT_LOCK_PATH),
+            socket_path=cluster_config.get("socket_path", DEFAULT_SOCKET_PATH),
+            retry_interval=cluster_config.get("retry_interval", DEFAULT_RETRY_INTERVAL),
+        )
+
+    @property
+    def is_leader(self) -> bool:
+        return self.role == LEADER
+
+    def try_lock(self) -> bool:
+        """Intentar tomar el cerrojo exclusivo; se libera solo si el proceso muere"""
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    def start(self):
+        """Lanzar el bucle de elección en segundo plano"""
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def run(self):
+        """Seguir al líder mientras exista; tomar el relevo cuando el cerrojo quede libre"""
+        while True:
+            if self.try_lock():
+                await self._become_leader()
+                return
+            try:
+                await self._follow()
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                logger.debug(f"Sin conexión con el líder: {e}")
+            self._writer = None
+            await asyncio.sleep(self.retry_interval)
+
+    # --- Líder -------------------------------------------------------------
+
+    async def _become_leader(self):
+        self.role = LEADER
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._serve_follower, self.socket_path)
+        logger.info(f"Proceso {os.getpid()} elegido como monitor del clúster")
+        if self.on_elected is not None:
+            await self.on_elected()
+
+    async def _serve_follower(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # El seguidor recibe primero el estado vigente
+        for frame in self._snapshot_frames.values():
+            writer.write(frame)
+        for frame in self._retained_frames.values():
+            writer.write(frame)
+        self._followers.add(writer)
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message.get("t") == "command":
+                    asyncio.ensure_future(self._run_command(writer, message))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._followers.discard(writer)
+            writer.close()
+
+    async def _run_command(self, writer: asyncio.StreamWriter, message: Dict):
+        reply = {"t": "reply", "id": message["id"]}
+        try:
+            reply["result"] = await self.execute(message["name"], message.get("args") or {})
+        except Exception as e:
+            reply["error"] = str(e)
+        if not writer.is_closing():
+            writer.write(encode_frame(reply))
+
+    def _send_all(self, frame: bytes):
+        for writer in list(self._followers):
+            # Un seguidor que no lee no debe hacer crecer la memoria del líder
+            if writer.transport.get_write_buffer_size() > MAX_FOLLOWER_BUFFER:
+                logger.warning("Seguidor lento desconectado")
+                self._followers.discard(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+    def publish_snapshot(self, key: str, value: Any):
+        """Difundir una instantánea a los seguidores (se conserva para los nuevos)"""
+        if not self.is_leader:
+            return
+        frame = encode_frame({"t": "snapshot", "key": key, "value": value})
+        self._snapshot_frames[key] = frame
+        self._send_all(frame)
+
+    def publish_frame(self, frame: str, retain_key: Optional[str] = None):
+        """Difundir una trama WebSocket ya serializada"""
+        if not self.is_leader:
+            return
+        data = encode_frame({"t": "frame", "frame": frame, "retain": retain_key})
+        if retain_key is not None:
+            self._retained_frames[retain_key] = data
+        self._send_all(data)
+
+    # --- Seguidor ----------------------------------------------------------
+
+    async def _follow(self):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        self._writer = writer
+        logger.info("Conectado al proceso monitor del clúster")
+        try:
+            while True:
+                message = await read_frame(reader)
+                kind = message.get("t")
+                if kind == "snapshot" and self.on_snapshot is not None:
+                    self.on_snapshot(message["key"], message["value"])
+                elif kind == "frame" and self.on_frame is not None:
+                    self.on_frame(message["frame"], message.get("retain"))
+                elif kind == "reply":
+                    future = self._replies.pop(message["id"], None)
+                    if future is not None and not future.done():
+                        if "error" in message:
+                            future.set_exception(RuntimeError(message["error"]))
+                        else:
+                            future.set_result(message.get("result"))
+        finally:
+            writer.close()
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Conexión con el líder perdida"))
+            self._replies.clear()
+
+    # --- Comandos ----------------------------------------------------------
+
+    async def execute(self, name: str, args: Optional[Dict] = None) -> Any:
+        """Ejecutar un comando registrado en este proceso"""
+        handler = self.commands.get(name)
+        if handler is None:
+            raise KeyError(f"Comando desconocido: {name}")
+        result = handler(**(args or {}))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def request(self, name: str, args: Optional[Dict] = None,
+                      timeout: float = DEFAULT_REQUEST_TIMEOUT) -> Any:
+        """Ejecutar un comando en el líder (localmente si este proceso lo es)"""
+        if self.is_leader:
+            return await self.execute(name, args)
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError("Sin conexión con el proceso monitor")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = future
+        self._writer.write(encode_frame(
+            {"t": "command", "id": request_id, "name": name, "args": args or {}}
+        ))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._replies.pop(request_id, None)
+
+    async def stop(self):
+        """Liberar el cerrojo, el socket y las conexiones"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for writer in list(self._followers):
+            writer.close()
+        self._followers.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.role = FOLLOWER
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Motor de descubrimiento de dispositivos - Sentinel Dashboard
+Barrido concurrente de subredes con asyncio
+"""
+
+import asyncio
+import ipaddress
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Puertos usados para detectar hosts activos sin privilegios de root.
+# Una conexión aceptada o rechazada (RST) indica que el host existe.
+DEFAULT_PROBE_PORTS = (80, 443, 22, 445, 139, 3389)
+DEFAULT_HOST_TIMEOUT = 1.0
+DEFAULT_MAX_CONCURRENT = 50
+
+ARP_TABLE_PATH = "/proc/net/arp"
+
+ProbeFunc = Callable[[str, Sequence[int], float], Awaitable[Optional[float]]]
+
+
+async def _connect(ip: str, port: int) -> bool:
+    """Intentar una conexión TCP; True si el host respondió"""
+    try:
+        _, writer = await asyncio.open_connection(ip, port)
+    except ConnectionRefusedError:
+        return True
+    writer.close()
+    return True
+
+
+async def tcp_probe(ip: str, ports: Sequence[int], timeout: float) -> Optional[float]:
+    """Sondear un host por TCP y devolver el RTT en ms, o None si no responde"""
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(_connect(ip, port)) for port in ports]
+    try:
+        pending = set(tasks)
+        deadline = start + timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return (time.perf_counter() - start) * 1000
+        return None
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def read_arp_table(path: str = ARP_TABLE_PATH) -> Dict[str, str]:
+    """Leer la tabla ARP del kernel (ip -> mac)"""
+    table = {}
+    try:
+        with open(path, 'r') as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 4 and parts[3] != "00:00:00:00:00:00":
+                    table[parts[0]] = parts[3].upper()
+    except OSError:
+        pass
+    return table
+
+
+def iter_scan_targets(subnet_ranges: Iterable[Dict]) -> Iterable[str]:
+    """Generar las IPs de todas las subredes habilitadas"""
+    for subnet in subnet_ranges:
+        if not subnet.get("scan_enabled", True):
+            continue
+        try:
+            network = ipaddress.ip_network(subnet["range"], strict=False)
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Rango de subred inválido {subnet!r}: {e}")
+            continue
+        for host in network.hosts():
+            yield str(host)
+
+
+class SubnetScanner:
+    """Barrido concurrente de subredes con concurrencia acotada"""
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        host_timeout: float = DEFAULT_HOST_TIMEOUT,
+        probe_ports: Sequence[int] = DEFAULT_PROBE_PORTS,
+        probe: Optional[ProbeFunc] = None,
+    ):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.host_timeout = float(host_timeout)
+        self.probe_ports = tuple(probe_ports)
+        self.probe = probe or tcp_probe
+        self._arp_cache: Dict[str, str] = {}
+        self._arp_loaded_at = 0.0
+
+    @classmethod
+    def from_config(cls, network_config: Dict, **kwargs) -> "SubnetScanner":
+        """Crear un escáner a partir de la sección `network` de la configuración"""
+        return cls(
+            max_concurrent=network_config.get("max_concurrent_scans", DEFAULT_MAX_CONCURRENT),
+            host_timeout=network_config.get("host_timeout", DEFAULT_HOST_TIMEOUT),
+            probe_ports=network_config.get("probe_ports", DEFAULT_PROBE_PORTS),
+            **kwargs,
+        )
+
+    def _lookup_mac(self, ip: str) -> Optional[str]:
+        """Resolver la MAC desde la tabla ARP (refrescada como máximo 1 vez/s)"""
+        now = time.monotonic()
+        if ip not in self._arp_cache and now - self._arp_loaded_at > 1.0:
+            self._arp_cache = read_arp_table()
+            self._arp_loaded_at = now
+        return self._arp_cache.get(ip)
+
+    async def _probe_host(self, ip: str) -> Optional[Dict]:
+        """Sondear un host y construir el registro del dispositivo"""
+        try:
+            rtt = await self.probe(ip, self.probe_ports, self.host_timeout)
+        except Exception as e:
+            logger.debug(f"Error sondeando {ip}: {e}")
+            return None
+        if rtt is None:
+            return None
+        return {
+            "ip": ip,
+            "mac": self._lookup_mac(ip),
+            "latency": round(rtt, 2),
+        }
+
+    async def sweep(self, targets: Iterable[str]) -> AsyncIterator[Dict]:
+        """Barrer los objetivos y entregar cada host activo en cuanto responde"""
+        results: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        done = object()
+
+        async def worker(ip: str):
+            try:
+                device = await self._probe_host(ip)
+                if device is not None:
+                    results.put_nowait(device)
+            finally:
+                semaphore.release()
+
+        async def producer():
+            tasks = set()
+            try:
+                for ip in targets:
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(worker(ip))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                for task in list(tasks):
+                    task.cancel()
+                results.put_nowait(done)
+
+        producer_task = asyncio.ensure_future(producer())
+        try:
+            while True:
+                item = await results.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            if not producer_task.done():
+                producer_task.cancel()
+            await asyncio.gather(producer_task, return_exceptions=True)
+
+    async def scan(self, subnet_ranges: Iterable[Dict]) -> AsyncIterator[Dict]:
+        """Barrer todas las subredes habilitadas de la configuración"""
+        async for device in self.sweep(iter_scan_targets(subnet_ranges)):
+            yield device
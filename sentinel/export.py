@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Exportación de datos - Sentinel Dashboard
+Codificadores por partes (CSV, NDJSON y Parquet opcional) sobre generadores de filas
+"""
+
+import csv
+import io
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from serialization import dumps, iso_timestamp
+from storage import parse_duration
+from threatlog import parse_timestamp
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow es opcional: sin él no hay salida Parquet
+    pyarrow = None
+
+DEFAULT_CHUNK_ROWS = 5000
+DEFAULT_ROW_GROUP = 50000
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columnas (nombre, tipo) de cada conjunto; "time" es epoch en segundos
+Columns = Sequence[Tuple[str, str]]
+
+DEVICE_COLUMNS: Columns = (
+    ("key", "str"), ("ip", "str"), ("mac", "str"), ("name", "str"), ("type", "str"),
+    ("status", "str"), ("manufacturer", "str"), ("latency", "float"),
+    ("first_seen", "time"), ("last_seen", "time"), ("state_changed", "time"),
+)
+THREAT_COLUMNS: Columns = (
+    ("id", "int"), ("timestamp", "time"), ("type", "str"), ("severity", "str"),
+    ("source_ip", "str"), ("description", "str"),
+)
+SAMPLE_COLUMNS: Columns = (("timestamp", "time"), ("series", "str"), ("value", "float"))
+ROLLUP_COLUMNS: Columns = (
+    ("timestamp", "time"), ("series", "str"), ("count", "int"),
+    ("avg", "float"), ("min", "float"), ("max", "float"),
+)
+
+
+def available_formats() -> Tuple[str, ...]:
+    return tuple(f for f in MEDIA_TYPES if f != "parquet" or pyarrow is not None)
+
+
+def time_bounds(timerange: Optional[str] = None, since=None, until=None,
+                now: Optional[float] = None) -> Tuple[Optional[float], Optional[float]]:
+    """Límites [since, until) en epoch desde range=24h o since/until (epoch o ISO 8601)"""
+    now = time.time() if now is None else now
+    start = end = None
+    if since is not None:
+        start = parse_timestamp(since)
+    elif timerange:
+        start = now - parse_duration(timerange)
+    if until is not None:
+        end = parse_timestamp(until)
+    if start is not None and end is not None and end <= start:
+        raise ValueError("until debe ser posterior a since")
+    return start, end
+
+
+def device_rows(records: Iterable, since: Optional[float] = None,
+                until: Optional[float] = None) -> Iterator[Tuple]:
+    """Filas de DEVICE_COLUMNS para los registros vistos en [since, until)"""
+    for record in records:
+        if since is not None and record.last_seen < since:
+            continue
+        if until is not None and record.last_seen >= until:
+            continue
+        device = record.to_dict()
+        yield (device["key"], device["ip"], device["mac"], device["name"], device["type"],
+               device["status"], device["manufacturer"], record.latency,
+               record.first_seen, record.last_seen, record.state_changed)
+
+
+def _batches(rows: Iterable[Tuple], size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text_converters(columns: Columns) -> list:
+    """Conversión por columna para los formatos de texto (None = sin cambios)"""
+    return [iso_timestamp if kind == "time" else None for _, kind in columns]
+
+
+def _convert(row: Tuple, converters: list) -> list:
+    return [value if convert is None or value is None else convert(value)
+            for value, convert in zip(row, converters)]
+
+
+def encode_csv(columns: Columns, rows: Iterable[Tuple],
+               chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    """CSV con cabecera, un bloque por cada `chunk_rows` filas"""
+    converters = _text_converters(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([name for name, _ in columns])
+    for batch in _batches(rows, chunk_rows):
+        writer.writerows(_convert(row, converters) for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Solo la cabecera: exportación vacía
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(columns: Columns, rows: Iterable[Tuple],
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Un objeto JSON por línea"""
+    names = [name for name, _ in columns]
+    converters = _text_converters(columns)
+    for batch in _batches(rows, chunk_rows):
+        yield b"".join(dumps(dict(zip(names, _convert(row, converters)))) + b"\n"
+                       for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura que entrega lo acumulado en cada bloque"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_schema(columns: Columns):
+    types = {
+        "str": pyarrow.string(),
+        "int": pyarrow.int64(),
+        "float": pyarrow.float64(),
+        "time": pyarrow.timestamp("ms"),
+    }
+    return pyarrow.schema([(name, types[kind]) for name, kind in columns])
+
+
+def encode_parquet(columns: Columns, rows: Iterable[Tuple],
+                   chunk_rows: int = DEFAULT_ROW_GROUP) -> Iterator[bytes]:
+    """Parquet por grupos de filas; el pie con los metadatos se escribe al final"""
+    if pyarrow is None:
+        raise ValueError("La exportación Parquet requiere pyarrow")
+    schema = _arrow_schema(columns)
+    times = [index for index, (_, kind) in enumerate(columns) if kind == "time"]
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in _batches(rows, chunk_rows):
+            data = [list(column) for column in zip(*batch)]
+            for index in times:
+                data[index] = [None if v is None else int(v * 1000) for v in data[index]]
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(data, schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS: Dict[str, Callable[..., Iterator[bytes]]] = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+}
+
+
+def encode(fmt: str, columns: Columns, rows: Iterable[Tuple],
+           chunk_rows: Optional[int] = None) -> Iterator[bytes]:
+    """Codificador del formato pedido (ValueError si no está disponible)"""
+    if fmt not in available_formats():
+        raise ValueError(f"Formato no soportado: {fmt}; disponibles: {', '.join(available_formats())}")
+    if chunk_rows is None:
+        return ENCODERS[fmt](columns, rows)
+    return ENCODERS[fmt](columns, rows, chunk_rows)
+
+
+def filename(dataset: str, fmt: str, now: Optional[float] = None) -> str:
+    stamp = datetime.fromtimestamp(now) if now is not None else datetime.now()
+    return f"sentinel-{dataset}-{stamp:%Y%m%d-%H%M%S}.{fmt}"
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Lector incremental del log del firewall - Sentinel Dashboard
+Seguimiento por offset persistido con soporte de rotación y truncado
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_WINDOW = 60
+DEFAULT_PORT_SCAN_THRESHOLD = 20
+DEFAULT_FLOOD_THRESHOLD = 500
+
+BLOCK_ACTIONS = frozenset((b"BLOCK", b"DROP", b"REJECT", b"DENY"))
+
+# Formato netfilter/UFW: "... [UFW BLOCK] IN=eth0 ... SRC=a.b.c.d DST=... PROTO=TCP SPT=1 DPT=22"
+# Se aplica con findall sobre el bloque completo para evitar el bucle por línea en Python
+LINE_RE = re.compile(
+    rb"^[^\n]*?\b(BLOCK|DROP|REJECT|DENY|ACCEPT|ALLOW)\b[^\n]*?"
+    rb"\bSRC=([0-9A-Fa-f.:]+)[^\n]*?\bPROTO=(\w+)(?:[^\n]*?\bDPT=(\d+))?",
+    re.MULTILINE,
+)
+
+
+class LogTailer:
+    """Lectura incremental de un archivo de log en bloques grandes"""
+
+    def __init__(self, path: str, state_path: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.state_path = state_path
+        self.chunk_size = chunk_size
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self._fh = None
+        self._load_state()
+
+    def _load_state(self):
+        """Recuperar inodo y offset persistidos"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self.inode = state.get("inode")
+            self.offset = int(state.get("offset", 0))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Estado de lectura inválido en {self.state_path}: {e}")
+
+    def save_state(self):
+        """Persistir el offset de forma atómica"""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"path": self.path, "inode": self.inode, "offset": self.offset}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _open(self, stat: os.stat_result):
+        """Abrir el archivo actual y posicionarse en el offset válido"""
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.path, 'rb')
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # Archivo nuevo (rotación) o truncado: empezar desde el principio
+            self.offset = 0
+        self.inode = stat.st_ino
+        self._fh.seek(self.offset)
+
+    def _read_chunks(self) -> Iterator[bytes]:
+        """Leer bloques que terminan en fin de línea desde el offset actual"""
+        pending = b""
+        while True:
+            data = self._fh.read(self.chunk_size)
+            if not data:
+                break
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                pending = data
+                continue
+            pending = data[cut:]
+            self.offset += cut
+            yield data[:cut]
+        # Las líneas incompletas se releen en la próxima pasada
+        if pending:
+            self._fh.seek(self.offset)
+
+    def read(self) -> Iterator[bytes]:
+        """Entregar los bloques nuevos, gestionando rotación y truncado"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        if self._fh is None:
+            self._open(stat)
+        elif stat.st_ino != self.inode:
+            # Rotado: terminar el archivo anterior antes de pasar al nuevo
+            yield from self._read_chunks()
+            self.offset = 0
+            self._open(stat)
+        elif stat.st_size < self.offset:
+            logger.info(f"Log truncado, releyendo desde el inicio: {self.path}")
+            self._open(stat)
+
+        yield from self._read_chunks()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+class FirewallLogAnalyzer:
+    """Contadores de conexiones bloqueadas y detección de escaneos/inundaciones"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW,
+                 port_scan_threshold: int = DEFAULT_PORT_SCAN_THRESHOLD,
+                 flood_threshold: int = DEFAULT_FLOOD_THRESHOLD, intel=None):
+        self.window = window
+        self.port_scan_threshold = port_scan_threshold
+        self.flood_threshold = flood_threshold
+        # Índice de indicadores (ThreatIntel): cada fuente se comprueba una vez por bloque
+        self.intel = intel
+        self.blocked_connections = 0
+        self.allowed_connections = 0
+        self.lines = 0
+        self._window_start = time.time()
+        self._blocked_by_source: Dict[bytes, int] = defaultdict(int)
+        self._ports_by_source: Dict[bytes, Set[bytes]] = defaultdict(set)
+        self._reported: Set[tuple] = set()
+
+    def _roll_window(self, now: float):
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self._blocked_by_source.clear()
+            self._ports_by_source.clear()
+            self._reported.clear()
+
+    def feed(self, chunk: bytes, now: Optional[float] = None) -> List[Dict]:
+        """Procesar un bloque de líneas y devolver las amenazas detectadas"""
+        now = time.time() if now is None else now
+        self._roll_window(now)
+        self.lines += chunk.count(b"\n")
+
+        blocked_by_source = self._blocked_by_source
+        ports_by_source = self._ports_by_source
+        touched = set()
+        allowed = set()
+        for action, src, _proto, dport in LINE_RE.findall(chunk):
+            if action in BLOCK_ACTIONS:
+                self.blocked_connections += 1
+                blocked_by_source[src] += 1
+                if dport:
+                    ports_by_source[src].add(dport)
+                touched.add(src)
+            else:
+                self.allowed_connections += 1
+                allowed.add(src)
+
+        threats = self._detect(touched, now)
+        if self.intel is not None:
+            threats.extend(self._match_intel(touched, allowed, now))
+        return threats
+
+    def _match_intel(self, blocked: Set[bytes], allowed: Set[bytes], now: float) -> List[Dict]:
+        """Amenazas por fuentes que figuran en los feeds (una vez por ventana)"""
+        threats = []
+        match = self.intel.indicators.match
+        for src in blocked | allowed:
+            if (src, "intel") in self._reported:
+                continue
+            ip = src.decode("ascii", "replace")
+            found = match(ip)
+            if found is not None:
+                self._reported.add((src, "intel"))
+                context = "Conexión permitida" if src in allowed else "Conexión bloqueada"
+                threats.append(self.intel.threat(ip, found, context, now))
+        return threats
+
+    def _detect(self, sources: Set[bytes], now: float) -> List[Dict]:
+        """Generar amenazas para las fuentes que superan los umbrales"""
+        threats = []
+        for src in sources:
+            ip = src.decode("ascii", "replace")
+            ports = len(self._ports_by_source.get(src, ()))
+            if ports >= self.port_scan_threshold and (src, "scan") not in self._reported:
+                self._reported.add((src, "scan"))
+                threats.append({
+                    "type": "intrusion",
+                    "severity": "high",
+                    "source_ip": ip,
+                    "description": f"Escaneo de puertos bloqueado: {ports} puertos en {self.window}s",
+                    "timestamp": now,
+                })
+            blocked = self._blocked_by_source[src]
+            if blocked >= self.flood_threshold and (src, "flood") not in self._reported:
+                self._reported.add((src, "flood"))
+                threats.append({
+                    "type": "intrusion",
+                    "severity": "medium",
+                    "source_ip": ip,
+                    "description": f"{blocked} conexiones bloqueadas en {self.window}s",
+                    "timestamp": now,
+                })
+        return threats
+
+
+class FirewallLogMonitor:
+    """Combina el lector incremental y el analizador"""
+
+    def __init__(self, tailer: LogTailer, analyzer: FirewallLogAnalyzer):
+        self.tailer = tailer
+        self.analyzer = analyzer
+
+    @classmethod
+    def from_config(cls, firewall_config: Dict, state_dir: str = "data",
+                    intel=None) -> "FirewallLogMonitor":
+        """Crear el monitor a partir de `security.firewall`"""
+        tailer = LogTailer(
+            firewall_config.get("log_path", "/var/log/firewall.log"),
+            state_path=os.path.join(state_dir, "firewall_log.offset"),
+            chunk_size=firewall_config.get("read_chunk_size", DEFAULT_CHUNK_SIZE),
+        )
+        analyzer = FirewallLogAnalyzer(
+            window=firewall_config.get("detection_window", DEFAULT_WINDOW),
+            port_scan_threshold=firewall_config.get("port_scan_threshold", DEFAULT_PORT_SCAN_THRESHOLD),
+            flood_threshold=firewall_config.get("flood_threshold", DEFAULT_FLOOD_THRESHOLD),
+            intel=intel,
+        )
+        return cls(tailer, analyzer)
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.tailer.path)
+
+    def poll(self) -> List[Dict]:
+        """Procesar todo lo nuevo del log; pensado para ejecutarse en un hilo"""
+        threats = []
+        for chunk in self.tailer.read():
+            threats.extend(self.analyzer.feed(chunk))
+        self.tailer.save_state()
+        return threats
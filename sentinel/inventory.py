@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Inventario de dispositivos - Sentinel Dashboard
+Fusión incremental de barridos con versiones y deltas (altas, cambios, bajas)
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from records import (DEVICE_TYPES, MANUFACTURERS, DeviceRecord, Status, format_key,
+                     ip_to_int, mac_to_int, make_key)
+
+DEFAULT_DEVICE_TIMEOUT = 300
+DEFAULT_HISTORY_SIZE = 50_000
+
+
+class DeviceInventory:
+    """Dispositivos indexados por MAC (o IP si no hay MAC) con número de versión
+
+    Los registros son DeviceRecord compactos con claves enteras; el texto
+    (IP, MAC, fechas ISO) se genera solo al renderizar.
+    """
+
+    def __init__(self, device_timeout: float = DEFAULT_DEVICE_TIMEOUT,
+                 history_size: int = DEFAULT_HISTORY_SIZE):
+        self.device_timeout = device_timeout
+        self.history_size = history_size
+        self.version = 0
+        self.records: Dict[int, DeviceRecord] = {}
+        self._by_ip: Dict[int, int] = {}
+        # clave -> versión del último cambio, ordenado por versión (incluye bajas)
+        self._history: "OrderedDict[int, int]" = OrderedDict()
+        # Versión de alta de las claves ya eliminadas (las vivas la guardan en el registro)
+        self._created: Dict[int, int] = {}
+        self._min_version = 0
+        self._delta_start = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @staticmethod
+    def render(record: DeviceRecord) -> Dict:
+        """Representación pública de un registro"""
+        return record.to_dict()
+
+    def _touch(self, key: int):
+        self.version += 1
+        self._history[key] = self.version
+        self._history.move_to_end(key)
+        # Historial acotado: las consultas anteriores a lo descartado piden resincronía
+        while len(self._history) > self.history_size:
+            old_key, old_version = self._history.popitem(last=False)
+            self._min_version = old_version
+            if old_key not in self.records:
+                self._created.pop(old_key, None)
+
+    def lookup(self, mac: Optional[str] = None, ip: Optional[str] = None) -> Optional[DeviceRecord]:
+        """Buscar por MAC o IP textuales"""
+        return self._find(mac_to_int(mac) if mac else None, ip_to_int(ip) if ip else None)
+
+    def _find(self, mac: Optional[int], ip: Optional[int]) -> Optional[DeviceRecord]:
+        if mac is not None:
+            record = self.records.get(mac)
+            if record is not None:
+                return record
+        if ip is not None:
+            key = self._by_ip.get(ip)
+            if key is not None:
+                return self.records.get(key)
+        return None
+
+    def _rekey(self, record: DeviceRecord, new_key: int):
+        """Pasar un registro indexado por IP a su MAC cuando esta se conoce"""
+        old_key = record.key
+        del self.records[old_key]
+        self._created.pop(old_key, None)
+        self._touch(old_key)
+        record.key = new_key
+        self.records[new_key] = record
+        self._touch(new_key)
+        self._created.pop(new_key, None)
+        record.created = self.version
+
+    def observe(self, result: Dict, now: Optional[float] = None) -> Optional[str]:
+        """Incorporar un host visto en el barrido; devuelve 'added', 'changed' o None"""
+        return self._observe(result, now)[1]
+
+    def _observe(self, result: Dict, now: Optional[float]):
+        now = time.time() if now is None else now
+        ip = ip_to_int(result["ip"])
+        mac = result.get("mac")
+        mac = mac_to_int(mac) if mac else None
+        record = self._find(mac, ip)
+
+        if record is None:
+            key = make_key(mac, ip)
+            record = DeviceRecord(
+                key, ip, mac, result.get("name") or None, result.get("type") or "unknown",
+                result.get("manufacturer") or "Desconocido", result.get("latency"), now,
+            )
+            self.records[key] = record
+            self._by_ip[ip] = key
+            self._touch(key)
+            self._created.pop(key, None)
+            record.created = self.version
+            return record, "added"
+
+        if mac is not None and record.key != mac:
+            self._rekey(record, mac)
+        before = record.tracked()
+        if record.ip != ip:
+            if self._by_ip.get(record.ip) == record.key:
+                del self._by_ip[record.ip]
+            record.ip = ip
+        self._by_ip[ip] = record.key
+        if mac is not None:
+            record.mac = mac
+        if result.get("name"):
+            record.name = result["name"]
+        if result.get("type"):
+            record.type = DEVICE_TYPES.intern(result["type"])
+        if result.get("manufacturer"):
+            record.manufacturer = MANUFACTURERS.intern(result["manufacturer"])
+        if record.status is not Status.ONLINE:
+            record.status = Status.ONLINE
+            record.state_changed = now
+        record.latency = result.get("latency")
+        record.last_seen = now
+
+        if record.tracked() != before:
+            self._touch(record.key)
+            return record, "changed"
+        return record, None
+
+    def expire(self, seen: Set[int], now: Optional[float] = None) -> int:
+        """Marcar offline los no vistos y eliminar los que superan device_timeout"""
+        now = time.time() if now is None else now
+        changes = 0
+        for key, record in list(self.records.items()):
+            if key in seen:
+                continue
+            if now - record.last_seen > self.device_timeout:
+                del self.records[key]
+                if self._by_ip.get(record.ip) == key:
+                    del self._by_ip[record.ip]
+                self._created[key] = record.created
+                self._touch(key)
+                changes += 1
+            elif record.status is Status.ONLINE:
+                record.status = Status.OFFLINE
+                record.state_changed = now
+                self._touch(key)
+                changes += 1
+        return changes
+
+    def merge(self, results: Iterable[Dict], now: Optional[float] = None) -> Set[int]:
+        """Fusionar un barrido completo; devuelve las claves vistas"""
+        now = time.time() if now is None else now
+        seen = set()
+        for result in results:
+            seen.add(self._observe(result, now)[0].key)
+        self.expire(seen, now)
+        return seen
+
+    def since(self, version: int) -> Dict:
+        """Cambios posteriores a `version` (resincronía completa si el historial no alcanza)"""
+        if version < self._min_version or version > self.version:
+            return {
+                "version": self.version,
+                "full": True,
+                "added": [self.render(r) for r in self.records.values()],
+                "changed": [],
+                "removed": [],
+            }
+        added, changed, removed = [], [], []
+        # Recorrer desde el final del historial hasta alcanzar la versión pedida
+        for key in reversed(self._history):
+            if self._history[key] <= version:
+                break
+            record = self.records.get(key)
+            if record is None:
+                if self._created.get(key, 0) <= version:
+                    removed.append(format_key(key))
+            elif record.created > version:
+                added.append(self.render(record))
+            else:
+                changed.append(self.render(record))
+        return {"version": self.version, "full": False,
+                "added": added, "changed": changed, "removed": removed}
+
+    def take_delta(self) -> Optional[Dict]:
+        """Cambios desde la última llamada, o None si no hubo ninguno"""
+        start, self._delta_start = self._delta_start, self.version
+        if start == self.version:
+            return None
+        return self.since(start)
+
+    def devices(self) -> List[Dict]:
+        return [self.render(r) for r in self.records.values()]
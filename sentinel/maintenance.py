@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento - Sentinel Dashboard
+Retención y compactación por lotes, copias de seguridad en línea comprimidas y rotación de logs
+"""
+
+import asyncio
+import gzip
+import logging
+import logging.handlers
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage import DEFAULT_PRUNE_BATCH, ROLLUP_STEPS, TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "sentinel-"
+COPY_CHUNK = 1 << 20
+
+
+def configure_logging(logging_config: Dict) -> Optional[logging.Handler]:
+    """Nivel, formato y archivo rotativo (logging.max_size_mb / backup_count)"""
+    root = logging.getLogger()
+    root.setLevel(logging_config.get("level", "INFO"))
+    formatter = logging.Formatter(logging_config.get(
+        "format", "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    ))
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            # Reconfiguración: no duplicar el archivo
+            root.removeHandler(handler)
+            handler.close()
+        elif isinstance(handler, logging.StreamHandler):
+            handler.setFormatter(formatter)
+            if not logging_config.get("console_output", True):
+                root.removeHandler(handler)
+    path = logging_config.get("file")
+    if not path:
+        return None
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=int(logging_config.get("max_size_mb", 100) * 1024 * 1024),
+        backupCount=logging_config.get("backup_count", 5),
+        encoding="utf-8",
+    )
+    handler.setFormatter(formatter)
+    root.addHandler(handler)
+    return handler
+
+
+class MaintenanceWorker:
+    """Tareas periódicas sobre la base de datos, las copias y los logs
+
+    La limpieza borra y compacta en lotes pequeños con pausas entre ellos,
+    de modo que el lock de la base nunca se retiene más de un lote. La copia
+    usa una conexión propia con una transacción de lectura abierta: en modo
+    WAL fija una instantánea coherente sin bloquear las escrituras.
+    """
+
+    def __init__(self, store: TimeSeriesStore, old_data_days: float = 90,
+                 cleanup_enabled: bool = True, cleanup_interval: float = 86400,
+                 log_dir: str = "logs", old_logs_days: float = 30,
+                 backup_enabled: bool = True, backup_interval: float = 3600,
+                 backup_dir: str = "backups", backup_retention: int = 7,
+                 compress: bool = True, batch_size: int = DEFAULT_PRUNE_BATCH,
+                 batch_pause: float = 0.05, vacuum_pages: int = 256,
+                 backup_pages: int = 1024, backup_pause: float = 0.005):
+        self.store = store
+        self.old_data_days = old_data_days
+        self.cleanup_enabled = cleanup_enabled
+        self.cleanup_interval = cleanup_interval
+        self.log_dir = log_dir
+        self.old_logs_days = old_logs_days
+        self.backup_enabled = backup_enabled
+        self.backup_interval = backup_interval
+        self.backup_dir = backup_dir
+        self.backup_retention = backup_retention
+        self.compress = compress
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.backup_pages = backup_pages
+        self.backup_pause = backup_pause
+        self.last_cleanup = 0.0
+        self.last_backup = 0.0
+
+    @classmethod
+    def from_config(cls, store: TimeSeriesStore, maintenance_config: Dict,
+                    logging_config: Dict, database_config: Optional[Dict] = None
+                    ) -> "MaintenanceWorker":
+        """Crear el worker a partir de las secciones `maintenance`, `logging` y `database`
+
+        `maintenance.backup` tiene prioridad; `database.backup_enabled` y
+        `database.backup_interval` se mantienen como alternativa.
+        """
+        cleanup_config = maintenance_config.get("auto_cleanup", {})
+        backup_config = maintenance_config.get("backup", {})
+        database_config = database_config or {}
+        log_file = logging_config.get("file", "logs/sentinel.log")
+        return cls(
+            store,
+            old_data_days=cleanup_config.get("old_data_days", 90),
+            cleanup_enabled=cleanup_config.get("enabled", True),
+            cleanup_interval=cleanup_config.get("interval", 86400),
+            log_dir=os.path.dirname(log_file) or ".",
+            old_logs_days=cleanup_config.get("old_logs_days", 30),
+            backup_enabled=backup_config.get(
+                "enabled", database_config.get("backup_enabled", True)),
+            backup_interval=backup_config.get(
+                "interval", database_config.get("backup_interval", 3600)),
+            backup_dir=backup_config.get("location", "backups/"),
+            backup_retention=backup_config.get("retention", 7),
+            compress=backup_config.get("compress", True),
+            batch_size=cleanup_config.get("batch_size", DEFAULT_PRUNE_BATCH),
+            batch_pause=cleanup_config.get("batch_pause", 0.05),
+            vacuum_pages=cleanup_config.get("vacuum_pages", 256),
+            backup_pages=backup_config.get("pages", 1024),
+            backup_pause=backup_config.get("pause", 0.005),
+        )
+
+    async def prune(self, now: Optional[float] = None) -> int:
+        """Eliminar muestras y agregados anteriores a old_data_days, lote a lote"""
+        now = time.time() if now is None else now
+        cutoff = now - self.old_data_days * 86400
+        total = 0
+        for step in (0,) + ROLLUP_STEPS:
+            after = ""
+            while after is not None:
+                deleted, after = await asyncio.to_thread(
+                    self.store.prune, step, cutoff, self.batch_size, after
+                )
+                total += deleted
+                await asyncio.sleep(self.batch_pause)
+        return total
+
+    async def compact(self) -> int:
+        """Liberar las páginas libres por tramos de vacuum_pages; devuelve las liberadas"""
+        mode = await asyncio.to_thread(self.store.query, "PRAGMA auto_vacuum")
+        if mode[0][0] != 2:
+            # Base creada sin auto_vacuum=INCREMENTAL: solo un VACUUM completo la compacta
+            logger.debug("Compactación omitida: la base no usa auto_vacuum incremental")
+            return 0
+        freed = 0
+        while True:
+            before = await asyncio.to_thread(self.store.query, "PRAGMA freelist_count")
+            remaining = await asyncio.to_thread(self.store.vacuum, self.vacuum_pages)
+            freed += max(0, before[0][0] - remaining)
+            if not remaining or remaining >= before[0][0]:
+                break
+            await asyncio.sleep(self.batch_pause)
+        await asyncio.to_thread(self.store.checkpoint)
+        return freed
+
+    def remove_old_logs(self, now: Optional[float] = None) -> List[str]:
+        """Borrar los logs rotados sin modificar en old_logs_days"""
+        now = time.time() if now is None else now
+        cutoff = now - self.old_logs_days * 86400
+        removed = []
+        if not os.path.isdir(self.log_dir):
+            return removed
+        for entry in os.scandir(self.log_dir):
+            if ".log" in entry.name and entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed.append(entry.path)
+        return removed
+
+    async def cleanup(self, now: Optional[float] = None) -> Dict:
+        """Retención, compactación y limpieza de logs"""
+        started = time.time()
+        rows = await self.prune(now)
+        pages = await self.compact()
+        logs = await asyncio.to_thread(self.remove_old_logs, now)
+        self.last_cleanup = time.time()
+        logger.info(f"Mantenimiento: {rows} filas antiguas, {pages} páginas liberadas, "
+                    f"{len(logs)} logs eliminados en {self.last_cleanup - started:.1f}s")
+        return {"rows": rows, "pages": pages, "logs": len(logs)}
+
+    def backups(self) -> List[str]:
+        """Copias existentes, de la más reciente a la más antigua"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [name for name in os.listdir(self.backup_dir)
+                 if name.startswith(BACKUP_PREFIX) and (name.endswith(".db") or name.endswith(".db.gz"))]
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def backup(self, now: Optional[float] = None) -> Optional[str]:
+        """Copia coherente de la base (comprimida con gzip si procede); devuelve la ruta"""
+        source_path = self.store.path
+        if not source_path or source_path == ":memory:":
+            return None
+        stamp = datetime.fromtimestamp(time.time() if now is None else now)
+        os.makedirs(self.backup_dir, exist_ok=True)
+        target = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{stamp:%Y%m%d-%H%M%S}.db")
+        snapshot = target + ".tmp"
+        started = time.time()
+
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True, isolation_level=None)
+        destination = sqlite3.connect(snapshot)
+        try:
+            # La transacción de lectura fija la instantánea: las escrituras que
+            # lleguen durante la copia no la reinician
+            source.execute("BEGIN")
+            source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            source.backup(destination, pages=self.backup_pages, sleep=self.backup_pause)
+            source.execute("COMMIT")
+        except Exception:
+            destination.close()
+            os.remove(snapshot)
+            raise
+        finally:
+            source.close()
+        destination.close()
+
+        if self.compress:
+            target += ".gz"
+            partial = target + ".tmp"
+            with open(snapshot, "rb") as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+            os.replace(partial, target)
+            os.remove(snapshot)
+        else:
+            os.replace(snapshot, target)
+        self.last_backup = time.time()
+        removed = self.rotate_backups()
+        logger.info(f"Copia de seguridad {target} en {self.last_backup - started:.1f}s "
+                    f"({os.path.getsize(target) // 1024} KiB, {len(removed)} antiguas eliminadas)")
+        return target
+
+    def rotate_backups(self) -> List[str]:
+        """Conservar solo las `backup_retention` copias más recientes"""
+        removed = self.backups()[max(1, self.backup_retention):]
+        for path in removed:
+            os.remove(path)
+        return removed
+
+    async def run(self, poll: float = 60.0):
+        """Tarea de fondo: ejecutar cada trabajo cuando vence su intervalo"""
+        while True:
+            now = time.time()
+            if self.backup_enabled and now - self.last_backup >= self.backup_interval:
+                try:
+                    await asyncio.to_thread(self.backup)
+                except Exception as e:
+                    self.last_backup = now
+                    logger.error(f"Error en la copia de seguridad: {e}")
+            if self.cleanup_enabled and now - self.last_cleanup >= self.cleanup_interval:
+                try:
+                    await self.cleanup()
+                except Exception as e:
+                    self.last_cleanup = now
+                    logger.error(f"Error en el mantenimiento de la base: {e}")
+            await asyncio.sleep(poll)
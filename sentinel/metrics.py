@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Métricas internas - Sentinel Dashboard
+Contadores, medidores e histogramas de buckets fijos en formato de exposición Prometheus
+"""
+
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base común: nombre, ayuda, etiquetas e hijos por combinación de etiquetas"""
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 _labelvalues: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._labelvalues = _labelvalues
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def labels(self, *values) -> "_Metric":
+        """Hijo para una combinación de etiquetas (se crea una sola vez)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+            child = self._children[key] = self._new_child(key)
+        return child
+
+    def _new_child(self, labelvalues: Tuple[str, ...]) -> "_Metric":
+        return type(self)(self.name, self.documentation, (), labelvalues)
+
+    def set_function(self, function: Callable[[], float]):
+        """Leer el valor de una función en el momento de exponer"""
+        self._function = function
+
+    def _label_text(self, extra: Iterable[Tuple[str, str]] = (), names=None, values=None) -> str:
+        pairs = list(zip(names or (), values or ())) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        for values, metric in self._series():
+            lines.extend(metric._samples(self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    TYPE = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def get(self) -> float:
+        return self._function() if self._function is not None else self.value
+
+    def _samples(self, names, values) -> List[str]:
+        return [f"{self.name}{self._label_text(names=names, values=values)} {_format_value(self.get())}"]
+
+
+class Gauge(Counter):
+    """Valor que sube y baja"""
+
+    TYPE = "gauge"
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos: observe() es una bisección y dos sumas"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 _labelvalues: Tuple[str, ...] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, _labelvalues)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _new_child(self, labelvalues):
+        return Histogram(self.name, self.documentation, (), labelvalues, self.buckets)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def _samples(self, names, values) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            labels = self._label_text([("le", _format_value(bound))], names, values)
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = self._label_text(names=names, values=values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas con creación idempotente por nombre"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, documentation: str, labelnames=(), **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Texto en formato de exposición Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram):
+    """Decorador que registra la duración de funciones síncronas o asíncronas"""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Latencia y conteo por ruta (plantilla, no URL concreta) y código de estado"""
+
+    def __init__(self, app, duration: Histogram, requests: Counter):
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            # El router de FastAPI deja la ruta resuelta en el scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "other"
+            self.duration.labels(scope["method"], path).observe(elapsed)
+            self.requests.labels(scope["method"], path, status[0]).inc()
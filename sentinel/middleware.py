@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Middleware HTTP - Sentinel Dashboard
+Limitación de peticiones por token bucket y compresión gzip/brotli negociada
+"""
+
+import asyncio
+import gzip
+import logging
+import math
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_MINUTE = 100
+DEFAULT_BURST_SIZE = 20
+DEFAULT_MAX_BUCKETS = 100_000
+DEFAULT_EXEMPT_PATHS = ("/static/", "/health")
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+DEFAULT_CACHE_ENTRIES = 32
+DEFAULT_OFFLOAD_SIZE = 256 * 1024
+
+# Bucket de los clientes que presentan la API key configurada
+API_KEY_CLIENT = "key"
+
+COMPRESSIBLE_TYPES = (
+    b"application/json", b"text/", b"application/javascript", b"image/svg+xml",
+    b"application/x-ndjson", b"application/xml",
+)
+
+
+class RateLimiter:
+    """Token buckets por cliente; sin cerrojos porque todo ocurre en el loop"""
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 burst_size: int = DEFAULT_BURST_SIZE, enabled: bool = False,
+                 max_buckets: int = DEFAULT_MAX_BUCKETS):
+        self.enabled = enabled
+        self.max_buckets = max_buckets
+        self.api_key: Optional[str] = None
+        # (tokens/s, ráfaga) del bucket de la API key; por defecto el general
+        self.key_limits: Optional[Tuple[float, float]] = None
+        self.exempt_paths: Tuple[str, ...] = DEFAULT_EXEMPT_PATHS
+        self.buckets: Dict[str, List[float]] = {}
+        self.rejected = 0
+        self._set_rate(requests_per_minute, burst_size)
+        self._next_eviction = 0.0
+
+    def _set_rate(self, requests_per_minute: float, burst_size: int,
+                  key_limits: Optional[Tuple[float, float]] = None):
+        self.rate = requests_per_minute / 60.0
+        self.burst = float(max(1, burst_size))
+        self.key_limits = key_limits
+        # Un bucket inactivo este tiempo está lleno: borrarlo no cambia nada
+        self.idle_ttl = max(burst / rate if rate > 0 else 3600.0
+                            for rate, burst in (self.limits(""), self.limits(API_KEY_CLIENT)))
+
+    def limits(self, key: str) -> Tuple[float, float]:
+        """(tokens/s, ráfaga) del bucket indicado"""
+        if key == API_KEY_CLIENT and self.key_limits is not None:
+            return self.key_limits
+        return self.rate, self.burst
+
+    def configure(self, performance_config: Dict, api_config: Optional[Dict] = None):
+        """Aplicar `performance.rate_limiting` e `integration.api` (key y rate_limit)"""
+        limits = performance_config.get("rate_limiting", {})
+        api_config = api_config or {}
+        self.enabled = limits.get("enabled", False)
+        burst = limits.get("burst_size", DEFAULT_BURST_SIZE)
+        key_rpm = api_config.get("rate_limit")
+        self._set_rate(limits.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE), burst,
+                       (key_rpm / 60.0, float(max(1, api_config.get("burst_size", burst))))
+                       if key_rpm else None)
+        self.exempt_paths = tuple(limits.get("exempt_paths", DEFAULT_EXEMPT_PATHS))
+        key = api_config.get("key")
+        # Una clave sin resolver ("${API_KEY}") no identifica a nadie
+        self.api_key = key if key and not key.startswith("${") else None
+        self.buckets.clear()
+
+    def client_key(self, scope: Dict) -> str:
+        """Clave del bucket: la API key configurada si se presenta, si no la IP"""
+        if self.api_key is not None:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-api-key" and value.decode("latin-1") == self.api_key:
+                    return API_KEY_CLIENT
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Consumir un token; devuelve 0 si se permite o los segundos de espera"""
+        now = time.monotonic() if now is None else now
+        if now >= self._next_eviction or len(self.buckets) > self.max_buckets:
+            self.evict_idle(now)
+
+        rate, burst = self.limits(key)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [burst - 1.0, now]
+            return 0.0
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        self.rejected += 1
+        return (1.0 - tokens) / rate if rate > 0 else 60.0
+
+    def evict_idle(self, now: float) -> int:
+        """Eliminar buckets que ya se habrían rellenado por completo"""
+        cutoff = now - self.idle_ttl
+        idle = [key for key, bucket in self.buckets.items() if bucket[1] < cutoff]
+        for key in idle:
+            del self.buckets[key]
+        self._next_eviction = now + self.idle_ttl
+        return len(idle)
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que responde 429 antes de llegar a la aplicación"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter
+        if scope["type"] != "http" or not limiter.enabled or \
+                scope["path"].startswith(limiter.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        wait = limiter.acquire(limiter.client_key(scope))
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        body = b'{"detail":"Too Many Requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class Compressor:
+    """Parámetros de compresión compartidos por el middleware
+
+    Las instantáneas en caché se sirven con el mismo objeto bytes hasta que
+    cambian: su versión comprimida se guarda junto a ese objeto y no se
+    vuelve a calcular en cada petición.
+    """
+
+    def __init__(self, enabled: bool = False, minimum_size: int = DEFAULT_MIN_SIZE,
+                 gzip_level: int = DEFAULT_GZIP_LEVEL,
+                 brotli_quality: int = DEFAULT_BROTLI_QUALITY,
+                 cache_entries: int = DEFAULT_CACHE_ENTRIES,
+                 offload_size: int = DEFAULT_OFFLOAD_SIZE):
+        self.enabled = enabled
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self.offload_size = offload_size
+        # (codificación, id del cuerpo) -> (cuerpo, comprimido)
+        self._cache: "OrderedDict[Tuple[str, int], Tuple[bytes, bytes]]" = OrderedDict()
+
+    def configure(self, performance_config: Dict):
+        """Aplicar `performance.enable_compression` y `performance.compression`"""
+        self.enabled = performance_config.get("enable_compression", False)
+        options = performance_config.get("compression", {})
+        self.minimum_size = options.get("min_size", DEFAULT_MIN_SIZE)
+        self.gzip_level = options.get("gzip_level", DEFAULT_GZIP_LEVEL)
+        self.brotli_quality = options.get("brotli_quality", DEFAULT_BROTLI_QUALITY)
+        self.cache_entries = options.get("cache_entries", DEFAULT_CACHE_ENTRIES)
+        self.offload_size = options.get("offload_size", DEFAULT_OFFLOAD_SIZE)
+        self._cache.clear()
+
+    @staticmethod
+    def negotiate(accept_encoding: str) -> Optional[str]:
+        """Elegir br o gzip según Accept-Encoding (respetando q=0)"""
+        offered = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            offered[name.strip().lower()] = quality
+        if brotli is not None and offered.get("br", 0) > 0:
+            return "br"
+        if offered.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def compress(self, encoding: str, data: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, self.gzip_level, mtime=0)
+
+    async def compress_body(self, encoding: str, data: bytes) -> bytes:
+        """Comprimir un cuerpo completo, reutilizando el resultado si es el mismo objeto
+
+        Los cuerpos grandes que no están en caché se comprimen en un hilo para no
+        detener el loop.
+        """
+        key = (encoding, id(data))
+        cached = self._cache.get(key)
+        # Se guarda una referencia al cuerpo: su id no puede reutilizarse mientras tanto
+        if cached is not None and cached[0] is data:
+            self._cache.move_to_end(key)
+            return cached[1]
+        if len(data) >= self.offload_size:
+            compressed = await asyncio.to_thread(self.compress, encoding, data)
+        else:
+            compressed = self.compress(encoding, data)
+        if self.cache_entries > 0:
+            self._cache[key] = (data, compressed)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def stream(self, encoding: str):
+        """Compresor incremental para respuestas por partes"""
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compresión negociada con umbral de tamaño"""
+
+    def __init__(self, app, compressor: Compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.compressor.enabled:
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = self.compressor.negotiate(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self.compressor, encoding, send).run(self.app, scope, receive)
+
+
+class _CompressedResponse:
+    """Estado de una respuesta: decide al ver el primer bloque del cuerpo"""
+
+    def __init__(self, compressor: Compressor, encoding: str, send):
+        self.compressor = compressor
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Dict] = None
+        self.mode: Optional[str] = None  # "identity", "whole" o "stream"
+        self.process = self.finish = None
+
+    async def run(self, app, scope, receive):
+        await app(scope, receive, self.wrapped_send)
+
+    def _eligible(self) -> bool:
+        headers = dict(self.start.get("headers", ()))
+        if b"content-encoding" in headers or self.start["status"] < 200 or \
+                self.start["status"] in (204, 304):
+            return False
+        content_type = headers.get(b"content-type", b"")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _headers(self, length: Optional[int]) -> List:
+        headers = [(k, v) for k, v in self.start.get("headers", ())
+                   if k not in (b"content-length", b"vary")]
+        # Conservar el Vary de la aplicación (p. ej. Origin para CORS)
+        vary = [v for k, v in self.start.get("headers", ()) if k == b"vary"]
+        if not any(item.strip().lower() in (b"accept-encoding", b"*")
+                   for value in vary for item in value.split(b",")):
+            vary.append(b"Accept-Encoding")
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b", ".join(vary)))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
+
+    async def wrapped_send(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            return
+        if kind != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.mode is None:
+            if not self._eligible() or (not more and len(body) < self.compressor.minimum_size):
+                self.mode = "identity"
+                await self.send(self.start)
+            elif not more:
+                self.mode = "whole"
+                compressed = await self.compressor.compress_body(self.encoding, body)
+                await self.send(dict(self.start, headers=self._headers(len(compressed))))
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            else:
+                self.mode = "stream"
+                self.process, self.finish = self.compressor.stream(self.encoding)
+                await self.send(dict(self.start, headers=self._headers(None)))
+
+        if self.mode == "identity":
+            await self.send(message)
+        elif self.mode == "stream":
+            chunk = self.process(body)
+            if not more:
+                chunk += self.finish()
+            if chunk or not more:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": more})
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Índice de fabricantes OUI - Sentinel Dashboard
+Tabla hash compacta en disco (mmap) para resolver MAC -> fabricante por prefijos de 24/28/36 bits
+"""
+
+import csv
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from records import mac_to_int
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_SOURCES = (str(BASE_DIR / "config" / "oui.csv"),)
+DEFAULT_INDEX_PATH = str(BASE_DIR / "data" / "oui.idx")
+
+MAGIC = b"SNTLOUI1"
+# magic, slots, vendors, names_size, parents
+HEADER = struct.Struct("<8sIIII")
+HEADER_SIZE = 32
+
+# Longitud del prefijo según los dígitos de la columna Assignment (MA-L, MA-M, MA-S)
+PREFIX_BITS = {6: 24, 7: 28, 9: 36}
+GOLDEN = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+MISSING = object()
+
+
+def _slot_key(bits: int, prefix: int) -> int:
+    # Nunca 0: el 0 marca las ranuras vacías
+    return (bits << 56) | prefix
+
+
+def _hash(key: int, shift: int) -> int:
+    return ((key * GOLDEN) & MASK64) >> shift
+
+
+def read_sources(paths: Iterable[str]) -> List[Tuple[int, int, str]]:
+    """Leer CSV del IEEE (oui.csv, mam.csv, oui36.csv): (bits, prefijo, fabricante)"""
+    entries = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue
+                assignment = row[1].strip()
+                bits = PREFIX_BITS.get(len(assignment))
+                if bits is None:
+                    continue  # cabecera o línea inválida
+                try:
+                    prefix = int(assignment, 16)
+                except ValueError:
+                    continue
+                entries.append((bits, prefix, row[2].strip()))
+    return entries
+
+
+def build_index(entries: Sequence[Tuple[int, int, str]], index_path: str) -> int:
+    """Escribir el índice binario de forma atómica; devuelve el número de prefijos"""
+    vendors: Dict[str, int] = {}
+    table: Dict[int, int] = {}
+    parents = set()
+    for bits, prefix, name in entries:
+        vendor = vendors.setdefault(name, len(vendors))
+        table[_slot_key(bits, prefix)] = vendor
+        if bits > 24:
+            parents.add(prefix >> (bits - 24))
+
+    slots = 8
+    while slots < 2 * len(table):
+        slots *= 2
+    shift = 64 - (slots.bit_length() - 1)
+    keys = [0] * slots
+    values = [0] * slots
+    for key, vendor in table.items():
+        slot = _hash(key, shift)
+        while keys[slot]:
+            slot = (slot + 1) & (slots - 1)
+        keys[slot] = key
+        values[slot] = vendor
+
+    names = [name.encode("utf-8") for name in vendors]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    blob = b"".join(names)
+
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(HEADER.pack(MAGIC, slots, len(names), len(blob), len(parents)).ljust(HEADER_SIZE, b"\0"))
+        f.write(struct.pack(f"<{slots}Q", *keys))
+        f.write(struct.pack(f"<{slots}I", *values))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(struct.pack(f"<{len(parents)}I", *sorted(parents)))
+        f.write(blob)
+    os.replace(tmp_path, index_path)
+    return len(table)
+
+
+class VendorIndex:
+    """Resolución MAC -> fabricante sobre un índice mapeado en memoria
+
+    El índice se construye (o reconstruye si los CSV son más nuevos) y se
+    mapea en la primera consulta; las páginas solo se cargan al tocarlas.
+    """
+
+    def __init__(self, sources: Sequence[str] = DEFAULT_SOURCES,
+                 index_path: str = DEFAULT_INDEX_PATH):
+        self.sources = [str(s) for s in sources]
+        self.index_path = index_path
+        self.loaded = False
+        self._mmap: Optional[mmap.mmap] = None
+        self._keys = self._values = self._offsets = self._blob = None
+        self._names: Dict[int, str] = {}
+        self._parents: frozenset = frozenset()
+        # Fabricante por OUI de 24 bits: una red tiene pocos fabricantes distintos
+        self._cache: Dict[int, Optional[str]] = {}
+        self._shift = 64
+        self._mask = 0
+
+    @classmethod
+    def from_config(cls, oui_config: Dict) -> "VendorIndex":
+        """Crear el índice a partir de `network.oui` (rutas relativas al directorio de la aplicación)"""
+        return cls(
+            sources=[str(BASE_DIR / s) for s in oui_config.get("sources", DEFAULT_SOURCES)],
+            index_path=str(BASE_DIR / oui_config.get("index_path", DEFAULT_INDEX_PATH)),
+        )
+
+    def _stale(self) -> bool:
+        try:
+            built = os.path.getmtime(self.index_path)
+        except OSError:
+            return True
+        return any(os.path.getmtime(s) > built for s in self.sources if os.path.exists(s))
+
+    def load(self):
+        """Construir el índice si hace falta y mapearlo en memoria"""
+        sources = [s for s in self.sources if os.path.exists(s)]
+        if not sources:
+            logger.warning("Sin archivos OUI: los fabricantes quedarán como desconocidos")
+        elif self._stale():
+            count = build_index(read_sources(sources), self.index_path)
+            logger.info(f"Índice OUI construido: {count} prefijos en {self.index_path}")
+        self.close()
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map(memoryview(self._mmap))
+        self.loaded = True
+
+    def _map(self, view: memoryview):
+        magic, slots, vendors, names_size, parents = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"Índice OUI inválido: {self.index_path}")
+        position = HEADER_SIZE
+        self._keys = view[position:position + 8 * slots].cast("Q")
+        position += 8 * slots
+        self._values = view[position:position + 4 * slots].cast("I")
+        position += 4 * slots
+        self._offsets = view[position:position + 4 * (vendors + 1)].cast("I")
+        position += 4 * (vendors + 1)
+        self._parents = frozenset(view[position:position + 4 * parents].cast("I"))
+        position += 4 * parents
+        self._blob = view[position:position + names_size]
+        self._mask = slots - 1
+        self._shift = 64 - (slots.bit_length() - 1)
+
+    def _name(self, vendor: int) -> str:
+        name = self._names.get(vendor)
+        if name is None:
+            start, end = self._offsets[vendor], self._offsets[vendor + 1]
+            name = self._names[vendor] = bytes(self._blob[start:end]).decode("utf-8")
+        return name
+
+    def _probe(self, bits: int, prefix: int) -> Optional[str]:
+        keys = self._keys
+        if keys is None:
+            return None
+        key = _slot_key(bits, prefix)
+        slot = _hash(key, self._shift)
+        while True:
+            current = keys[slot]
+            if current == key:
+                return self._name(self._values[slot])
+            if not current:
+                return None
+            slot = (slot + 1) & self._mask
+
+    def lookup(self, mac: Union[str, int, None]) -> Optional[str]:
+        """Fabricante de una MAC (texto o entero de 48 bits), o None"""
+        if mac is None:
+            return None
+        if not self.loaded:
+            self.load()
+        value = mac_to_int(mac) if isinstance(mac, str) else mac
+        # Bit de administración local: MAC aleatoria o virtual, sin fabricante
+        if value >> 41 & 1:
+            return None
+        oui = value >> 24
+        if oui in self._parents:
+            # Bloques MA-S (36 bits) y MA-M (28 bits) dentro de un OUI del IEEE RA
+            vendor = self._probe(36, value >> 12) or self._probe(28, value >> 20)
+            if vendor is not None:
+                return vendor
+        vendor = self._cache.get(oui, MISSING)
+        if vendor is MISSING:
+            vendor = self._cache[oui] = self._probe(24, oui)
+        return vendor
+
+    def lookup_many(self, macs: Iterable[Union[str, int, None]]) -> List[Optional[str]]:
+        lookup = self.lookup
+        return [lookup(mac) for mac in macs]
+
+    def close(self):
+        """Liberar el mapeo (las vistas deben soltarse antes que el mmap)"""
+        for view in (self._keys, self._values, self._offsets, self._blob):
+            if view is not None:
+                view.release()
+        self._keys = self._values = self._offsets = self._blob = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._names.clear()
+        self._cache.clear()
+        self.loaded = False
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Pinger ICMP/TCP - Sentinel Dashboard
+Un único socket ICMP multiplexado por número de secuencia
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_COUNT = 3
+DEFAULT_INTERVAL = 0.05
+DEFAULT_TCP_PORTS = (443, 80)
+DEFAULT_MAX_CONCURRENT = 50
+DNS_CACHE_TTL = 60.0
+
+# Latencia (ms) a partir de la cual un host se reporta como "warning"
+WARNING_LATENCY_MS = 100
+
+
+def icmp_checksum(data: bytes) -> int:
+    """Checksum de Internet (RFC 1071)"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = b"sentinel") -> bytes:
+    """Construir un paquete ICMP echo request"""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def summarize_rtts(rtts: Sequence[Optional[float]]) -> Dict:
+    """Calcular min/avg/max/jitter/pérdida a partir de las muestras (None = perdida)"""
+    received = [r for r in rtts if r is not None]
+    sent = len(rtts)
+    loss = round(100.0 * (sent - len(received)) / sent, 1) if sent else 100.0
+    if not received:
+        return {"min": None, "avg": None, "max": None, "jitter": None, "loss": loss}
+    jitter = 0.0
+    if len(received) > 1:
+        jitter = sum(abs(b - a) for a, b in zip(received, received[1:])) / (len(received) - 1)
+    return {
+        "min": round(min(received), 2),
+        "avg": round(sum(received) / len(received), 2),
+        "max": round(max(received), 2),
+        "jitter": round(jitter, 2),
+        "loss": loss,
+    }
+
+
+class Pinger:
+    """Pinger asíncrono con un socket ICMP compartido y respaldo por TCP"""
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        count: int = DEFAULT_COUNT,
+        interval: float = DEFAULT_INTERVAL,
+        tcp_ports: Sequence[int] = DEFAULT_TCP_PORTS,
+        use_icmp: bool = True,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+    ):
+        self.timeout = timeout
+        self.count = count
+        self.interval = interval
+        self.tcp_ports = tuple(tcp_ports)
+        self.use_icmp = use_icmp
+        self.max_concurrent = max(1, int(max_concurrent))
+        # Conexiones TCP de respaldo simultáneas (cada una ocupa un descriptor)
+        self._tcp_slots: Optional[asyncio.Semaphore] = None
+        self.ident = os.getpid() & 0xFFFF
+        self.method: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._raw = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = 0
+        self._pending: Dict[int, Tuple[asyncio.Future, float]] = {}
+        self._dns_cache: Dict[str, Tuple[str, float]] = {}
+
+    @classmethod
+    def from_config(cls, network_config: Dict) -> "Pinger":
+        """Crear un pinger a partir de la sección `network` de la configuración"""
+        ping_config = network_config.get("ping", {})
+        return cls(
+            timeout=ping_config.get("timeout", DEFAULT_TIMEOUT),
+            count=ping_config.get("count", DEFAULT_COUNT),
+            interval=ping_config.get("interval", DEFAULT_INTERVAL),
+            tcp_ports=ping_config.get("tcp_ports", DEFAULT_TCP_PORTS),
+            use_icmp=ping_config.get("use_icmp", True),
+            max_concurrent=ping_config.get(
+                "max_concurrent", network_config.get("max_concurrent_scans", DEFAULT_MAX_CONCURRENT)
+            ),
+        )
+
+    def _open_socket(self):
+        """Abrir el socket ICMP (sin privilegios o raw) en el loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self.close()
+        self._loop = loop
+        self._tcp_slots = asyncio.Semaphore(self.max_concurrent)
+        self.method = "tcp"
+        if not self.use_icmp:
+            return
+
+        for sock_type, raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            self._sock = sock
+            self._raw = raw
+            self.method = "icmp"
+            loop.add_reader(sock.fileno(), self._on_readable)
+            logger.info(f"Pinger ICMP activo ({'raw' if raw else 'sin privilegios'})")
+            return
+        logger.info("ICMP no disponible, usando temporización de conexión TCP")
+
+    def close(self):
+        """Cerrar el socket y cancelar los ecos pendientes"""
+        if self._sock is not None:
+            try:
+                if self._loop is not None and not self._loop.is_closed():
+                    self._loop.remove_reader(self._sock.fileno())
+            finally:
+                self._sock.close()
+                self._sock = None
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        self._loop = None
+
+    def _on_readable(self):
+        """Despachar todas las respuestas disponibles a sus futuros"""
+        while True:
+            try:
+                packet, _ = self._sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"Error leyendo socket ICMP: {e}")
+                return
+            received_at = time.perf_counter()
+
+            if self._raw:
+                packet = packet[(packet[0] & 0x0F) * 4:]
+            if len(packet) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", packet[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Con sockets sin privilegios el kernel reescribe el identificador
+            if self._raw and ident != self.ident:
+                continue
+            entry = self._pending.pop(seq, None)
+            if entry is None:
+                continue
+            future, sent_at = entry
+            if not future.done():
+                future.set_result((received_at - sent_at) * 1000)
+
+    def _next_seq(self) -> int:
+        """Siguiente número de secuencia libre (16 bits)"""
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._pending:
+                return self._seq
+        raise RuntimeError("Demasiados ecos ICMP en vuelo")
+
+    async def _resolve(self, host: str) -> str:
+        """Resolver un nombre a IPv4 con caché"""
+        try:
+            socket.inet_aton(host)
+            return host
+        except OSError:
+            pass
+        cached = self._dns_cache.get(host)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            return cached[0]
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, family=socket.AF_INET, type=socket.SOCK_STREAM
+        )
+        ip = infos[0][4][0]
+        self._dns_cache[host] = (ip, now + DNS_CACHE_TTL)
+        return ip
+
+    async def _icmp_echo(self, ip: str) -> Optional[float]:
+        """Enviar un eco ICMP y esperar su respuesta"""
+        loop = asyncio.get_running_loop()
+        seq = self._next_seq()
+        future = loop.create_future()
+        self._pending[seq] = (future, time.perf_counter())
+        try:
+            self._sock.sendto(build_echo_request(self.ident, seq), (ip, 0))
+            return await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self._pending.pop(seq, None)
+
+    async def _tcp_echo(self, ip: str) -> Optional[float]:
+        """Medir el tiempo de establecimiento TCP (RST también cuenta)"""
+        for port in self.tcp_ports:
+            async with self._tcp_slots:
+                start = time.perf_counter()
+                try:
+                    _, writer = await asyncio.wait_for(
+                        asyncio.open_connection(ip, port), self.timeout
+                    )
+                    writer.close()
+                except ConnectionRefusedError:
+                    pass
+                except (asyncio.TimeoutError, OSError):
+                    continue
+                return (time.perf_counter() - start) * 1000
+        return None
+
+    async def ping(self, host: str, count: Optional[int] = None) -> Dict:
+        """Hacer ping a un host y devolver estadísticas"""
+        self._open_socket()
+        count = count or self.count
+        try:
+            ip = await self._resolve(host)
+        except OSError:
+            return {"host": host, "ip": None, "method": self.method, "sent": count,
+                    "status": "offline", "latency": None,
+                    **summarize_rtts([None] * count)}
+
+        echo = self._icmp_echo if self._sock is not None else self._tcp_echo
+        tasks = []
+        for i in range(count):
+            if i and self.interval:
+                await asyncio.sleep(self.interval)
+            tasks.append(asyncio.ensure_future(echo(ip)))
+        rtts = await asyncio.gather(*tasks)
+
+        stats = summarize_rtts(rtts)
+        if stats["avg"] is None:
+            status = "offline"
+        elif stats["avg"] < WARNING_LATENCY_MS:
+            status = "online"
+        else:
+            status = "warning"
+        return {
+            "host": host,
+            "ip": ip,
+            "method": self.method,
+            "sent": count,
+            "status": status,
+            "latency": stats["avg"],
+            **stats,
+        }
+
+    async def ping_many(self, hosts: Iterable[str], count: Optional[int] = None) -> List[Dict]:
+        """Hacer ping a muchos hosts en paralelo sobre el mismo socket"""
+        self._open_socket()
+        return list(await asyncio.gather(*(self.ping(host, count) for host in hosts)))
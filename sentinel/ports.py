@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Auditoría de puertos - Sentinel Dashboard
+Sondeo TCP/UDP no bloqueante de network.monitored_ports
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPEN = "open"
+CLOSED = "closed"
+FILTERED = "filtered"
+
+DEFAULT_MAX_CONCURRENT = 200
+DEFAULT_INITIAL_TIMEOUT = 1.0
+DEFAULT_MIN_TIMEOUT = 0.1
+DEFAULT_MAX_TIMEOUT = 3.0
+
+# Cargas útiles UDP que provocan respuesta en servicios conocidos
+UDP_PAYLOADS = {
+    # Consulta DNS estándar: "." tipo NS
+    53: b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x01",
+}
+
+
+def unique_ports(monitored_ports: Iterable[Dict]) -> List[Dict]:
+    """Eliminar entradas repetidas por (puerto, protocolo), conservando la primera"""
+    seen = set()
+    unique = []
+    for entry in monitored_ports:
+        key = (int(entry["port"]), entry.get("protocol", "tcp").lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(entry)
+    return unique
+
+
+class RttEstimator:
+    """Timeout adaptativo por host (SRTT + 4*RTTVAR, como RFC 6298)"""
+
+    def __init__(self, initial: float, minimum: float, maximum: float):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._state: Dict[str, Tuple[float, float]] = {}
+
+    def timeout(self, host: str) -> float:
+        state = self._state.get(host)
+        if state is None:
+            return self.initial
+        srtt, rttvar = state
+        return min(self.maximum, max(self.minimum, srtt + 4 * rttvar))
+
+    def observe(self, host: str, rtt: float):
+        state = self._state.get(host)
+        if state is None:
+            self._state[host] = (rtt, rtt / 2)
+            return
+        srtt, rttvar = state
+        rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+        srtt = 0.875 * srtt + 0.125 * rtt
+        self._state[host] = (srtt, rttvar)
+
+
+class _UdpProbeProtocol(asyncio.DatagramProtocol):
+    """Protocolo que resuelve un futuro con el resultado de un sondeo UDP"""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(OPEN)
+
+    def error_received(self, exc):
+        # ICMP port unreachable llega como ConnectionRefusedError
+        if not self.future.done():
+            self.future.set_result(CLOSED if isinstance(exc, ConnectionRefusedError) else FILTERED)
+
+
+async def probe_tcp(host: str, port: int, timeout: float) -> str:
+    """Clasificar un puerto TCP con un connect() no bloqueante"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return FILTERED
+    except ConnectionRefusedError:
+        return CLOSED
+    except OSError:
+        return FILTERED
+    writer.close()
+    return OPEN
+
+
+async def probe_udp(host: str, port: int, timeout: float) -> str:
+    """Clasificar un puerto UDP; sin respuesta se considera filtrado"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpProbeProtocol(future), remote_addr=(host, port)
+        )
+    except OSError:
+        return FILTERED
+    try:
+        transport.sendto(UDP_PAYLOADS.get(port, b""))
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return FILTERED
+    finally:
+        transport.close()
+
+
+class PortAuditor:
+    """Auditoría concurrente de hosts × puertos con límite global de concurrencia"""
+
+    def __init__(
+        self,
+        monitored_ports: Iterable[Dict],
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        initial_timeout: float = DEFAULT_INITIAL_TIMEOUT,
+        min_timeout: float = DEFAULT_MIN_TIMEOUT,
+        max_timeout: float = DEFAULT_MAX_TIMEOUT,
+    ):
+        self.ports = unique_ports(monitored_ports)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.rtt = RttEstimator(initial_timeout, min_timeout, max_timeout)
+
+    @classmethod
+    def from_config(cls, network_config: Dict) -> "PortAuditor":
+        """Crear un auditor a partir de la sección `network` de la configuración"""
+        audit_config = network_config.get("port_audit", {})
+        return cls(
+            network_config.get("monitored_ports", []),
+            max_concurrent=audit_config.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+            initial_timeout=audit_config.get("initial_timeout", DEFAULT_INITIAL_TIMEOUT),
+            min_timeout=audit_config.get("min_timeout", DEFAULT_MIN_TIMEOUT),
+            max_timeout=audit_config.get("max_timeout", DEFAULT_MAX_TIMEOUT),
+        )
+
+    async def probe(self, host: str, entry: Dict) -> Dict:
+        """Sondear un puerto de un host y clasificar el resultado"""
+        port = int(entry["port"])
+        protocol = entry.get("protocol", "tcp").lower()
+        timeout = self.rtt.timeout(host)
+        start = time.perf_counter()
+        if protocol == "udp":
+            status = await probe_udp(host, port, timeout)
+        else:
+            status = await probe_tcp(host, port, timeout)
+        elapsed = time.perf_counter() - start
+
+        # Solo las respuestas reales alimentan el estimador de RTT
+        if status != FILTERED:
+            self.rtt.observe(host, elapsed)
+
+        expected = entry.get("expected_status")
+        return {
+            "host": host,
+            "port": port,
+            "protocol": protocol,
+            "name": entry.get("name", str(port)),
+            "status": status,
+            "expected_status": expected,
+            "critical": bool(entry.get("critical", False)),
+            "compliant": expected is None or expected == status,
+            "rtt_ms": round(elapsed * 1000, 2) if status != FILTERED else None,
+        }
+
+    async def audit(self, hosts: Iterable[str]) -> List[Dict]:
+        """Sondear todos los hosts × puertos únicos con concurrencia acotada"""
+        hosts = list(hosts)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        results: List[Dict] = []
+        tasks = set()
+
+        async def worker(host: str, entry: Dict):
+            try:
+                results.append(await self.probe(host, entry))
+            except Exception as e:
+                logger.debug(f"Error sondeando {host}:{entry.get('port')}: {e}")
+            finally:
+                semaphore.release()
+
+        try:
+            # Recorrer por puerto y luego por host reparte la carga entre hosts
+            for entry in self.ports:
+                for host in hosts:
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(worker(host, entry))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+
+        results.sort(key=lambda r: (r["host"], r["port"], r["protocol"]))
+        return results
+
+    @staticmethod
+    def deviations(results: Iterable[Dict]) -> List[Dict]:
+        """Resultados cuyo estado difiere del esperado"""
+        return [r for r in results if not r["compliant"]]
+
+
+def summarize_audit(results: List[Dict], hosts: List[str], ports: int,
+                    timestamp: Optional[str] = None) -> Dict:
+    """Construir el resumen de auditoría que expone la API"""
+    deviations = PortAuditor.deviations(results)
+    return {
+        "hosts": hosts,
+        "ports_checked": ports,
+        "probes": len(results),
+        "deviations": deviations,
+        "total_deviations": len(deviations),
+        "critical_deviations": len([d for d in deviations if d["critical"]]),
+        "timestamp": timestamp,
+    }
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Analizador del log del proxy - Sentinel Dashboard
+Clasificación por categorías, bloqueos y tasa de aciertos de caché (formatos de Squid)
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from firewall_log import DEFAULT_CHUNK_SIZE, LogTailer
+from threat_intel import IndicatorSet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY_DIR = str(Path(__file__).parent / "config" / "proxy_categories")
+DEFAULT_WINDOW = 3600
+DEFAULT_RESOLUTION = 60
+DEFAULT_WORKERS = 2
+DEFAULT_PARALLEL_THRESHOLD_MB = 64
+DEFAULT_RANGE_SIZE = 32 << 20
+TOP_ENTRIES = 20
+HOST_CACHE_SIZE = 65536
+
+# Formato nativo: "time elapsed client code/status bytes method URL user hierarchy type"
+SQUID_RE = re.compile(
+    rb"^\s*(\d+)(?:\.\d+)?\s+-?\d+\s+(\S+)\s+([A-Z_]+)/(\d{3})\s+(\d+)\s+\S+\s+"
+    rb"(?:[A-Za-z][\w+.-]*://)?(?:[^@/\s]*@)?\[?([^\]/:\s]+)",
+    re.MULTILINE,
+)
+# logformat common/combined de Squid: 'client - user [fecha] "GET URL HTTP/1.1" status bytes ... Ss:Sh'
+COMMON_RE = re.compile(
+    rb'^(\S+) \S+ \S+ \[([^\]]+)\] "\S+ (?:[A-Za-z][\w+.-]*://)?(?:[^@/\s"]*@)?\[?([^\]/:\s"]+)'
+    rb'[^"]*" (\d{3}) (\d+|-)(?:[^\n]* ([A-Z_]+):[A-Z_]+)?[ \t]*\r?$',
+    re.MULTILINE,
+)
+LOG_FORMATS = ("squid", "common")
+
+# Contadores de cada bucket
+REQUESTS, BLOCKED, HITS, MISSES, BYTES, HIT_BYTES = range(6)
+FIELDS = ("requests", "blocked", "hits", "misses", "bytes", "hit_bytes")
+
+# Resultado de caché según el código de Squid: 1 = acierto, 2 = fallo, 0 = no cacheable
+_CACHE_KINDS: Dict[bytes, int] = {}
+
+
+def cache_kind(code: bytes) -> int:
+    kind = _CACHE_KINDS.get(code)
+    if kind is None:
+        if b"HIT" in code or code == b"TCP_REFRESH_UNMODIFIED":
+            kind = 1
+        elif b"MISS" in code or code.startswith(b"TCP_REFRESH"):
+            kind = 2
+        else:
+            kind = 0  # TCP_TUNNEL (CONNECT), TCP_DENIED, NONE...
+        _CACHE_KINDS[code] = kind
+    return kind
+
+
+def load_categories(feeds: Dict[str, str]) -> IndicatorSet:
+    """Índice dominio -> categoría: cada lista cubre también los subdominios"""
+    return IndicatorSet.load({name: path for name, path in feeds.items() if os.path.exists(path)})
+
+
+def empty_summary() -> Dict:
+    return {"lines": 0, "unparsed": 0, "buckets": {}, "categories": Counter(),
+            "clients": Counter(), "domains": Counter()}
+
+
+def merge_summaries(summaries: Iterable[Dict]) -> Dict:
+    """Combinar resúmenes parciales (de bloques o de procesos)"""
+    merged = empty_summary()
+    buckets = merged["buckets"]
+    for summary in summaries:
+        merged["lines"] += summary["lines"]
+        merged["unparsed"] += summary["unparsed"]
+        for bucket, counts in summary["buckets"].items():
+            current = buckets.get(bucket)
+            if current is None:
+                buckets[bucket] = list(counts)
+            else:
+                for index, value in enumerate(counts):
+                    current[index] += value
+        for key in ("categories", "clients", "domains"):
+            merged[key].update(summary[key])
+    return merged
+
+
+class ProxyLogParser:
+    """Interpreta bloques de líneas y los resume por bucket de tiempo
+
+    Cada línea cuesta un número fijo de operaciones de diccionario: la
+    categoría de cada host se resuelve una vez y queda en caché.
+    """
+
+    def __init__(self, categories: Optional[IndicatorSet] = None,
+                 blocked_categories: Sequence[str] = (), log_format: str = "squid",
+                 resolution: int = DEFAULT_RESOLUTION):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Formato de log de proxy desconocido: {log_format}")
+        self.categories = categories if categories is not None else IndicatorSet().freeze()
+        self.blocked_categories = frozenset(blocked_categories)
+        self.log_format = log_format
+        self.resolution = resolution
+        self._hosts: Dict[bytes, Optional[str]] = {}
+        self._dates: Dict[bytes, int] = {}
+
+    def _category(self, host: bytes) -> Optional[str]:
+        found = self.categories.match(host.decode("ascii", "replace"))
+        if len(self._hosts) >= HOST_CACHE_SIZE:
+            self._hosts.clear()
+        category = self._hosts[host] = found[1] if found is not None else None
+        return category
+
+    def _epoch(self, stamp: bytes) -> int:
+        """Fecha de common log ("18/Oct/2026:13:45:00 +0000") a epoch, con caché"""
+        epoch = self._dates.get(stamp)
+        if epoch is None:
+            if len(self._dates) >= HOST_CACHE_SIZE:
+                self._dates.clear()
+            epoch = self._dates[stamp] = int(
+                datetime.strptime(stamp.decode("ascii"), "%d/%b/%Y:%H:%M:%S %z").timestamp()
+            )
+        return epoch
+
+    def _records(self, chunk: bytes) -> Iterable[Tuple[int, bytes, bytes, bytes, bytes]]:
+        """(epoch, cliente, código, bytes, host) de cada línea reconocida"""
+        if self.log_format == "squid":
+            for ts, client, code, _status, size, host in SQUID_RE.findall(chunk):
+                yield int(ts), client, code, size, host
+        else:
+            epoch = self._epoch
+            for client, stamp, host, status, size, code in COMMON_RE.findall(chunk):
+                if not code:
+                    code = b"TCP_DENIED" if status == b"403" else b"NONE"
+                yield epoch(stamp), client, code, size if size != b"-" else b"0", host
+
+    def parse(self, chunk: bytes) -> Dict:
+        """Resumen de un bloque de líneas completas"""
+        summary = empty_summary()
+        buckets = summary["buckets"]
+        categories = summary["categories"]
+        clients = summary["clients"]
+        domains = summary["domains"]
+        hosts = self._hosts
+        blocked_categories = self.blocked_categories
+        resolution = self.resolution
+        parsed = 0
+        for ts, client, code, size, host in self._records(chunk):
+            parsed += 1
+            bucket = ts - ts % resolution
+            counts = buckets.get(bucket)
+            if counts is None:
+                counts = buckets[bucket] = [0, 0, 0, 0, 0, 0]
+            size = int(size)
+            counts[REQUESTS] += 1
+            counts[BYTES] += size
+            kind = _CACHE_KINDS.get(code)
+            if kind is None:
+                kind = cache_kind(code)
+            if kind == 1:
+                counts[HITS] += 1
+                counts[HIT_BYTES] += size
+            elif kind == 2:
+                counts[MISSES] += 1
+            category = hosts.get(host, False)
+            if category is False:
+                category = self._category(host)
+            if category is not None:
+                categories[category] += 1
+            if code.startswith(b"TCP_DENIED") or category in blocked_categories:
+                counts[BLOCKED] += 1
+                clients[client] += 1
+                domains[host] += 1
+        summary["lines"] = chunk.count(b"\n")
+        summary["unparsed"] = summary["lines"] - parsed
+        return summary
+
+
+# --- Análisis en paralelo (funciones de los procesos del pool) ----------------------
+
+_worker_parsers: Dict[Tuple, ProxyLogParser] = {}
+
+
+def _worker_parser(options: Tuple) -> ProxyLogParser:
+    """Parser del proceso actual; las categorías se cargan una vez por proceso"""
+    parser = _worker_parsers.get(options)
+    if parser is None:
+        feeds, blocked, log_format, resolution = options
+        parser = _worker_parsers[options] = ProxyLogParser(
+            load_categories(dict(feeds)), blocked, log_format, resolution
+        )
+    return parser
+
+
+def parse_range(path: str, start: int, end: int, options: Tuple) -> Dict:
+    """Resumen de las líneas de [start, end) del archivo (límites en fin de línea)"""
+    return read_range(_worker_parser(options), path, start, end)
+
+
+def read_range(parser: ProxyLogParser, path: str, start: int, end: int,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Interpretar [start, end) por bloques con el parser dado"""
+    summaries = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        pending = b""
+        position = start
+        while position < end:
+            data = f.read(min(chunk_size, end - position))
+            if not data:
+                break
+            position += len(data)
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+            if cut:
+                summaries.append(parser.parse(data[:cut]))
+        if pending:
+            summaries.append(parser.parse(pending + b"\n"))
+    return merge_summaries(summaries)
+
+
+def split_ranges(path: str, start: int, end: int, size: int = DEFAULT_RANGE_SIZE) -> List[Tuple[int, int]]:
+    """Partir [start, end) en tramos de ~size bytes que terminan en fin de línea"""
+    ranges = []
+    with open(path, "rb") as f:
+        while start < end:
+            cut = min(start + size, end)
+            if cut < end:
+                f.seek(cut)
+                tail = f.readline()
+                cut = min(cut + len(tail), end)
+            ranges.append((start, cut))
+            start = cut
+    return ranges
+
+
+def last_line_end(path: str, size: int) -> int:
+    """Offset tras el último fin de línea antes de `size` (la última línea puede estar a medias)"""
+    with open(path, "rb") as f:
+        position = size
+        while position > 0:
+            step = min(DEFAULT_CHUNK_SIZE, position)
+            f.seek(position - step)
+            data = f.read(step)
+            newline = data.rfind(b"\n")
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+class SlidingCounters:
+    """Contadores por bucket en un anillo de window/resolution posiciones (más el bucket en curso)"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, resolution: int = DEFAULT_RESOLUTION):
+        self.window = window
+        self.resolution = resolution
+        self.size = max(1, window // resolution) + 1
+        self.buckets = [-1] * self.size
+        self.counts = [[0] * len(FIELDS) for _ in range(self.size)]
+        self.latest = -1
+
+    def add(self, bucket: int, counts: Sequence[int]):
+        slot = (bucket // self.resolution) % self.size
+        current = self.buckets[slot]
+        if bucket > current:
+            # El bucket que ocupaba la posición salió de la ventana
+            self.buckets[slot] = bucket
+            self.counts[slot] = list(counts)
+        elif bucket == current:
+            row = self.counts[slot]
+            for index, value in enumerate(counts):
+                row[index] += value
+        else:
+            return
+        if bucket > self.latest:
+            self.latest = bucket
+
+    def totals(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Sumas de los buckets que se solapan con la ventana que termina en `now`"""
+        now = time.time() if now is None else now
+        oldest = now - self.window - self.resolution
+        totals = [0] * len(FIELDS)
+        for bucket, counts in zip(self.buckets, self.counts):
+            if oldest < bucket <= now:
+                for index, value in enumerate(counts):
+                    totals[index] += value
+        return dict(zip(FIELDS, totals))
+
+
+class ProxyLogAnalyzer:
+    """Ventana deslizante de bloqueos y caché más acumulados por categoría"""
+
+    def __init__(self, parser: ProxyLogParser, window: int = DEFAULT_WINDOW):
+        self.parser = parser
+        self.window = SlidingCounters(window, parser.resolution)
+        self.lines = 0
+        self.unparsed = 0
+        self.requests = 0
+        self.blocked = 0
+        self.categories: Counter = Counter()
+        self.clients: Counter = Counter()
+        self.domains: Counter = Counter()
+
+    def apply(self, summary: Dict):
+        """Incorporar un resumen (de este proceso o del pool)"""
+        self.lines += summary["lines"]
+        self.unparsed += summary["unparsed"]
+        for bucket in sorted(summary["buckets"]):
+            counts = summary["buckets"][bucket]
+            self.requests += counts[REQUESTS]
+            self.blocked += counts[BLOCKED]
+            self.window.add(bucket, counts)
+        self.categories.update(summary["categories"])
+        self.clients.update(summary["clients"])
+        self.domains.update(summary["domains"])
+        # Acotar la memoria: basta con los más frecuentes
+        for counter in (self.clients, self.domains):
+            if len(counter) > 50 * TOP_ENTRIES:
+                kept = counter.most_common(TOP_ENTRIES * 10)
+                counter.clear()
+                counter.update(dict(kept))
+
+    def feed(self, chunk: bytes):
+        self.apply(self.parser.parse(chunk))
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        window = self.window.totals(now)
+        lookups = window["hits"] + window["misses"]
+        return {
+            "window_seconds": self.window.window,
+            "window": window,
+            "cache_hit_ratio": round(window["hits"] / lookups, 4) if lookups else None,
+            "byte_hit_ratio": round(window["hit_bytes"] / window["bytes"], 4) if window["bytes"] else None,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "lines": self.lines,
+            "unparsed": self.unparsed,
+            "categories": dict(self.categories.most_common()),
+            "top_blocked_clients": [(c.decode("ascii", "replace"), n)
+                                    for c, n in self.clients.most_common(TOP_ENTRIES)],
+            "top_blocked_domains": [(d.decode("ascii", "replace"), n)
+                                    for d, n in self.domains.most_common(TOP_ENTRIES)],
+        }
+
+
+class ProxyLogMonitor:
+    """Sigue el access.log; un atraso grande se reparte entre varios procesos"""
+
+    def __init__(self, tailer: LogTailer, analyzer: ProxyLogAnalyzer,
+                 category_feeds: Optional[Dict[str, str]] = None, workers: int = DEFAULT_WORKERS,
+                 parallel_threshold: int = DEFAULT_PARALLEL_THRESHOLD_MB << 20,
+                 range_size: int = DEFAULT_RANGE_SIZE):
+        self.tailer = tailer
+        self.analyzer = analyzer
+        self.category_feeds = dict(category_feeds or {})
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.range_size = range_size
+
+    @classmethod
+    def from_config(cls, proxy_config: Dict, state_dir: str = "data") -> "ProxyLogMonitor":
+        """Crear el monitor a partir de `security.proxy`
+
+        Cada categoría se lee de `<category_dir>/<categoría>.txt` (un dominio por
+        línea) salvo que `category_feeds` indique otra ruta.
+        """
+        category_dir = proxy_config.get("category_dir", DEFAULT_CATEGORY_DIR)
+        blocked = proxy_config.get("blocked_categories", [])
+        feeds = {name: os.path.join(category_dir, f"{name}.txt") for name in blocked}
+        feeds.update(proxy_config.get("category_feeds", {}))
+        resolution = proxy_config.get("resolution", DEFAULT_RESOLUTION)
+        parser = ProxyLogParser(load_categories(feeds), blocked,
+                                proxy_config.get("log_format", "squid"), resolution)
+        tailer = LogTailer(
+            proxy_config.get("log_path", "/var/log/squid/access.log"),
+            state_path=os.path.join(state_dir, "proxy_log.offset"),
+            chunk_size=proxy_config.get("read_chunk_size", DEFAULT_CHUNK_SIZE),
+        )
+        return cls(
+            tailer,
+            ProxyLogAnalyzer(parser, proxy_config.get("window", DEFAULT_WINDOW)),
+            category_feeds=feeds,
+            workers=proxy_config.get("workers", DEFAULT_WORKERS),
+            parallel_threshold=proxy_config.get("parallel_threshold_mb", DEFAULT_PARALLEL_THRESHOLD_MB) << 20,
+        )
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.tailer.path)
+
+    @property
+    def filtering(self) -> bool:
+        """Hay listas cargadas para alguna categoría bloqueada"""
+        return len(self.analyzer.parser.categories) > 0
+
+    def _options(self) -> Tuple:
+        parser = self.analyzer.parser
+        return (tuple(sorted(self.category_feeds.items())), tuple(sorted(parser.blocked_categories)),
+                parser.log_format, parser.resolution)
+
+    def analyze_file(self, path: str, start: int = 0, end: Optional[int] = None) -> Dict:
+        """Resumen de [start, end) de un archivo repartido en tramos entre procesos"""
+        end = last_line_end(path, os.path.getsize(path)) if end is None else end
+        ranges = split_ranges(path, start, end, self.range_size)
+        if self.workers <= 1 or len(ranges) <= 1:
+            parser = self.analyzer.parser
+            return merge_summaries(read_range(parser, path, a, b) for a, b in ranges)
+        # spawn: el proceso principal tiene hilos (SQLite, to_thread)
+        with ProcessPoolExecutor(min(self.workers, len(ranges)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(parse_range, path, a, b, self._options()) for a, b in ranges]
+            return merge_summaries(future.result() for future in futures)
+
+    def _catch_up(self):
+        """Procesar en paralelo el atraso si supera parallel_threshold"""
+        try:
+            stat = os.stat(self.tailer.path)
+        except FileNotFoundError:
+            return
+        start = self.tailer.offset
+        if stat.st_ino != self.tailer.inode or stat.st_size < start:
+            start = 0
+        if self.workers <= 1 or stat.st_size - start < self.parallel_threshold:
+            return
+        end = last_line_end(self.tailer.path, stat.st_size)
+        started = time.time()
+        summary = self.analyze_file(self.tailer.path, start, end)
+        self.analyzer.apply(summary)
+        # El lector continúa desde el final del tramo procesado
+        self.tailer.close()
+        self.tailer.inode = stat.st_ino
+        self.tailer.offset = end
+        logger.info(f"Log del proxy: {summary['lines']} líneas atrasadas procesadas con "
+                    f"{self.workers} procesos en {time.time() - started:.1f}s")
+
+    def poll(self):
+        """Procesar todo lo nuevo del log; pensado para ejecutarse en un hilo"""
+        self._catch_up()
+        for chunk in self.tailer.read():
+            self.analyzer.feed(chunk)
+        self.tailer.save_state()
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        return dict(self.analyzer.stats(now), available=self.available, filtering=self.filtering)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Registros compactos - Sentinel Dashboard
+Dispositivos con __slots__, IPs y MACs como enteros y cadenas internadas
+"""
+
+import ipaddress
+import socket
+import sys
+from enum import Enum
+from typing import Dict, Optional, Union
+
+from serialization import iso_timestamp
+
+# Las claves del inventario son enteros: MAC (48 bits) o IP desplazada por encima
+IP_KEY_OFFSET = 1 << 48
+# Las IPv6 se marcan por encima de 2**128 para no confundirlas con IPv4
+IPV6_FLAG = 1 << 128
+
+_inet_aton = socket.inet_aton
+_from_bytes = int.from_bytes
+
+
+class Status(str, Enum):
+    """Estado de un dispositivo; los miembros son únicos en memoria"""
+    ONLINE = "online"
+    OFFLINE = "offline"
+
+
+def ip_to_int(ip: str) -> int:
+    """IP textual a entero (camino rápido para IPv4)"""
+    try:
+        return _from_bytes(_inet_aton(ip), "big") if ip.count(".") == 3 else _ipv6_to_int(ip)
+    except OSError:
+        return _ipv6_to_int(ip)
+
+
+def _ipv6_to_int(ip: str) -> int:
+    address = ipaddress.ip_address(ip)
+    value = int(address)
+    return value | IPV6_FLAG if address.version == 6 else value
+
+
+def int_to_ip(value: int) -> str:
+    if value >= IPV6_FLAG:
+        return str(ipaddress.IPv6Address(value - IPV6_FLAG))
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+def mac_to_int(mac: str) -> int:
+    """MAC con ':' o '-' (cualquier caja) a entero de 48 bits"""
+    return int(mac.replace(":", "").replace("-", ""), 16)
+
+
+def int_to_mac(value: int) -> str:
+    return value.to_bytes(6, "big").hex(":")
+
+
+def make_key(mac: Optional[int], ip: int) -> int:
+    return mac if mac is not None else ip + IP_KEY_OFFSET
+
+
+def format_key(key: int) -> str:
+    """Clave pública: la MAC o, si no se conoce, la IP"""
+    return int_to_mac(key) if key < IP_KEY_OFFSET else int_to_ip(key - IP_KEY_OFFSET)
+
+
+class Vocabulary:
+    """Valores repetidos (fabricantes, tipos) compartidos como una sola cadena"""
+
+    def __init__(self, *values: str):
+        self._values: Dict[str, str] = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value: str) -> str:
+        shared = self._values.get(value)
+        if shared is None:
+            shared = self._values[value] = sys.intern(value)
+        return shared
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+DEVICE_TYPES = Vocabulary("unknown", "router", "switch", "access_point", "computer",
+                          "server", "printer", "phone", "camera", "iot")
+MANUFACTURERS = Vocabulary("Desconocido")
+
+
+class DeviceRecord:
+    """Dispositivo del inventario; se convierte a JSON solo en el borde de la API"""
+
+    __slots__ = ("key", "ip", "mac", "name", "type", "status", "manufacturer",
+                 "latency", "first_seen", "last_seen", "state_changed", "created")
+
+    def __init__(self, key: int, ip: int, mac: Optional[int], name: Optional[str],
+                 type: str, manufacturer: str, latency: Optional[float], now: float):
+        self.key = key
+        self.ip = ip
+        self.mac = mac
+        # Sin nombre propio se muestra la IP: no se guarda una copia por registro
+        self.name = name
+        self.type = DEVICE_TYPES.intern(type)
+        self.status = Status.ONLINE
+        self.manufacturer = MANUFACTURERS.intern(manufacturer)
+        self.latency = latency
+        self.first_seen = now
+        self.last_seen = now
+        self.state_changed = now
+        # Versión del inventario en la que se dio de alta
+        self.created = 0
+
+    @property
+    def ip_text(self) -> str:
+        return int_to_ip(self.ip)
+
+    def tracked(self) -> tuple:
+        """Campos cuyo cambio genera un delta (latencia y last_seen no)"""
+        return (self.ip, self.mac, self.name, self.type, self.status, self.manufacturer)
+
+    def to_dict(self) -> Dict[str, Union[str, float, None]]:
+        """Representación pública, idéntica a la de los registros en diccionario"""
+        ip = int_to_ip(self.ip)
+        mac = int_to_mac(self.mac) if self.mac is not None else None
+        return {
+            "key": mac if self.key == self.mac else format_key(self.key),
+            "ip": ip,
+            "mac": mac,
+            "name": self.name or ip,
+            "type": self.type,
+            "status": self.status.value,
+            "manufacturer": self.manufacturer,
+            "latency": self.latency,
+            "first_seen": iso_timestamp(self.first_seen),
+            "last_seen": iso_timestamp(self.last_seen),
+            "state_changed": iso_timestamp(self.state_changed),
+        }
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Informes programados - Sentinel Dashboard
+Disponibilidad, latencia, amenazas y cumplimiento de puertos calculados en un pool de procesos
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_OUTPUT_DIR = "data/reports"
+DEFAULT_RUN_AT = "00:15"
+DEFAULT_WEEKLY_DAY = 0  # lunes
+TOP_SOURCES = 50
+
+PERIODS = {"daily": 1, "weekly": 7}
+
+
+# --- Funciones de los procesos del pool (solo reciben y devuelven datos simples) ---
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Conexión de solo lectura: los procesos del pool nunca escriben"""
+    return sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+
+
+def aggregate_day(db_path: str, start: float, end: float) -> Dict:
+    """Agregado combinable de un día: series horarias y amenazas en [start, end)"""
+    conn = _connect(db_path)
+    try:
+        series = {
+            name: {"count": count, "sum": total, "min": low, "max": high}
+            for name, count, total, low, high in conn.execute(
+                """SELECT series, SUM(count), SUM(sum), MIN(min), MAX(max) FROM ts_rollup
+                   WHERE step = 3600 AND bucket >= ? AND bucket < ?
+                     AND (series LIKE 'ping.%' OR series LIKE 'inventory.%' OR series LIKE 'ports.%')
+                   GROUP BY series""",
+                (int(start), int(end)),
+            )
+        }
+        threats = {"total": 0, "severity": Counter(), "type": Counter(), "sources": Counter()}
+        for severity, type_, count in conn.execute(
+            """SELECT severity, type, COUNT(*) FROM threat_events
+               WHERE ts >= ? AND ts < ? GROUP BY severity, type""",
+            (start, end),
+        ):
+            threats["total"] += count
+            threats["severity"][severity] += count
+            threats["type"][type_] += count
+        threats["sources"].update(dict(conn.execute(
+            """SELECT source_ip, COUNT(*) AS n FROM threat_events
+               WHERE ts >= ? AND ts < ? AND source_ip IS NOT NULL
+               GROUP BY source_ip ORDER BY n DESC LIMIT ?""",
+            (start, end, TOP_SOURCES),
+        ).fetchall()))
+    except sqlite3.OperationalError as e:
+        # Base todavía sin tablas (instalación nueva): día vacío
+        logger.warning(f"Sin historial para el informe: {e}")
+        series, threats = {}, {"total": 0, "severity": {}, "type": {}, "sources": {}}
+    finally:
+        conn.close()
+    return {"start": start, "end": end, "series": series,
+            "threats": {k: dict(v) if isinstance(v, Counter) else v for k, v in threats.items()}}
+
+
+def merge_aggregates(aggregates: Sequence[Dict]) -> Dict:
+    """Combinar agregados diarios (sumas, mínimos y máximos; amenazas sumadas)"""
+    series: Dict[str, Dict] = {}
+    threats = {"total": 0, "severity": Counter(), "type": Counter(), "sources": Counter()}
+    for aggregate in aggregates:
+        for name, data in aggregate["series"].items():
+            merged = series.get(name)
+            if merged is None:
+                series[name] = dict(data)
+                continue
+            merged["count"] += data["count"]
+            merged["sum"] += data["sum"]
+            merged["min"] = min(merged["min"], data["min"])
+            merged["max"] = max(merged["max"], data["max"])
+        threats["total"] += aggregate["threats"]["total"]
+        for key in ("severity", "type", "sources"):
+            threats[key].update(aggregate["threats"][key])
+    return {
+        "start": min((a["start"] for a in aggregates), default=None),
+        "end": max((a["end"] for a in aggregates), default=None),
+        "series": series,
+        "threats": threats,
+    }
+
+
+def _mean(data: Optional[Dict]) -> Optional[float]:
+    if not data or not data["count"]:
+        return None
+    return data["sum"] / data["count"]
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def render_report(period: str, aggregates: Sequence[Dict]) -> Dict:
+    """Informe final a partir de los agregados diarios del periodo"""
+    merged = merge_aggregates(aggregates)
+    series = merged["series"]
+    targets = sorted({name.split(".", 1)[1].rsplit(".", 1)[0]
+                      for name in series if name.startswith("ping.")})
+
+    availability = {}
+    latency = {}
+    for target in targets:
+        up = _mean(series.get(f"ping.{target}.up"))
+        availability[target] = _round(up * 100 if up is not None else None)
+        stats = series.get(f"ping.{target}.latency")
+        latency[target] = {
+            "avg_ms": _round(_mean(stats)),
+            "min_ms": _round(stats["min"]) if stats else None,
+            "max_ms": _round(stats["max"]) if stats else None,
+        }
+
+    total = _mean(series.get("inventory.total"))
+    online = _mean(series.get("inventory.online"))
+    probes = series.get("ports.probes", {}).get("sum", 0)
+    deviations = series.get("ports.deviations", {}).get("sum", 0)
+    threats = merged["threats"]
+
+    return {
+        "period": period,
+        "start": datetime.fromtimestamp(merged["start"]).isoformat() if merged["start"] else None,
+        "end": datetime.fromtimestamp(merged["end"]).isoformat() if merged["end"] else None,
+        "days": len(aggregates),
+        "availability": {
+            "targets": availability,
+            "devices_online_pct": _round(100 * online / total) if total and online is not None else None,
+            "devices_avg": _round(total),
+        },
+        "latency": {
+            "targets": latency,
+            "devices_avg_ms": _round(_mean(series.get("inventory.latency"))),
+        },
+        "threats": {
+            "total": threats["total"],
+            "by_severity": dict(threats["severity"]),
+            "by_type": dict(threats["type"]),
+            "top_sources": dict(threats["sources"].most_common(10)),
+        },
+        "ports": {
+            "probes": int(probes),
+            "deviations": int(deviations),
+            "compliance_pct": _round(100 * (1 - deviations / probes)) if probes else None,
+            "critical_max": _round(series["ports.critical"]["max"]) if "ports.critical" in series else None,
+        },
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+# --- Proceso principal --------------------------------------------------------------
+
+class AggregateCache(SQLiteStore):
+    """Agregados diarios ya calculados (solo días cerrados)"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS report_aggregates (
+            day TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            created REAL NOT NULL
+        ) WITHOUT ROWID""",
+    )
+
+    def get_many(self, days: Sequence[str]) -> Dict[str, Dict]:
+        if not days:
+            return {}
+        marks = ",".join("?" * len(days))
+        rows = self.query(f"SELECT day, data FROM report_aggregates WHERE day IN ({marks})", list(days))
+        return {day: json.loads(data) for day, data in rows}
+
+    def put(self, day: str, aggregate: Dict):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO report_aggregates (day, data, created) VALUES (?, ?, ?)",
+                (day, json.dumps(aggregate), time.time()),
+            )
+
+
+def day_bounds(day: date):
+    """Inicio y fin (epoch, hora local) de un día"""
+    start = datetime.combine(day, datetime.min.time())
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+class ReportGenerator:
+    """Informes diarios y semanales; la agregación corre en un ProcessPoolExecutor
+
+    El loop solo espera futuros: el trabajo pesado sobre el historial ocurre
+    en otros procesos y no compite con /ws/network.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, run_at: str = DEFAULT_RUN_AT,
+                 weekly_day: int = DEFAULT_WEEKLY_DAY):
+        self.db_path = db_path
+        self.max_workers = max(1, int(max_workers))
+        self.output_dir = output_dir
+        self.run_at = run_at
+        self.weekly_day = weekly_day
+        self.cache = AggregateCache(db_path)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Días agregados en el pool (el resto salió de la caché)
+        self.computed = 0
+
+    @classmethod
+    def from_config(cls, db_path: str, performance_config: Dict,
+                    reporting_config: Dict) -> "ReportGenerator":
+        """Crear el generador a partir de `performance` y `reporting`"""
+        return cls(
+            db_path,
+            max_workers=performance_config.get("max_workers", DEFAULT_MAX_WORKERS),
+            output_dir=reporting_config.get("output_dir", DEFAULT_OUTPUT_DIR),
+            run_at=reporting_config.get("run_at", DEFAULT_RUN_AT),
+            weekly_day=reporting_config.get("weekly_day", DEFAULT_WEEKLY_DAY),
+        )
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # spawn: hacer fork de un proceso con hilos (SQLite, to_thread) no es seguro
+            self.executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def _run(self, function, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), function, *args)
+        except BrokenProcessPool:
+            # Un proceso murió (OOM, señal): el pool no se recupera solo
+            self.executor = None
+            raise
+
+    async def aggregates(self, days: Sequence[date], now: Optional[float] = None) -> List[Dict]:
+        """Agregados de los días pedidos: caché para los cerrados, pool para el resto"""
+        now = time.time() if now is None else now
+        keys = [day.isoformat() for day in days]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+        missing = [(key, day) for key, day in zip(keys, days) if key not in cached]
+        if missing:
+            results = await asyncio.gather(*(
+                self._run(aggregate_day, self.db_path, *day_bounds(day)) for _, day in missing
+            ))
+            self.computed += len(missing)
+            for (key, _), aggregate in zip(missing, results):
+                cached[key] = aggregate
+                if aggregate["end"] <= now:
+                    await asyncio.to_thread(self.cache.put, key, aggregate)
+        return [cached[key] for key in keys]
+
+    async def generate(self, period: str, first_day: date, now: Optional[float] = None) -> Dict:
+        """Informe diario o semanal que empieza en `first_day`"""
+        if period not in PERIODS:
+            raise ValueError(f"Periodo desconocido: {period}; use {', '.join(PERIODS)}")
+        days = [first_day + timedelta(days=offset) for offset in range(PERIODS[period])]
+        aggregates = await self.aggregates(days, now)
+        return await self._run(render_report, period, aggregates)
+
+    def write(self, report: Dict, first_day: date) -> str:
+        """Guardar el informe como JSON (escritura atómica)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{report['period']}-{first_day.isoformat()}.json")
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def next_run(self, now: Optional[float] = None) -> float:
+        """Próxima ejecución diaria a la hora `run_at` (local)"""
+        current = datetime.fromtimestamp(time.time() if now is None else now)
+        hour, minute = (int(part) for part in self.run_at.split(":"))
+        target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= current:
+            target += timedelta(days=1)
+        return target.timestamp()
+
+    async def run_once(self, today: Optional[date] = None) -> List[str]:
+        """Informe de ayer y, el día configurado, el de la semana anterior"""
+        today = today or date.today()
+        yesterday = today - timedelta(days=1)
+        paths = [self.write(await self.generate("daily", yesterday), yesterday)]
+        if today.weekday() == self.weekly_day:
+            week_start = today - timedelta(days=7)
+            paths.append(self.write(await self.generate("weekly", week_start), week_start))
+        return paths
+
+    async def run(self):
+        """Tarea de fondo: generar los informes cada día a la hora configurada"""
+        while True:
+            await asyncio.sleep(max(1.0, self.next_run() - time.time()))
+            try:
+                for path in await self.run_once():
+                    logger.info(f"Informe generado: {path}")
+            except Exception as e:
+                logger.error(f"Error generando informes: {e}")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.cache.close()
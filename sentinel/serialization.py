@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Serialización JSON - Sentinel Dashboard
+Codificador rápido opcional (orjson o msgspec) con respaldo en la biblioteca estándar
+"""
+
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, TypedDict
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec es opcional
+    msgspec = None
+
+MEDIA_TYPE = "application/json"
+
+
+class Device(TypedDict):
+    """Dispositivo del inventario tal como lo sirve la API"""
+    key: str
+    ip: str
+    mac: Optional[str]
+    name: str
+    type: str
+    status: str
+    manufacturer: str
+    latency: Optional[float]
+    first_seen: Optional[str]
+    last_seen: Optional[str]
+    state_changed: Optional[str]
+
+
+class Threat(TypedDict, total=False):
+    """Amenaza registrada"""
+    id: int
+    type: str
+    severity: str
+    source_ip: Optional[str]
+    description: Optional[str]
+    timestamp: str
+
+
+class NetworkStats(TypedDict, total=False):
+    """Estadísticas de red (simuladas o contadores SNMP)"""
+    packets_in: int
+    packets_out: int
+    bytes_in: int
+    bytes_out: int
+    errors: int
+    in_bps: float
+    out_bps: float
+    source: str
+    timestamp: str
+
+
+class DevicesSnapshot(TypedDict):
+    devices: List[Device]
+    version: int
+    total: int
+    online: int
+    timestamp: str
+
+
+class ThreatsSnapshot(TypedDict):
+    threats: List[Threat]
+    total: int
+    critical: int
+    timestamp: str
+
+
+def _default(value: Any) -> Any:
+    """Tipos sin representación JSON nativa (conjuntos, fechas, etc.)"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value: Any) -> bytes:
+        """Serializar a JSON compacto en UTF-8"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(value: Any) -> bytes:
+        """Serializar a JSON compacto en UTF-8"""
+        return _encoder.encode(value)
+
+    def loads(data: Any) -> Any:
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Mismo contrato que json.loads para quien captura ValueError
+            raise ValueError(str(e)) from e
+else:
+    BACKEND = "json"
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+    def dumps(value: Any) -> bytes:
+        """Serializar a JSON compacto en UTF-8"""
+        return _encoder.encode(value).encode("utf-8")
+
+    loads = json.loads
+
+
+@lru_cache(maxsize=65536)
+def iso_timestamp(ts: float) -> str:
+    """Fecha ISO de un epoch; first_seen y los buckets se repiten entre respuestas"""
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+def dumps_text(value: Any) -> str:
+    """Serializar a texto (tramas WebSocket)"""
+    return dumps(value).decode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON sin la pasada de jsonable_encoder
+
+    Acepta bytes ya codificados (instantáneas en caché) o cualquier valor
+    serializable por `dumps`.
+    """
+
+    media_type = MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
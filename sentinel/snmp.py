@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Sondeo SNMP asíncrono - Sentinel Dashboard
+Cliente SNMPv2c GET/GETBULK sobre un único socket UDP y cálculo de tasas por interfaz
+"""
+
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tipos BER / SNMP
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+VERSION_2C = 1
+
+UNSIGNED_TYPES = (COUNTER32, GAUGE32, TIMETICKS, COUNTER64)
+EXCEPTION_TYPES = (NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW)
+COUNTER_BITS = {COUNTER32: 32, COUNTER64: 64}
+
+OID = Tuple[int, ...]
+
+# OIDs sondeados (MIB-II, IF-MIB y UCD-SNMP)
+SYS_UPTIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+SS_CPU_IDLE = (1, 3, 6, 1, 4, 1, 2021, 11, 11, 0)
+MEM_TOTAL_REAL = (1, 3, 6, 1, 4, 1, 2021, 4, 5, 0)
+MEM_AVAIL_REAL = (1, 3, 6, 1, 4, 1, 2021, 4, 6, 0)
+SCALAR_OIDS = (SYS_UPTIME, SS_CPU_IDLE, MEM_TOTAL_REAL, MEM_AVAIL_REAL)
+
+INTERFACE_COLUMNS = {
+    "in_octets": (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6),
+    "out_octets": (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 10),
+    "in_packets": (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 7),
+    "out_packets": (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 11),
+    "in_errors": (1, 3, 6, 1, 2, 1, 2, 2, 1, 14),
+}
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRIES = 1
+DEFAULT_MAX_REPETITIONS = 24
+DEFAULT_MAX_CONCURRENT = 256
+
+
+class SnmpError(Exception):
+    """Error de protocolo o de agente SNMP"""
+
+
+def parse_oid(value: str) -> OID:
+    return tuple(int(part) for part in value.strip(".").split("."))
+
+
+def format_oid(oid: OID) -> str:
+    return ".".join(str(part) for part in oid)
+
+
+# --- Codificación BER -------------------------------------------------------
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes((length,))
+    body = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(body),)) + body
+
+
+def encode_tlv(tag: int, body: bytes) -> bytes:
+    return bytes((tag,)) + _encode_length(len(body)) + body
+
+
+def encode_integer(value: int, tag: int = INTEGER) -> bytes:
+    if tag in UNSIGNED_TYPES:
+        body = value.to_bytes(value.bit_length() // 8 + 1, "big")
+    else:
+        body = value.to_bytes((value + (value < 0)).bit_length() // 8 + 1, "big", signed=True)
+    return encode_tlv(tag, body)
+
+
+def encode_oid(oid: OID) -> bytes:
+    body = bytearray((oid[0] * 40 + oid[1],))
+    for arc in oid[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        body.extend(reversed(chunk))
+    return encode_tlv(OBJECT_IDENTIFIER, bytes(body))
+
+
+def encode_value(tag: int, value) -> bytes:
+    if tag in (INTEGER,) + UNSIGNED_TYPES:
+        return encode_integer(value, tag)
+    if tag == OBJECT_IDENTIFIER:
+        return encode_oid(value)
+    if tag in (OCTET_STRING, IP_ADDRESS):
+        return encode_tlv(tag, value if isinstance(value, bytes) else str(value).encode())
+    return encode_tlv(tag, b"")
+
+
+def encode_message(community: str, pdu_type: int, request_id: int,
+                   varbinds: Sequence[Tuple[OID, int, object]],
+                   field1: int = 0, field2: int = 0) -> bytes:
+    """Codificar un mensaje SNMPv2c (field1/field2 = error o non-repeaters/max-repetitions)"""
+    binds = b"".join(
+        encode_tlv(SEQUENCE, encode_oid(oid) + encode_value(tag, value))
+        for oid, tag, value in varbinds
+    )
+    pdu = encode_tlv(
+        pdu_type,
+        encode_integer(request_id) + encode_integer(field1) + encode_integer(field2)
+        + encode_tlv(SEQUENCE, binds),
+    )
+    return encode_tlv(
+        SEQUENCE, encode_integer(VERSION_2C) + encode_tlv(OCTET_STRING, community.encode()) + pdu
+    )
+
+
+# --- Decodificación BER -----------------------------------------------------
+
+def decode_tlv(data: bytes, pos: int = 0) -> Tuple[int, bytes, int]:
+    """Devolver (tag, contenido, posición siguiente)"""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[pos:pos + size], "big")
+        pos += size
+    end = pos + length
+    if end > len(data):
+        raise SnmpError("Mensaje BER truncado")
+    return tag, data[pos:end], end
+
+
+def decode_oid(body: bytes) -> OID:
+    first = body[0]
+    oid = [first // 40, first % 40] if first < 80 else [2, first - 80]
+    arc = 0
+    for byte in body[1:]:
+        arc = (arc << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(arc)
+            arc = 0
+    return tuple(oid)
+
+
+def decode_value(tag: int, body: bytes):
+    if tag == INTEGER:
+        return int.from_bytes(body, "big", signed=True)
+    if tag in UNSIGNED_TYPES:
+        return int.from_bytes(body, "big")
+    if tag == OBJECT_IDENTIFIER:
+        return decode_oid(body)
+    if tag == IP_ADDRESS:
+        return ".".join(str(b) for b in body)
+    if tag == OCTET_STRING:
+        return body
+    return None
+
+
+def decode_sequence(body: bytes) -> List[Tuple[int, bytes]]:
+    items = []
+    pos = 0
+    while pos < len(body):
+        tag, content, pos = decode_tlv(body, pos)
+        items.append((tag, content))
+    return items
+
+
+def decode_message(data: bytes) -> Dict:
+    """Decodificar un mensaje SNMPv2c completo"""
+    tag, body, _ = decode_tlv(data)
+    if tag != SEQUENCE:
+        raise SnmpError("Mensaje SNMP inválido")
+    (_, version), (_, community), (pdu_type, pdu) = decode_sequence(body)
+    fields = decode_sequence(pdu)
+    varbinds = []
+    for _, bind in decode_sequence(fields[3][1]):
+        (_, oid_body), (value_tag, value_body) = decode_sequence(bind)
+        varbinds.append((decode_oid(oid_body), value_tag, decode_value(value_tag, value_body)))
+    return {
+        "version": int.from_bytes(version, "big"),
+        "community": community.decode(errors="replace"),
+        "pdu_type": pdu_type,
+        "request_id": int.from_bytes(fields[0][1], "big", signed=True),
+        "field1": int.from_bytes(fields[1][1], "big", signed=True),
+        "field2": int.from_bytes(fields[2][1], "big", signed=True),
+        "varbinds": varbinds,
+    }
+
+
+# --- Cliente ----------------------------------------------------------------
+
+class _ClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client: "SnmpClient"):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client._on_response(data)
+
+
+class SnmpClient:
+    """Cliente SNMPv2c que multiplexa todas las peticiones por request-id"""
+
+    def __init__(self, community: str = "public", timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES):
+        self.community = community
+        self.timeout = timeout
+        self.retries = retries
+        self._transport = None
+        self._loop = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(int(time.time()) & 0xFFFF)
+
+    async def _ensure_transport(self):
+        loop = asyncio.get_running_loop()
+        if self._transport is not None and self._loop is loop:
+            return
+        self.close()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ClientProtocol(self), local_addr=("0.0.0.0", 0)
+        )
+        self._loop = loop
+
+    def _on_response(self, data: bytes):
+        try:
+            message = decode_message(data)
+        except Exception as e:
+            logger.debug(f"Respuesta SNMP inválida: {e}")
+            return
+        future = self._pending.pop(message["request_id"], None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def request(self, target: Tuple[str, int], pdu_type: int,
+                      varbinds: Sequence[Tuple[OID, int, object]],
+                      field1: int = 0, field2: int = 0) -> Dict:
+        """Enviar una PDU con reintentos y esperar la respuesta"""
+        await self._ensure_transport()
+        for attempt in range(self.retries + 1):
+            request_id = next(self._ids) & 0x7FFFFFFF
+            future = self._loop.create_future()
+            self._pending[request_id] = future
+            self._transport.sendto(
+                encode_message(self.community, pdu_type, request_id, varbinds, field1, field2),
+                target,
+            )
+            try:
+                response = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                self._pending.pop(request_id, None)
+            if response["field1"]:
+                raise SnmpError(f"Error SNMP {response['field1']} en índice {response['field2']}")
+            return response
+        raise asyncio.TimeoutError(f"Sin respuesta SNMP de {target[0]}:{target[1]}")
+
+    async def get(self, target: Tuple[str, int], oids: Sequence[OID]) -> Dict[OID, Tuple[int, object]]:
+        """GET de varios OIDs en una sola PDU"""
+        response = await self.request(target, GET_REQUEST, [(oid, NULL, None) for oid in oids])
+        return {oid: (tag, value) for oid, tag, value in response["varbinds"]}
+
+    async def walk_columns(self, target: Tuple[str, int], columns: Dict[str, OID],
+                           max_repetitions: int = DEFAULT_MAX_REPETITIONS
+                           ) -> Dict[str, Dict[int, Tuple[int, int]]]:
+        """Recorrer columnas de una tabla con GETBULK; devuelve {columna: {índice: (tipo, valor)}}"""
+        names = list(columns)
+        cursors = {name: columns[name] for name in names}
+        table: Dict[str, Dict[int, Tuple[int, int]]] = {name: {} for name in names}
+        while cursors:
+            active = list(cursors)
+            response = await self.request(
+                target, GET_BULK_REQUEST,
+                [(cursors[name], NULL, None) for name in active],
+                0, max_repetitions,
+            )
+            binds = response["varbinds"]
+            finished = set()
+            # Las respuestas GETBULK vienen intercaladas por fila
+            for i, (oid, tag, value) in enumerate(binds):
+                name = active[i % len(active)]
+                if name in finished:
+                    continue
+                base = columns[name]
+                # Fin de la columna; un OID que no avanza también la cierra (agente defectuoso)
+                if tag in EXCEPTION_TYPES or oid[:len(base)] != base or oid <= cursors[name]:
+                    finished.add(name)
+                    continue
+                table[name][oid[-1]] = (tag, value)
+                cursors[name] = oid
+            if not binds:
+                finished.update(active)
+            # Una respuesta corta no indica el final: el agente puede truncarla
+            # para no superar el tamaño máximo del mensaje (RFC 3416)
+            for name in finished:
+                cursors.pop(name, None)
+        return table
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        self._loop = None
+
+
+# --- Cálculo de tasas -------------------------------------------------------
+
+class CounterTracker:
+    """Deltas de contadores con manejo de desborde (32/64 bits) y reinicios"""
+
+    def __init__(self):
+        self._previous: Dict[Tuple, Tuple[int, float]] = {}
+
+    def delta(self, key: Tuple, tag: int, value: int, now: float) -> Optional[Tuple[int, float]]:
+        """Devolver (delta, segundos) respecto a la muestra anterior, o None"""
+        previous = self._previous.get(key)
+        self._previous[key] = (value, now)
+        if previous is None:
+            return None
+        prev_value, prev_time = previous
+        elapsed = now - prev_time
+        if elapsed <= 0:
+            return None
+        diff = value - prev_value
+        if diff < 0:
+            bits = COUNTER_BITS.get(tag, 32)
+            diff += 1 << bits
+            # Un salto mayor que medio rango indica reinicio del agente, no desborde
+            if diff > 1 << (bits - 1):
+                return None
+        return diff, elapsed
+
+
+# --- Sondeo de dispositivos -------------------------------------------------
+
+def format_bps(bps: float) -> str:
+    """Formatear una tasa en bits/s con la unidad adecuada"""
+    for unit, scale in (("Gbps", 1e9), ("Mbps", 1e6), ("Kbps", 1e3)):
+        if bps >= scale:
+            return f"{bps / scale:.1f} {unit}"
+    return f"{bps:.0f} bps"
+
+
+def parse_target(target) -> Tuple[str, int]:
+    """Aceptar 'host', 'host:puerto' o {'host': ..., 'port': ...}"""
+    if isinstance(target, dict):
+        return target["host"], int(target.get("port", 161))
+    host, _, port = str(target).partition(":")
+    return host, int(port or 161)
+
+
+class SnmpPoller:
+    """Sondeo concurrente de muchos dispositivos sobre un único cliente"""
+
+    def __init__(self, client: SnmpClient, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 max_repetitions: int = DEFAULT_MAX_REPETITIONS):
+        self.client = client
+        self.max_concurrent = max_concurrent
+        self.max_repetitions = max_repetitions
+        self.counters = CounterTracker()
+        self.results: Dict[str, Dict] = {}
+
+    @classmethod
+    def from_config(cls, snmp_config: Dict, interval: float) -> "SnmpPoller":
+        """Crear el poller; el timeout por intento se ajusta para caber en `interval`"""
+        retries = snmp_config.get("retries", DEFAULT_RETRIES)
+        timeout = min(snmp_config.get("timeout", DEFAULT_TIMEOUT), interval / (retries + 1))
+        client = SnmpClient(snmp_config.get("community", "public"), timeout, retries)
+        return cls(
+            client,
+            max_concurrent=snmp_config.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+            max_repetitions=snmp_config.get("max_repetitions", DEFAULT_MAX_REPETITIONS),
+        )
+
+    async def poll_device(self, target) -> Dict:
+        """Sondear escalares e interfaces de un dispositivo"""
+        address = parse_target(target)
+        key = f"{address[0]}:{address[1]}"
+        result = {"target": key, "status": "offline", "timestamp": time.time()}
+        try:
+            scalars = await self.client.get(address, SCALAR_OIDS)
+            table = await self.client.walk_columns(
+                address, INTERFACE_COLUMNS, self.max_repetitions
+            )
+        except (asyncio.TimeoutError, SnmpError, OSError) as e:
+            result["error"] = str(e) or e.__class__.__name__
+            self.results[key] = result
+            return result
+
+        now = time.monotonic()
+        result["status"] = "online"
+        result["uptime"] = scalars.get(SYS_UPTIME, (None, None))[1]
+        cpu_idle = scalars.get(SS_CPU_IDLE, (None, None))
+        if cpu_idle[0] == INTEGER:
+            result["cpu"] = 100 - cpu_idle[1]
+        total = scalars.get(MEM_TOTAL_REAL, (None, None))[1]
+        avail = scalars.get(MEM_AVAIL_REAL, (None, None))[1]
+        if isinstance(total, int) and isinstance(avail, int) and total > 0:
+            result["ram"] = round(100.0 * (total - avail) / total, 1)
+
+        interfaces: Dict[int, Dict] = {}
+        totals = {name: 0.0 for name in INTERFACE_COLUMNS}
+        for name, rows in table.items():
+            for index, (tag, value) in rows.items():
+                delta = self.counters.delta((key, name, index), tag, value, now)
+                if delta is None:
+                    continue
+                diff, elapsed = delta
+                interfaces.setdefault(index, {})[name] = diff
+                totals[name] += diff
+                if name.endswith("_octets"):
+                    rate_name = name.replace("_octets", "_bps")
+                    interfaces[index][rate_name] = round(diff * 8 / elapsed, 1)
+                    totals[rate_name] = totals.get(rate_name, 0.0) + diff * 8 / elapsed
+        result["interfaces"] = interfaces
+        result["totals"] = totals
+        self.results[key] = result
+        return result
+
+    async def poll_all(self, targets: Iterable) -> List[Dict]:
+        """Sondear todos los dispositivos con concurrencia acotada"""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def bounded(target):
+            async with semaphore:
+                return await self.poll_device(target)
+
+        return list(await asyncio.gather(*(bounded(t) for t in targets)))
+
+    def summary(self) -> Dict:
+        """Totales agregados de todos los dispositivos en línea"""
+        online = [r for r in self.results.values() if r["status"] == "online"]
+        totals: Dict[str, float] = {}
+        for result in online:
+            for name, value in result.get("totals", {}).items():
+                totals[name] = totals.get(name, 0.0) + value
+        return {"devices": len(self.results), "online": len(online), "totals": totals}
+
+    def close(self):
+        self.client.close()
+
+
+# --- Agente simulado --------------------------------------------------------
+
+class SimulatedAgent(asyncio.DatagramProtocol):
+    """Agente SNMPv2c en memoria para pruebas y benchmarks"""
+
+    def __init__(self, community: str = "public", max_varbinds: Optional[int] = None):
+        self.community = community
+        # Límite de varbinds por respuesta, como un agente que recorta PDUs grandes
+        self.max_varbinds = max_varbinds
+        self.mib: Dict[OID, Tuple[int, object]] = {}
+        self._sorted: List[OID] = []
+        self.transport = None
+        self.requests = 0
+
+    def set(self, oid: OID, tag: int, value):
+        if oid not in self.mib:
+            bisect.insort(self._sorted, oid)
+        self.mib[oid] = (tag, value)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _next(self, oid: OID) -> Tuple[OID, int, object]:
+        index = bisect.bisect_right(self._sorted, oid)
+        if index >= len(self._sorted):
+            return oid, END_OF_MIB_VIEW, None
+        next_oid = self._sorted[index]
+        return (next_oid,) + self.mib[next_oid]
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        request = decode_message(data)
+        if request["community"] != self.community:
+            return
+        binds = []
+        if request["pdu_type"] == GET_REQUEST:
+            for oid, _, _ in request["varbinds"]:
+                tag, value = self.mib.get(oid, (NO_SUCH_OBJECT, None))
+                binds.append((oid, tag, value))
+        elif request["pdu_type"] == GET_NEXT_REQUEST:
+            binds = [self._next(oid) for oid, _, _ in request["varbinds"]]
+        elif request["pdu_type"] == GET_BULK_REQUEST:
+            non_repeaters, max_repetitions = request["field1"], request["field2"]
+            varbinds = request["varbinds"]
+            binds = [self._next(oid) for oid, _, _ in varbinds[:non_repeaters]]
+            cursors = [oid for oid, _, _ in varbinds[non_repeaters:]]
+            for _ in range(max_repetitions):
+                row = [self._next(oid) for oid in cursors]
+                binds.extend(row)
+                cursors = [oid for oid, _, _ in row]
+                if all(tag == END_OF_MIB_VIEW for _, tag, _ in row):
+                    break
+        if self.max_varbinds is not None:
+            binds = binds[:self.max_varbinds]
+        self.transport.sendto(
+            encode_message(self.community, GET_RESPONSE, request["request_id"], binds), addr
+        )
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento de series temporales - Sentinel Dashboard
+SQLite en modo WAL con inserciones por lotes y agregados de 1 min / 1 h
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones precalculadas (segundos) de mayor a menor
+ROLLUP_STEPS = (3600, 60)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_POINTS = 50
+DEFAULT_EXPORT_BATCH = 5000
+DEFAULT_PRUNE_BATCH = 5000
+
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$")
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: str) -> int:
+    """Convertir '30m', '24h', '90d' o '1w' a segundos"""
+    match = _DURATION_RE.match(str(value).lower())
+    if not match:
+        raise ValueError(f"Duración inválida: {value!r}")
+    return int(float(match.group(1)) * _DURATION_UNITS[match.group(2)])
+
+
+def format_step(seconds: int) -> str:
+    """Representación corta de una resolución"""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+class SQLiteStore:
+    """Conexión SQLite compartida (WAL) protegida por un lock"""
+
+    SCHEMA: Sequence[str] = ()
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = None
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.RLock()
+        self.open(path)
+
+    def open(self, path: str):
+        """Abrir (o reabrir) la base de datos en la ruta indicada"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+            if path != ":memory:":
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            # auto_vacuum debe fijarse antes de crear las tablas
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+            self.path = path
+        self.on_open()
+
+    def on_open(self):
+        """Gancho para inicializar estado derivado tras abrir la base"""
+
+    def close(self):
+        """Cerrar la conexión"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def query(self, sql: str, params: Sequence = ()) -> List[Tuple]:
+        """Ejecutar una consulta de lectura"""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def vacuum(self, pages: int) -> int:
+        """Devolver al sistema hasta `pages` páginas libres; devuelve las que quedan"""
+        with self.lock:
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Base creada sin auto_vacuum=INCREMENTAL: solo un VACUUM completo la compacta
+                return 0
+            # El pragma avanza página a página mientras se leen sus filas
+            self.conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            return self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def checkpoint(self) -> Tuple[int, int, int]:
+        """Checkpoint PASSIVE del WAL: no espera a lectores ni bloquea escrituras"""
+        with self.lock:
+            return self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+
+
+class TimeSeriesStore(SQLiteStore):
+    """Series temporales con muestras crudas y agregados incrementales"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS ts_samples (
+            series TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (series, ts)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS ts_rollup (
+            step INTEGER NOT NULL,
+            series TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sum REAL NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            PRIMARY KEY (step, series, bucket)
+        ) WITHOUT ROWID""",
+    )
+
+    def __init__(self, path: str = ":memory:", batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._buffer: List[Tuple[str, int, float]] = []
+        self._buffer_lock = threading.Lock()
+        super().__init__(path)
+
+    def record(self, values: Dict[str, float], ts: Optional[float] = None):
+        """Encolar un conjunto de muestras; se escriben en el próximo lote"""
+        ts = int(time.time() if ts is None else ts)
+        rows = [(series, ts, float(value)) for series, value in values.items()
+                if value is not None]
+        with self._buffer_lock:
+            self._buffer.extend(rows)
+            pending = len(self._buffer)
+        return pending >= self.batch_size
+
+    def record_many(self, rows: Iterable[Tuple[str, float, float]]):
+        """Encolar muestras (serie, ts, valor) ya construidas"""
+        rows = [(series, int(ts), float(value)) for series, ts, value in rows]
+        with self._buffer_lock:
+            self._buffer.extend(rows)
+
+    @staticmethod
+    def _aggregate(rows: List[Tuple[str, int, float]]) -> List[Tuple]:
+        """Agregar un lote por (resolución, serie, bucket)"""
+        rollups: Dict[Tuple[int, str, int], List[float]] = {}
+        for series, ts, value in rows:
+            for step in ROLLUP_STEPS:
+                key = (step, series, ts - ts % step)
+                agg = rollups.get(key)
+                if agg is None:
+                    rollups[key] = [1, value, value, value]
+                else:
+                    agg[0] += 1
+                    agg[1] += value
+                    if value < agg[2]:
+                        agg[2] = value
+                    if value > agg[3]:
+                        agg[3] = value
+        return [key + tuple(agg) for key, agg in rollups.items()]
+
+    def flush(self) -> int:
+        """Escribir el lote pendiente y actualizar los agregados en una transacción"""
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        # Una muestra por (serie, ts): gana la primera, también frente a la base,
+        # y solo las filas insertadas entran en los agregados
+        unique: Dict[Tuple[str, int], float] = {}
+        for series, ts, value in rows:
+            unique.setdefault((series, ts), value)
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                execute = self.conn.execute
+                inserted = [
+                    (series, ts, value) for (series, ts), value in unique.items()
+                    if execute("INSERT OR IGNORE INTO ts_samples (series, ts, value) VALUES (?, ?, ?)",
+                               (series, ts, value)).rowcount
+                ]
+                rollups = self._aggregate(inserted)
+                self.conn.executemany(
+                    """INSERT INTO ts_rollup (step, series, bucket, count, sum, min, max)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (step, series, bucket) DO UPDATE SET
+                           count = count + excluded.count,
+                           sum = sum + excluded.sum,
+                           min = MIN(min, excluded.min),
+                           max = MAX(max, excluded.max)""",
+                    rollups,
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(inserted)
+
+    async def flush_async(self) -> int:
+        """Escribir el lote pendiente fuera del event loop"""
+        return await asyncio.to_thread(self.flush)
+
+    async def run_flusher(self, interval: float = DEFAULT_FLUSH_INTERVAL):
+        """Tarea de fondo que vacía el búfer periódicamente"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logger.error(f"Error escribiendo series temporales: {e}")
+
+    def series_names(self, prefix: str = "") -> List[str]:
+        """Series conocidas (según los agregados horarios)"""
+        rows = self.query(
+            "SELECT DISTINCT series FROM ts_rollup WHERE step = ? AND series LIKE ? ORDER BY series",
+            (ROLLUP_STEPS[0], prefix + "%"),
+        )
+        return [row[0] for row in rows]
+
+    def rollups(self, step: int, since: float, prefix: str = "") -> List[Tuple[str, int, float, int]]:
+        """Agregados (serie, bucket, suma, cuenta) de una resolución desde `since`"""
+        return self.query(
+            """SELECT series, bucket, sum, count FROM ts_rollup
+               WHERE step = ? AND bucket >= ? AND series LIKE ?""",
+            (step, int(since), prefix + "%"),
+        )
+
+    def hourly_profile(self, since: float, prefix: str = "") -> List[Tuple[str, int, float, int]]:
+        """Media por hora del día (UTC) de cada serie: (serie, hora, media, muestras)"""
+        return self.query(
+            """SELECT series, (bucket / 3600) % 24 AS hour, SUM(sum) / SUM(count), SUM(count)
+               FROM ts_rollup
+               WHERE step = 3600 AND bucket >= ? AND series LIKE ?
+               GROUP BY series, hour""",
+            (int(since), prefix + "%"),
+        )
+
+    def prune(self, step: int, cutoff: float, batch_size: int = DEFAULT_PRUNE_BATCH,
+              after: str = "") -> Tuple[int, Optional[str]]:
+        """Eliminar un lote de filas anteriores a `cutoff` (step 0 = muestras crudas)
+
+        Recorre las series en orden de clave primaria a partir de `after` para no
+        examinar filas vigentes. Devuelve (filas eliminadas, serie desde la que
+        continuar), o None como serie cuando no queda nada por revisar.
+        """
+        if step:
+            table, column, scope, params = "ts_rollup", "bucket", "step = ? AND ", (step,)
+        else:
+            table, column, scope, params = "ts_samples", "ts", "", ()
+        deleted = 0
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                while deleted < batch_size:
+                    row = self.conn.execute(
+                        f"SELECT series FROM {table} WHERE {scope}series > ? ORDER BY series LIMIT 1",
+                        params + (after,),
+                    ).fetchone()
+                    if row is None:
+                        after = None
+                        break
+                    limit = batch_size - deleted
+                    count = self.conn.execute(
+                        f"""DELETE FROM {table} WHERE {scope}series = ? AND {column} IN (
+                                SELECT {column} FROM {table}
+                                WHERE {scope}series = ? AND {column} < ?
+                                ORDER BY {column} LIMIT ?)""",
+                        params + (row[0],) + params + (row[0], int(cutoff), limit),
+                    ).rowcount
+                    deleted += count
+                    if count == limit:
+                        # Puede quedar más en esta serie: el próximo lote sigue aquí
+                        break
+                    after = row[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return deleted, after
+
+    def _iter_series(self, series: str, since: int, until: int, step: int,
+                     batch_size: int) -> Iterator[Tuple]:
+        """Filas de una serie por lotes (paginación por clave; el lock solo dura un lote)"""
+        last = since - 1
+        while True:
+            if step:
+                rows = self.query(
+                    """SELECT bucket, series, count, sum / count, min, max FROM ts_rollup
+                       WHERE step = ? AND series = ? AND bucket > ? AND bucket < ?
+                       ORDER BY bucket LIMIT ?""",
+                    (step, series, last, until, batch_size),
+                )
+            else:
+                rows = self.query(
+                    """SELECT ts, series, value FROM ts_samples
+                       WHERE series = ? AND ts > ? AND ts < ?
+                       ORDER BY ts LIMIT ?""",
+                    (series, last, until, batch_size),
+                )
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def iter_rows(self, series: Sequence[str], since: float, until: float,
+                  step: int = 0, batch_size: int = DEFAULT_EXPORT_BATCH) -> Iterator[Tuple]:
+        """Muestras (ts, serie, valor) o agregados (bucket, serie, cuenta, media, mín, máx)
+        en orden temporal, con memoria acotada a un lote por serie"""
+        per_series = max(100, batch_size // max(1, len(series)))
+        cursors = [self._iter_series(name, int(since), int(until), step, per_series)
+                   for name in series]
+        return heapq.merge(*cursors, key=lambda row: row[0])
+
+    @staticmethod
+    def resolve_step(range_seconds: int, points: int, step: Optional[int] = None) -> Tuple[int, int]:
+        """Elegir el paso de salida y la tabla de origen (0 = muestras crudas)"""
+        if step is None:
+            step = max(1, math.ceil(range_seconds / max(1, points)))
+        for source in ROLLUP_STEPS:
+            if step >= source:
+                step = max(source, step - step % source)
+                return step, source
+        return step, 0
+
+    def history(
+        self,
+        series: Sequence[str],
+        range_seconds: int,
+        points: int = DEFAULT_POINTS,
+        step: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> Dict:
+        """Serie agregada en buckets de `step` segundos para el rango pedido"""
+        now = int(time.time() if now is None else now)
+        step, source = self.resolve_step(range_seconds, points, step)
+        start = now - range_seconds
+        start -= start % step
+
+        result: Dict[str, Dict[str, Dict[int, float]]] = {}
+        for name in series:
+            if source:
+                rows = self.query(
+                    """SELECT bucket - bucket % ?1 AS b, SUM(sum) / SUM(count), MIN(min), MAX(max)
+                       FROM ts_rollup
+                       WHERE step = ?2 AND series = ?3 AND bucket >= ?4 AND bucket <= ?5
+                       GROUP BY b ORDER BY b""",
+                    (step, source, name, start, now),
+                )
+            else:
+                rows = self.query(
+                    """SELECT ts - ts % ?1 AS b, AVG(value), MIN(value), MAX(value)
+                       FROM ts_samples
+                       WHERE series = ?2 AND ts >= ?3 AND ts <= ?4
+                       GROUP BY b ORDER BY b""",
+                    (step, name, start, now),
+                )
+            result[name] = {
+                "avg": {row[0]: round(row[1], 3) for row in rows},
+                "min": {row[0]: row[2] for row in rows},
+                "max": {row[0]: row[3] for row in rows},
+            }
+
+        buckets = sorted({b for data in result.values() for b in data["avg"]})
+        return {
+            "step": step,
+            "resolution": format_step(source) if source else "raw",
+            "buckets": buckets,
+            "series": {
+                name: {kind: [values.get(b) for b in buckets] for kind, values in data.items()}
+                for name, data in result.items()
+            },
+        }
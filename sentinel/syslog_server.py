@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Receptor Syslog - Sentinel Dashboard
+Servidor asyncio UDP/TCP (RFC 3164/5424) con cola acotada y contabilidad de descartes
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+import queue
+import re
+import socket
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 100_000
+DEFAULT_BATCH_SIZE = 5_000
+DEFAULT_RCVBUF = 8 * 1024 * 1024
+MAX_MESSAGE_SIZE = 64 * 1024
+LENGTH_DIGITS = len(str(MAX_MESSAGE_SIZE))
+
+SEVERITY_NAMES = ("emerg", "alert", "crit", "err", "warning", "notice", "info", "debug")
+
+# <PRI>1 TIMESTAMP HOST APP PROCID MSGID SD MSG
+RFC5424_RE = re.compile(
+    rb"<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|\[.*?\](?:\[.*?\])*) ?(.*)", re.DOTALL
+)
+# <PRI>Mmm dd hh:mm:ss HOST TAG: MSG
+RFC3164_RE = re.compile(
+    rb"<(\d{1,3})>([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (\S+) ([^:\[\s]+)(?:\[\d+\])?:? ?(.*)",
+    re.DOTALL,
+)
+PRI_RE = re.compile(rb"<(\d{1,3})>(.*)", re.DOTALL)
+
+Sink = Callable[[List[Dict]], Union[None, Awaitable[None]]]
+
+
+def _nil(value: bytes) -> Optional[str]:
+    return None if value == b"-" else value.decode("utf-8", "replace")
+
+
+def parse_syslog(data: bytes, received_at: Optional[float] = None) -> Dict:
+    """Interpretar un mensaje syslog (RFC 5424, RFC 3164 o solo PRI)"""
+    received_at = time.time() if received_at is None else received_at
+    data = data.rstrip(b"\r\n\x00")
+
+    match = RFC5424_RE.match(data)
+    if match:
+        pri = int(match.group(1))
+        return {
+            "facility": pri >> 3,
+            "severity": pri & 7,
+            "timestamp": _nil(match.group(2)),
+            "host": _nil(match.group(3)),
+            "app": _nil(match.group(4)),
+            "message": match.group(8).decode("utf-8", "replace"),
+            "received_at": received_at,
+        }
+
+    match = RFC3164_RE.match(data)
+    if match:
+        pri = int(match.group(1))
+        return {
+            "facility": pri >> 3,
+            "severity": pri & 7,
+            "timestamp": match.group(2).decode("ascii"),
+            "host": match.group(3).decode("utf-8", "replace"),
+            "app": match.group(4).decode("utf-8", "replace"),
+            "message": match.group(5).decode("utf-8", "replace"),
+            "received_at": received_at,
+        }
+
+    # Mensaje no estándar: conservar el contenido con prioridad por defecto (user.notice)
+    match = PRI_RE.match(data)
+    pri, message = (int(match.group(1)), match.group(2)) if match else (13, data)
+    return {
+        "facility": pri >> 3,
+        "severity": pri & 7,
+        "timestamp": None,
+        "host": None,
+        "app": None,
+        "message": message.decode("utf-8", "replace"),
+        "received_at": received_at,
+    }
+
+
+def parse_batch(batch: List[bytes], received_at: Optional[float] = None) -> List[Dict]:
+    """Interpretar un lote de mensajes con una sola marca de recepción"""
+    received_at = time.time() if received_at is None else received_at
+    return [parse_syslog(data, received_at) for data in batch]
+
+
+class BoundedQueue:
+    """Cola acotada que descarta (y cuenta) en lugar de crecer sin límite"""
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.items: deque = deque()
+        self.received = 0
+        self.dropped = 0
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def high_water(self) -> bool:
+        return len(self.items) >= self.maxsize * 0.8
+
+    def offer(self, item: bytes) -> bool:
+        self.received += 1
+        if len(self.items) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self.items.append(item)
+        if len(self.items) == 1:
+            self.ready.set()
+        if self.high_water:
+            self.space.clear()
+        return True
+
+    def drain(self, limit: int) -> List[bytes]:
+        items = self.items
+        count = min(limit, len(items))
+        batch = [items.popleft() for _ in range(count)]
+        if not items:
+            self.ready.clear()
+        if len(items) < self.maxsize * 0.5:
+            self.space.set()
+        return batch
+
+
+class SyslogUDPProtocol(asyncio.DatagramProtocol):
+    """Recepción UDP: cada datagrama es un mensaje"""
+
+    def __init__(self, queue: BoundedQueue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        self.queue.offer(data)
+
+
+class SyslogTCPProtocol(asyncio.Protocol):
+    """Recepción TCP con framing por conteo de octetos (RFC 6587) o por salto de línea"""
+
+    def __init__(self, queue: BoundedQueue):
+        self.queue = queue
+        self.buffer = b""
+        self.transport = None
+        self._paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self.buffer + data
+        offer = self.queue.offer
+        pos = 0
+        length = len(buffer)
+        while pos < length:
+            # Conteo de octetos solo si el prefijo es una longitud válida; un
+            # mensaje sin PRI que empieza por dígitos (p. ej. una fecha) va por línea
+            if buffer[pos:pos + 1].isdigit():
+                space = buffer.find(b" ", pos, pos + LENGTH_DIGITS + 1)
+                if space == -1:
+                    if length - pos <= LENGTH_DIGITS and buffer[pos:].isdigit():
+                        break
+                elif buffer[pos:space].isdigit() and int(buffer[pos:space]) <= MAX_MESSAGE_SIZE:
+                    end = space + 1 + int(buffer[pos:space])
+                    if end > length:
+                        break
+                    offer(buffer[space + 1:end])
+                    pos = end
+                    continue
+            end = buffer.find(b"\n", pos)
+            if end == -1:
+                break
+            if end > pos:
+                offer(buffer[pos:end])
+            pos = end + 1
+        self.buffer = buffer[pos:]
+        if len(self.buffer) > MAX_MESSAGE_SIZE:
+            logger.warning("Mensaje syslog demasiado grande, cerrando conexión")
+            self.transport.close()
+            return
+
+        # Contrapresión: dejar de leer mientras la cola esté casi llena
+        if self.queue.high_water and not self._paused:
+            self._paused = True
+            self.transport.pause_reading()
+            asyncio.ensure_future(self._resume_when_drained())
+
+    async def _resume_when_drained(self):
+        await self.queue.space.wait()
+        self._paused = False
+        if not self.transport.is_closing():
+            self.transport.resume_reading()
+
+
+class SyslogServer:
+    """Servidor syslog UDP+TCP que entrega lotes interpretados a un sumidero"""
+
+    def __init__(self, sink: Sink, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.queue = BoundedQueue(queue_size)
+        self.processed = 0
+        self._udp_transport = None
+        self._tcp_server = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    async def start(self, host: str = "0.0.0.0", port: int = 514,
+                    udp: bool = True, tcp: bool = True):
+        """Abrir los puertos y lanzar el consumidor"""
+        loop = asyncio.get_running_loop()
+        if udp:
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: SyslogUDPProtocol(self.queue), local_addr=(host, port)
+            )
+            # Un búfer de kernel grande absorbe ráfagas mientras el loop procesa lotes
+            sock = self._udp_transport.get_extra_info("socket")
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, DEFAULT_RCVBUF)
+            except OSError:
+                pass
+        if tcp:
+            self._tcp_server = await loop.create_server(
+                lambda: SyslogTCPProtocol(self.queue), host, port
+            )
+        self._consumer = asyncio.ensure_future(self._consume())
+        logger.info(f"Receptor syslog escuchando en {host}:{port}")
+
+    @property
+    def ports(self) -> Dict[str, int]:
+        """Puertos efectivamente asignados (útil con puerto 0)"""
+        ports = {}
+        if self._udp_transport is not None:
+            ports["udp"] = self._udp_transport.get_extra_info("sockname")[1]
+        if self._tcp_server is not None:
+            ports["tcp"] = self._tcp_server.sockets[0].getsockname()[1]
+        return ports
+
+    async def _consume(self):
+        """Vaciar la cola por lotes hacia el sumidero"""
+        while True:
+            await self.queue.ready.wait()
+            batch = self.queue.drain(self.batch_size)
+            if not batch:
+                continue
+            try:
+                result = self.sink(parse_batch(batch))
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error procesando lote syslog: {e}")
+            self.processed += len(batch)
+            # Ceder el loop entre lotes para no acaparar a los demás clientes
+            await asyncio.sleep(0)
+
+    async def stop(self):
+        """Cerrar puertos y consumidor"""
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        if self._consumer is not None:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "received": self.queue.received,
+            "processed": self.processed,
+            "dropped": self.queue.dropped,
+            "queued": len(self.queue),
+        }
+
+
+class SyslogThreatSink:
+    """Sumidero que registra como amenazas los mensajes graves"""
+
+    def __init__(self, threat_log, threat_severity: int = 3,
+                 notify: Optional[Callable[[List[Dict]], None]] = None, intel=None):
+        self.threat_log = threat_log
+        self.threat_severity = threat_severity
+        self.notify = notify
+        # Índice de indicadores (ThreatIntel): se comprueba cada mensaje
+        self.intel = intel
+        self.by_severity = [0] * 8
+
+    @staticmethod
+    def _map_severity(severity: int) -> str:
+        if severity <= 2:
+            return "high"
+        if severity == 3:
+            return "medium"
+        return "low"
+
+    def __call__(self, messages: List[Dict]):
+        threats = []
+        for message in messages:
+            severity = message["severity"]
+            self.by_severity[severity] += 1
+            if severity <= self.threat_severity:
+                threats.append({
+                    "type": "syslog",
+                    "severity": self._map_severity(severity),
+                    "source_ip": message["host"],
+                    "description": f"{message['app'] or 'syslog'}: {message['message'][:500]}",
+                    "timestamp": message["received_at"],
+                })
+            if self.intel is not None:
+                threats.extend(self.intel.scan_text(
+                    (message["host"],), message["message"],
+                    f"Syslog {message['app'] or 'syslog'}", message["received_at"]
+                ))
+        if threats:
+            if self.notify is not None:
+                self.notify(threats)
+            return asyncio.to_thread(self.threat_log.add_many, threats)
+        return None
+
+
+class QueueNotifier:
+    """`notify` del proceso receptor: pasa las amenazas al proceso principal sin bloquear"""
+
+    def __init__(self, threat_queue):
+        self.queue = threat_queue
+        self.dropped = 0
+
+    def __call__(self, threats: List[Dict]):
+        try:
+            self.queue.put_nowait(threats)
+        except queue.Full:
+            # El principal no da abasto: las amenazas ya quedan en la base
+            self.dropped += 1
+
+
+async def relay_threats(threat_queue, notify: Callable[[List[Dict]], None], poll: float = 1.0):
+    """Entregar a `notify` las amenazas que envía el proceso receptor"""
+    while True:
+        try:
+            threats = await asyncio.to_thread(threat_queue.get, True, poll)
+        except queue.Empty:
+            continue
+        try:
+            notify(threats)
+        except Exception as e:
+            logger.error(f"Error notificando amenazas syslog: {e}")
+
+
+def run_worker(host: str, port: int, db_path: str, queue_size: int = DEFAULT_QUEUE_SIZE,
+               batch_size: int = DEFAULT_BATCH_SIZE, threat_severity: int = 3,
+               intel_config: Optional[Dict] = None, threat_queue=None):
+    """Ejecutar el receptor en un proceso propio escribiendo en la base compartida
+
+    Con `threat_queue` (multiprocessing.Queue) las amenazas también se envían al
+    proceso principal, que las entrega al despachador de alertas.
+    """
+    from threatlog import ThreatLog
+    from threat_intel import ThreatIntel
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    threat_log = ThreatLog(db_path)
+    intel = ThreatIntel.from_config(intel_config) if intel_config else None
+    notify = QueueNotifier(threat_queue) if threat_queue is not None else None
+    server = SyslogServer(SyslogThreatSink(threat_log, threat_severity, notify, intel),
+                          queue_size, batch_size)
+
+    async def main():
+        if intel is not None:
+            asyncio.ensure_future(intel.run())
+        await server.start(host, port)
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"Syslog: {server.stats()}")
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        threat_log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receptor syslog de Sentinel")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=514)
+    parser.add_argument("--db", default="data/sentinel.db")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    run_worker(args.host, args.port, args.db, args.queue_size, args.batch_size)
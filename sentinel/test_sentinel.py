@@ -9,6 +9,7 @@ import json
 from unittest.mock import Mock, patch
 from pathlib import Path
 import sys
+import os
 
 # Agregar el directorio padre al path para importar app
 sys.path.append(str(Path(__file__).parent))
@@ -78,6 +79,28 @@ class TestSecurityMonitor(unittest.TestCase):
         threats = self.monitor.scan_threats()
         self.assertIsInstance(threats, list)
     
+    def test_record_threats_writes_off_loop(self):
+        """Test que el registro de amenazas se escribe fuera del hilo del loop"""
+        import threading
+        threads = []
+        add_many = self.monitor.threat_log.add_many
+
+        def tracking_add_many(threats):
+            threads.append(threading.get_ident())
+            return add_many(threats)
+
+        loop = asyncio.new_event_loop()
+        try:
+            with patch.object(self.monitor.threat_log, "add_many", side_effect=tracking_add_many):
+                loop.run_until_complete(self.monitor.record_threats(
+                    [{"type": "anomaly", "severity": "low", "description": "x"}]
+                ))
+        finally:
+            loop.close()
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertEqual(self.monitor.threat_log.total, 1)
+    
     def test_get_firewall_stats(self):
         """Test obtener estadísticas del firewall"""
         stats = self.monitor.get_firewall_stats()
@@ -166,7 +189,9 @@ class TestAPIEndpoints(unittest.TestCase):
     
     def test_scan_network_endpoint(self):
         """Test endpoint de escaneo de red"""
-        response = self.client.post("/api/network/scan")
+        from app import network_monitor
+        with patch.object(network_monitor, "vendors", temporary_vendor_index(self)):
+            response = self.client.post("/api/network/scan")
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertEqual(data["status"], "completed")
@@ -222,12 +247,23 @@ class AsyncTestCase(unittest.TestCase):
     def async_test(self, coro):
         return self.loop.run_until_complete(coro)
 
+def temporary_vendor_index(testcase):
+    """Índice OUI en un directorio temporal (los tests no escriben en data/)"""
+    import tempfile
+    from oui import DEFAULT_SOURCES, VendorIndex
+    tmpdir = tempfile.TemporaryDirectory()
+    testcase.addCleanup(tmpdir.cleanup)
+    vendors = VendorIndex(DEFAULT_SOURCES, os.path.join(tmpdir.name, "oui.idx"))
+    testcase.addCleanup(vendors.close)
+    return vendors
+
 class TestAsyncFunctionality(AsyncTestCase):
     """Tests para funcionalidad asíncrona"""
     
     def test_async_device_scan(self):
         """Test escaneo asíncrono de dispositivos"""
         monitor = NetworkMonitor()
+        monitor.vendors = temporary_vendor_index(self)
         devices = self.async_test(monitor.scan_devices())
         self.assertIsInstance(devices, list)
     
@@ -237,32 +273,2256 @@ class TestAsyncFunctionality(AsyncTestCase):
         result = self.async_test(monitor.ping_host("localhost"))
         self.assertIsInstance(result, dict)
 
-def run_performance_tests():
-    """Tests de rendimiento básicos"""
-    import time
+class TestSubnetScanner(AsyncTestCase):
+    """Tests para el motor de descubrimiento de subredes"""
+
+    def test_sweep_local_responder(self):
+        """Test barrido contra un servicio local falso"""
+        from discovery import SubnetScanner
+
+        async def scenario():
+            server = await asyncio.start_server(
+                lambda r, w: w.close(), "127.0.0.1", 0
+            )
+            port = server.sockets[0].getsockname()[1]
+            scanner = SubnetScanner(max_concurrent=4, host_timeout=1.0, probe_ports=[port])
+            try:
+                return [d async for d in scanner.scan([
+                    {"range": "127.0.0.0/30", "scan_enabled": True},
+                    {"range": "127.0.1.0/30", "scan_enabled": False},
+                ])]
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        devices = self.async_test(scenario())
+        self.assertEqual(sorted(d["ip"] for d in devices), ["127.0.0.1", "127.0.0.2"])
+        for device in devices:
+            self.assertIsNotNone(device["latency"])
+
+    def test_sweep_bounded_concurrency(self):
+        """Test concurrencia acotada y resultados en streaming"""
+        from discovery import SubnetScanner
+        import time
+
+        state = {"active": 0, "peak": 0}
+
+        async def fake_probe(ip, ports, timeout):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return 1.0 if ip.endswith("7") else None
+
+        async def scenario():
+            scanner = SubnetScanner(max_concurrent=50, probe=fake_probe)
+            first_at = None
+            found = []
+            start = time.perf_counter()
+            async for device in scanner.scan([{"range": "10.9.8.0/24"}]):
+                if first_at is None:
+                    first_at = time.perf_counter() - start
+                found.append(device)
+            return found, first_at, time.perf_counter() - start
+
+        found, first_at, total = self.async_test(scenario())
+        self.assertLessEqual(state["peak"], 50)
+        self.assertEqual(len(found), 25)
+        self.assertLess(first_at, total)
+        self.assertLess(total, 2.0)
+
+class TestPortAuditor(AsyncTestCase):
+    """Tests para la auditoría de puertos"""
+
+    def test_unique_ports(self):
+        """Test deduplicación de puertos repetidos en la configuración"""
+        from ports import unique_ports
+        config_path = Path(__file__).parent / "config" / "sentinel.json"
+        with open(config_path, 'r') as f:
+            monitored = json.load(f)["network"]["monitored_ports"]
+        unique = unique_ports(monitored)
+        keys = [(p["port"], p["protocol"]) for p in unique]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(keys.count((8086, "tcp")), 1)
+
+    def test_audit_classification(self):
+        """Test clasificación open/closed y desviaciones"""
+        from ports import PortAuditor
+        import socket
+
+        async def scenario():
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+            open_port = server.sockets[0].getsockname()[1]
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                closed_port = s.getsockname()[1]
+            auditor = PortAuditor([
+                {"port": open_port, "protocol": "tcp", "expected_status": "open"},
+                {"port": closed_port, "protocol": "tcp", "expected_status": "open",
+                 "critical": True},
+                {"port": closed_port, "protocol": "tcp", "expected_status": "open"},
+            ], initial_timeout=1.0)
+            try:
+                return await auditor.audit(["127.0.0.1"])
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        results = self.async_test(scenario())
+        self.assertEqual(len(results), 2)
+        by_status = {r["status"]: r for r in results}
+        self.assertTrue(by_status["open"]["compliant"])
+        self.assertFalse(by_status["closed"]["compliant"])
+        self.assertTrue(by_status["closed"]["critical"])
+
+    def test_ports_endpoint(self):
+        """Test endpoint de auditoría de puertos"""
+        client = TestClient(app)
+        response = client.get("/api/network/ports")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("deviations", data)
+        self.assertIn("critical_deviations", data)
+
+    def test_ports_endpoint_host_from_snapshot(self):
+        """Test consulta por host: solo inventario y sin sondear"""
+        from app import network_monitor
+        from inventory import DeviceInventory
+        from ports import PortAuditor
+        inventory = DeviceInventory()
+        inventory.observe({"ip": "192.0.2.10", "mac": "00:11:22:33:44:55", "status": "online"})
+        deviation = {"port": 22, "protocol": "tcp", "name": "SSH", "status": "open",
+                     "expected_status": "closed", "critical": True, "compliant": False,
+                     "rtt_ms": 1.0}
+        results = [dict(deviation, host="192.0.2.10"), dict(deviation, host="192.0.2.11")]
+        audit = {"ports_checked": 1, "timestamp": "2026-01-01T00:00:00"}
+        client = TestClient(app)
+        with patch.object(network_monitor, "inventory", inventory), \
+                patch.object(network_monitor, "port_results", results), \
+                patch.object(network_monitor, "port_audit", audit), \
+                patch.object(PortAuditor, "audit", side_effect=AssertionError("sondeo")):
+            unknown = client.get("/api/network/ports?host=203.0.113.50")
+            data = client.get("/api/network/ports?host=192.0.2.10").json()
+        self.assertEqual(unknown.status_code, 404)
+        self.assertEqual(data["probes"], 1)
+        self.assertEqual(data["critical_deviations"], 1)
+        self.assertEqual(data["timestamp"], "2026-01-01T00:00:00")
+
+class TestPinger(AsyncTestCase):
+    """Tests para el pinger ICMP/TCP"""
+
+    def test_summarize_rtts(self):
+        """Test estadísticas min/avg/max/jitter/pérdida"""
+        from pinger import summarize_rtts
+        stats = summarize_rtts([10.0, None, 20.0, 30.0])
+        self.assertEqual(stats["min"], 10.0)
+        self.assertEqual(stats["avg"], 20.0)
+        self.assertEqual(stats["max"], 30.0)
+        self.assertEqual(stats["jitter"], 10.0)
+        self.assertEqual(stats["loss"], 25.0)
+        self.assertEqual(summarize_rtts([None, None])["loss"], 100.0)
+
+    def test_echo_request_checksum(self):
+        """Test checksum del paquete echo request"""
+        from pinger import build_echo_request, icmp_checksum
+        packet = build_echo_request(0x1234, 7)
+        self.assertEqual(icmp_checksum(packet), 0)
+
+    def test_ping_localhost_multiplexed(self):
+        """Test ping concurrente a localhost sobre un único socket"""
+        from pinger import Pinger
+        pinger = Pinger(timeout=1.0, count=2, interval=0)
+
+        async def scenario():
+            try:
+                return await pinger.ping_many(["127.0.0.1"] * 20)
+            finally:
+                pinger.close()
+
+        results = self.async_test(scenario())
+        self.assertEqual(len(results), 20)
+        for result in results:
+            self.assertIn(result["method"], ("icmp", "tcp"))
+            self.assertIn("jitter", result)
+            self.assertEqual(result["sent"], 2)
+
+    def test_tcp_fallback_bounded(self):
+        """Test que el respaldo TCP respeta max_concurrent conexiones simultáneas"""
+        from pinger import Pinger
+        pinger = Pinger(timeout=1.0, count=2, interval=0, tcp_ports=[443], use_icmp=False,
+                        max_concurrent=3)
+        in_flight, peak = [0], [0]
+
+        async def fake_open_connection(host, port):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            raise ConnectionRefusedError()
+
+        async def scenario():
+            with patch("asyncio.open_connection", side_effect=fake_open_connection):
+                return await pinger.ping_many([f"10.0.0.{i}" for i in range(20)])
+
+        results = self.async_test(scenario())
+        self.assertTrue(all(r["status"] == "online" for r in results))
+        self.assertEqual(peak[0], 3)
+
+    def test_ping_batch_endpoint(self):
+        """Test endpoint de ping en lote"""
+        client = TestClient(app)
+        response = client.get("/api/network/ping/batch")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("results", data)
+        self.assertIn("critical_down", data)
+
+class TestSnapshotStore(AsyncTestCase):
+    """Tests para la caché de instantáneas"""
+
+    def test_concurrent_misses_coalesced(self):
+        """Test que los fallos concurrentes comparten un solo refresco"""
+        from cache import SnapshotStore
+        store = SnapshotStore(ttl=60)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": len(calls)}
+
+        async def scenario():
+            return await asyncio.gather(*(store.get_or_refresh("k", loader) for _ in range(100)))
+
+        results = self.async_test(scenario())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({r.version for r in results}), 1)
+
+        # Una instantánea vigente se sirve sin volver a cargar
+        self.async_test(store.get_or_refresh("k", loader))
+        self.assertEqual(len(calls), 1)
+
+    def test_expired_snapshot_refreshed(self):
+        """Test que una instantánea vencida se refresca"""
+        from cache import SnapshotStore
+        store = SnapshotStore(ttl=0)
+        store.publish("k", 1)
+        snapshot = self.async_test(store.get_or_refresh("k", lambda: 2))
+        self.assertEqual(snapshot.value, 2)
+
+    def test_reads_never_scan(self):
+        """Test que los endpoints de lectura no disparan escaneos"""
+        client = TestClient(app)
+        with patch("app.network_monitor.scan_devices", side_effect=AssertionError("scan")), \
+                patch("app.security_monitor.scan_threats", side_effect=AssertionError("scan")):
+            for path in ("/api/network/devices", "/api/security/threats", "/api/network/stats"):
+                self.assertEqual(client.get(path).status_code, 200)
+
+class FakeWebSocket:
+    """WebSocket falso que registra las tramas recibidas"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+        self.closed = False
+
+    async def send_text(self, frame):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def close(self):
+        self.closed = True
+
+class TestBroadcastHub(AsyncTestCase):
+    """Tests para el hub de difusión WebSocket"""
+
+    def test_serialize_once_fan_out(self):
+        """Test que cada mensaje se serializa una sola vez para todos"""
+        from broadcast import BroadcastHub, serialize
+        calls = []
+
+        def counting_serializer(message):
+            calls.append(message)
+            return serialize(message)
+
+        async def scenario():
+            hub = BroadcastHub(serializer=counting_serializer)
+            sockets = [FakeWebSocket() for _ in range(200)]
+            for ws in sockets:
+                hub.subscribe(ws)
+            for i in range(3):
+                hub.publish({"type": "network_update", "seq": i})
+            await asyncio.sleep(0.05)
+            await hub.close()
+            return sockets
+
+        sockets = self.async_test(scenario())
+        self.assertEqual(len(calls), 3)
+        for ws in sockets:
+            self.assertEqual(len(ws.frames), 3)
+            self.assertIs(ws.frames[0], sockets[0].frames[0])
+
+    def test_slow_client_does_not_stall_others(self):
+        """Test que un cliente lento no bloquea a los demás y descarta lo viejo"""
+        from broadcast import BroadcastHub
+
+        async def scenario():
+            hub = BroadcastHub(queue_size=2)
+            slow, fast = FakeWebSocket(delay=10), FakeWebSocket()
+            hub.subscribe(slow)
+            hub.subscribe(fast)
+            for i in range(10):
+                hub.publish({"seq": i})
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.05)
+            stats = hub.stats()
+            await hub.close()
+            return fast, stats, hub.stats()
+
+        fast, stats, closed = self.async_test(scenario())
+        self.assertEqual(len(fast.frames), 10)
+        self.assertGreater(stats["dropped"], 0)
+        # El contador es acumulado: no baja al desconectarse el cliente lento
+        self.assertEqual(closed["dropped"], stats["dropped"])
+
+    def test_disconnect_policy(self):
+        """Test política de desconexión para clientes rezagados"""
+        from broadcast import BroadcastHub, DISCONNECT
+
+        async def scenario():
+            hub = BroadcastHub(queue_size=1, policy=DISCONNECT)
+            slow = FakeWebSocket(delay=10)
+            hub.subscribe(slow)
+            for i in range(5):
+                hub.publish({"seq": i})
+            await asyncio.sleep(0.01)
+            return hub, slow
+
+        hub, slow = self.async_test(scenario())
+        self.assertEqual(len(hub), 0)
+        self.assertTrue(slow.closed)
+
+    def test_websocket_endpoint_initial_update(self):
+        """Test que el endpoint WebSocket envía el último estado al conectar"""
+        client = TestClient(app)
+        with client.websocket_connect("/ws/network") as ws:
+            data = json.loads(ws.receive_text())
+        self.assertEqual(data["type"], "network_update")
+        self.assertIn("stats", data)
+
+class TestTimeSeriesStore(unittest.TestCase):
+    """Tests para el almacén de series temporales"""
+
+    def setUp(self):
+        from storage import TimeSeriesStore
+        self.store = TimeSeriesStore(":memory:", batch_size=100)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_parse_duration(self):
+        """Test conversión de rangos de tiempo"""
+        from storage import parse_duration
+        self.assertEqual(parse_duration("24h"), 86400)
+        self.assertEqual(parse_duration("90d"), 90 * 86400)
+        self.assertEqual(parse_duration("15m"), 900)
+        with self.assertRaises(ValueError):
+            parse_duration("ayer")
+
+    def test_rollups_match_raw_samples(self):
+        """Test que los agregados coinciden con las muestras crudas"""
+        now = 1_700_000_000 - 1_700_000_000 % 3600
+        for i in range(7200):
+            self.store.record({"network.errors": i % 10}, ts=now - 7200 + i)
+        self.store.flush()
+
+        history = self.store.history(["network.errors"], 7200, points=2, now=now - 1)
+        self.assertEqual(history["resolution"], "1h")
+        self.assertEqual(history["step"], 3600)
+        self.assertEqual(history["series"]["network.errors"]["avg"], [4.5, 4.5])
+        self.assertEqual(history["series"]["network.errors"]["max"], [9, 9])
+
+        rows = self.store.query("SELECT SUM(count) FROM ts_rollup WHERE step = 60")
+        self.assertEqual(rows[0][0], 7200)
+
+    def test_duplicate_samples_keep_rollups_consistent(self):
+        """Test que una muestra repetida (serie, ts) no se suma dos veces en los agregados"""
+        now = 1_700_000_000 - 1_700_000_000 % 3600
+        self.store.record({"network.errors": 5}, ts=now)
+        self.store.record({"network.errors": 7}, ts=now)
+        self.assertEqual(self.store.flush(), 1)
+        self.store.record({"network.errors": 9}, ts=now)
+        self.store.record({"network.errors": 1}, ts=now + 1)
+        self.assertEqual(self.store.flush(), 1)
+
+        samples = self.store.query("SELECT value FROM ts_samples ORDER BY ts")
+        rollup = self.store.query("SELECT count, sum FROM ts_rollup WHERE step = 60")
+        self.assertEqual([row[0] for row in samples], [5.0, 1.0])
+        self.assertEqual(rollup, [(2, 6.0)])
+
+    def test_history_uses_chart_points(self):
+        """Test que el historial devuelve como máximo chart_data_points puntos"""
+        now = 1_700_000_000
+        for i in range(0, 86400, 10):
+            self.store.record({"network.packets_in": 1000}, ts=now - i)
+        self.store.flush()
+        history = self.store.history(["network.packets_in"], 86400, points=50, now=now)
+        self.assertLessEqual(len(history["buckets"]), 52)
+        self.assertEqual(history["resolution"], "1m")
+
+    def test_history_endpoint(self):
+        """Test endpoint de historial de estadísticas"""
+        client = TestClient(app)
+        response = client.get("/api/network/stats/history?range=1h")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("timestamps", data)
+        self.assertIn("network.packets_in", data["series"])
+        self.assertEqual(client.get("/api/network/stats/history?range=xx").status_code, 400)
+
+class TestThreatLog(unittest.TestCase):
+    """Tests para el registro de amenazas"""
+
+    def setUp(self):
+        from threatlog import ThreatLog
+        self.log = ThreatLog(":memory:")
+        base = 1_700_000_000
+        self.log.add_many({
+            "type": ("malware", "phishing", "intrusion")[i % 3],
+            "severity": ("low", "medium", "high")[i % 3],
+            "source_ip": f"192.168.1.{i % 5}",
+            "description": "Actividad sospechosa detectada",
+            "timestamp": base + i,
+        } for i in range(300))
+
+    def tearDown(self):
+        self.log.close()
+
+    def test_counters(self):
+        """Test contadores mantenidos incrementalmente"""
+        self.assertEqual(self.log.total, 300)
+        self.assertEqual(self.log.count(severity="high"), 100)
+        self.assertEqual(self.log.count(type="phishing"), 100)
+
+    def test_cursor_pagination(self):
+        """Test paginación por cursor con filtros"""
+        seen = []
+        cursor = None
+        while True:
+            page = self.log.search(severity="high", cursor=cursor, limit=30)
+            seen.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 100)
+        self.assertEqual(len({t["id"] for t in seen}), 100)
+        self.assertTrue(all(t["severity"] == "high" for t in seen))
+        ids = [t["id"] for t in seen]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_since_filter(self):
+        """Test filtro por fecha"""
+        page = self.log.search(since=1_700_000_000 + 290, limit=100)
+        self.assertEqual(len(page["items"]), 10)
+        self.assertIsNone(page["next_cursor"])
+
+    def test_since_filter_out_of_order(self):
+        """Test filtro por fecha con marcas de tiempo desordenadas"""
+        from threatlog import ThreatLog
+        log = ThreatLog(":memory:")
+        first = {"type": "anomaly", "severity": "medium", "timestamp": 1000}
+        second = {"type": "anomaly", "severity": "medium", "timestamp": 940}
+        log.add_many([first, second])
+        items = log.search(since=930)["items"]
+        self.assertEqual([t["id"] for t in items], [2, 1])
+        items = log.search(since=950)["items"]
+        self.assertEqual([t["id"] for t in items], [1])
+        log.close()
+
+    def test_query_uses_index(self):
+        """Test que las consultas filtradas usan índices"""
+        plan = self.log.query(
+            "EXPLAIN QUERY PLAN SELECT id FROM threat_events "
+            "WHERE severity = ? AND id < ? ORDER BY id DESC LIMIT 10", ("high", 100)
+        )
+        self.assertIn("idx_threat_severity", " ".join(str(row) for row in plan))
+
+    def test_prune_updates_counters(self):
+        """Test que la retención descuenta los contadores"""
+        removed = self.log.prune(retention_days=1)
+        self.assertEqual(removed, 300)
+        self.assertEqual(self.log.total, 0)
+        self.assertEqual(self.log.count(severity="high"), 0)
+
+    def test_threats_endpoint_filters(self):
+        """Test endpoint de amenazas con filtros y cursor"""
+        client = TestClient(app)
+        response = client.get("/api/security/threats?severity=high&limit=5")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("next_cursor", data)
+        self.assertIn("critical", data)
+
+def write_firewall_log(path, count, start=0, src="10.0.0.5", action="BLOCK", mode='a'):
+    """Generar líneas de log estilo UFW para los tests"""
+    with open(path, mode) as f:
+        for i in range(start, start + count):
+            f.write(
+                f"Jan  1 00:00:00 gw kernel: [UFW {action}] IN=eth0 OUT= "
+                f"SRC={src} DST=192.168.1.1 LEN=60 TTL=52 PROTO=TCP SPT=40000 DPT={i} SYN\n"
+            )
+
+class TestFirewallLog(unittest.TestCase):
+    """Tests para el lector incremental del log del firewall"""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, "firewall.log")
+        self.state_path = os.path.join(self.tmp.name, "firewall.offset")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_monitor(self):
+        from firewall_log import FirewallLogMonitor, LogTailer, FirewallLogAnalyzer
+        return FirewallLogMonitor(
+            LogTailer(self.log_path, self.state_path, chunk_size=4096),
+            FirewallLogAnalyzer(port_scan_threshold=20, flood_threshold=10_000),
+        )
+
+    def test_counts_and_port_scan(self):
+        """Test conteo de bloqueos y detección de escaneo de puertos"""
+        write_firewall_log(self.log_path, 100)
+        write_firewall_log(self.log_path, 50, src="10.0.0.9", action="ALLOW")
+        monitor = self.make_monitor()
+        threats = monitor.poll()
+        self.assertEqual(monitor.analyzer.blocked_connections, 100)
+        self.assertEqual(monitor.analyzer.allowed_connections, 50)
+        self.assertEqual(len(threats), 1)
+        self.assertEqual(threats[0]["source_ip"], "10.0.0.5")
+        self.assertEqual(threats[0]["severity"], "high")
+
+    def test_resume_from_persisted_offset(self):
+        """Test que no se relee el archivo tras reiniciar"""
+        write_firewall_log(self.log_path, 100)
+        first = self.make_monitor()
+        first.poll()
+        first.tailer.close()
+
+        write_firewall_log(self.log_path, 30, start=100)
+        second = self.make_monitor()
+        second.poll()
+        self.assertEqual(second.analyzer.blocked_connections, 30)
+
+    def test_partial_line_not_consumed(self):
+        """Test que una línea incompleta se procesa al completarse"""
+        with open(self.log_path, 'w') as f:
+            f.write("Jan  1 gw kernel: [UFW BLOCK] SRC=10.0.0.1 DST=10.0.0.2 PROTO=TCP")
+        monitor = self.make_monitor()
+        monitor.poll()
+        self.assertEqual(monitor.analyzer.blocked_connections, 0)
+        with open(self.log_path, 'a') as f:
+            f.write(" SPT=1 DPT=22\n")
+        monitor.poll()
+        self.assertEqual(monitor.analyzer.blocked_connections, 1)
+
+    def test_rotation_and_truncation(self):
+        """Test rotación (nuevo inodo) y truncado"""
+        write_firewall_log(self.log_path, 10)
+        monitor = self.make_monitor()
+        monitor.poll()
+
+        # Rotación: el archivo anterior recibe líneas finales antes de moverse
+        write_firewall_log(self.log_path, 5, start=10)
+        os.rename(self.log_path, self.log_path + ".1")
+        write_firewall_log(self.log_path, 7, start=100, mode='w')
+        monitor.poll()
+        self.assertEqual(monitor.analyzer.blocked_connections, 22)
+
+        # Truncado en el mismo archivo
+        write_firewall_log(self.log_path, 3, mode='w')
+        monitor.poll()
+        self.assertEqual(monitor.analyzer.blocked_connections, 25)
+
+class TestSyslogServer(AsyncTestCase):
+    """Tests para el receptor syslog"""
+
+    def test_parse_formats(self):
+        """Test interpretación RFC 3164 y RFC 5424"""
+        from syslog_server import parse_syslog
+        legacy = parse_syslog(b"<34>Oct 11 22:14:15 gw01 sshd[1234]: Failed password for root")
+        self.assertEqual((legacy["facility"], legacy["severity"]), (4, 2))
+        self.assertEqual(legacy["host"], "gw01")
+        self.assertEqual(legacy["app"], "sshd")
+        self.assertEqual(legacy["message"], "Failed password for root")
+
+        modern = parse_syslog(
+            b'<165>1 2025-10-11T22:14:15.003Z fw01 kernel - ID47 [ex@1 a="b"] Link down'
+        )
+        self.assertEqual(modern["severity"], 5)
+        self.assertEqual(modern["host"], "fw01")
+        self.assertEqual(modern["message"], "Link down")
+
+        raw = parse_syslog(b"mensaje sin cabecera")
+        self.assertEqual(raw["severity"], 5)
+
+    def test_udp_and_tcp_ingestion(self):
+        """Test recepción por UDP y TCP con ambos tipos de framing"""
+        from syslog_server import SyslogServer
+        received = []
+
+        async def scenario():
+            server = SyslogServer(received.extend)
+            await server.start("127.0.0.1", 0)
+            ports = server.ports
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=("127.0.0.1", ports["udp"])
+            )
+            transport.sendto(b"<13>Oct 11 22:14:16 sw02 ifmgr: up")
+            _, writer = await asyncio.open_connection("127.0.0.1", ports["tcp"])
+            writer.write(b"<14>Oct 11 22:14:16 a b: uno\n<14>Oct 11 22:14:16 a b: dos\n")
+            message = b"<14>Oct 11 22:14:16 a b: tres"
+            writer.write(str(len(message)).encode() + b" " + message)
+            await writer.drain()
+            for _ in range(100):
+                if len(received) >= 4:
+                    break
+                await asyncio.sleep(0.01)
+            writer.close()
+            transport.close()
+            await server.stop()
+            return server.stats()
+
+        stats = self.async_test(scenario())
+        self.assertEqual(stats["processed"], 4)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(sorted(m["message"] for m in received), ["dos", "tres", "uno", "up"])
+
+    def test_tcp_framing_digit_leading_lines(self):
+        """Test que una línea sin PRI que empieza por una fecha no se toma como longitud"""
+        from syslog_server import SyslogTCPProtocol, BoundedQueue
+        queue = BoundedQueue(maxsize=10)
+        protocol = SyslogTCPProtocol(queue)
+        protocol.connection_made(Mock())
+        line = b"2026-10-18T10:00:00 host sshd: Failed password"
+        protocol.data_received(line[:4])
+        protocol.data_received(line[4:] + b"\n12 <14>a b: dos")
+        protocol.data_received(b"99999 <14>a b: tres\n")
+        self.assertEqual(queue.drain(10), [line, b"<14>a b: dos", b"99999 <14>a b: tres"])
+        self.assertEqual(protocol.buffer, b"")
+
+    def test_bounded_queue_counts_drops(self):
+        """Test que la cola acotada descarta y cuenta en lugar de crecer"""
+        from syslog_server import BoundedQueue
+        queue = BoundedQueue(maxsize=10)
+        for i in range(25):
+            queue.offer(b"x")
+        self.assertEqual(len(queue), 10)
+        self.assertEqual(queue.dropped, 15)
+        self.assertFalse(queue.space.is_set())
+        self.assertEqual(len(queue.drain(8)), 8)
+        self.assertTrue(queue.space.is_set())
+
+    def test_threat_sink(self):
+        """Test que los mensajes graves se registran como amenazas"""
+        from syslog_server import SyslogThreatSink, parse_batch
+        from threatlog import ThreatLog
+        threat_log = ThreatLog(":memory:")
+        sink = SyslogThreatSink(threat_log, threat_severity=3)
+        batch = parse_batch([
+            b"<34>Oct 11 22:14:15 gw01 sshd: Failed password",
+            b"<14>Oct 11 22:14:15 gw01 cron: job ok",
+        ])
+        self.async_test(sink(batch))
+        self.assertEqual(threat_log.total, 1)
+        self.assertEqual(threat_log.count(severity="high"), 1)
+        threat_log.close()
+
+    def test_process_mode_relays_threats(self):
+        """Test que las amenazas del proceso receptor llegan al notify del principal"""
+        import multiprocessing
+        from syslog_server import QueueNotifier, SyslogThreatSink, parse_batch, relay_threats
+        from threatlog import ThreatLog
+        threat_queue = multiprocessing.Queue(1)
+        threat_log = ThreatLog(":memory:")
+        notifier = QueueNotifier(threat_queue)
+        sink = SyslogThreatSink(threat_log, threat_severity=3, notify=notifier)
+        self.async_test(sink(parse_batch([b"<34>Oct 11 22:14:15 gw01 sshd: Failed password"])))
+        notifier([{"type": "syslog"}])
+        self.assertEqual(notifier.dropped, 1)
+
+        received = []
+
+        async def scenario():
+            task = asyncio.ensure_future(relay_threats(threat_queue, received.extend, poll=0.05))
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        self.async_test(scenario())
+        self.assertEqual([t["source_ip"] for t in received], ["gw01"])
+        threat_log.close()
+        threat_queue.close()
+
+def start_snmp_agent(interfaces=30, host="127.0.0.1"):
+    """Levantar un agente SNMP simulado con escalares e interfaces"""
+    from snmp import (SimulatedAgent, INTERFACE_COLUMNS, SYS_UPTIME, SS_CPU_IDLE,
+                      MEM_TOTAL_REAL, MEM_AVAIL_REAL, INTEGER, TIMETICKS, COUNTER32, COUNTER64)
+
+    async def start():
+        agent = SimulatedAgent()
+        agent.set(SYS_UPTIME, TIMETICKS, 123456)
+        agent.set(SS_CPU_IDLE, INTEGER, 70)
+        agent.set(MEM_TOTAL_REAL, INTEGER, 1000)
+        agent.set(MEM_AVAIL_REAL, INTEGER, 600)
+        for index in range(1, interfaces + 1):
+            for name, column in INTERFACE_COLUMNS.items():
+                tag = COUNTER32 if name == "in_errors" else COUNTER64
+                agent.set(column + (index,), tag, 1000)
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: agent, local_addr=(host, 0)
+        )
+        return agent, transport, transport.get_extra_info("sockname")[1]
+
+    return start()
+
+
+class TestSnmpPoller(AsyncTestCase):
+    """Tests para el sondeo SNMP"""
+
+    def test_ber_roundtrip(self):
+        """Test codificación y decodificación de mensajes SNMPv2c"""
+        from snmp import encode_message, decode_message, GET_RESPONSE, INTEGER, COUNTER64
+        oid = (1, 3, 6, 1, 4, 1, 2021, 300000, 0)
+        data = encode_message("public", GET_RESPONSE, 4242,
+                              [(oid, COUNTER64, 2 ** 64 - 1), ((1, 3, 6, 1), INTEGER, -5)])
+        message = decode_message(data)
+        self.assertEqual(message["request_id"], 4242)
+        self.assertEqual(message["community"], "public")
+        self.assertEqual(message["varbinds"][0], (oid, COUNTER64, 2 ** 64 - 1))
+        self.assertEqual(message["varbinds"][1][2], -5)
+
+    def test_counter_wrap_and_reset(self):
+        """Test deltas con desborde de 32 bits y reinicio del agente"""
+        from snmp import CounterTracker, COUNTER32
+        tracker = CounterTracker()
+        self.assertIsNone(tracker.delta("k", COUNTER32, 2 ** 32 - 100, 0.0))
+        self.assertEqual(tracker.delta("k", COUNTER32, 100, 10.0), (200, 10.0))
+        # Un retroceso grande es un reinicio del contador, no un desborde
+        self.assertIsNone(tracker.delta("k", COUNTER32, 5, 20.0))
+
+    def test_poll_simulated_agent(self):
+        """Test CPU, RAM y tasas por interfaz contra un agente simulado"""
+        from snmp import SnmpClient, SnmpPoller, INTERFACE_COLUMNS, COUNTER64
+
+        async def scenario():
+            agent, transport, port = await start_snmp_agent(interfaces=30)
+            poller = SnmpPoller(SnmpClient(timeout=1.0), max_repetitions=8)
+            first = await poller.poll_device(f"127.0.0.1:{port}")
+            for index in range(1, 31):
+                agent.set(INTERFACE_COLUMNS["in_octets"] + (index,), COUNTER64, 1000 + 125000)
+            await asyncio.sleep(0.05)
+            second = await poller.poll_device(f"127.0.0.1:{port}")
+            poller.close()
+            transport.close()
+            return first, second
+
+        first, second = self.async_test(scenario())
+        self.assertEqual(first["status"], "online")
+        self.assertEqual(first["cpu"], 30)
+        self.assertEqual(first["ram"], 40.0)
+        self.assertEqual(first["interfaces"], {})
+        # Las 30 interfaces requieren varias peticiones GETBULK de 8 filas
+        self.assertEqual(len(second["interfaces"]), 30)
+        self.assertEqual(second["totals"]["in_octets"], 30 * 125000)
+        self.assertGreater(second["interfaces"][1]["in_bps"], 0)
+        self.assertEqual(second["interfaces"][1]["out_bps"], 0)
+
+    def test_walk_truncated_responses(self):
+        """Test que un GETBULK truncado por el agente no corta la tabla"""
+        from snmp import SnmpClient, INTERFACE_COLUMNS
+
+        async def scenario():
+            agent, transport, port = await start_snmp_agent(interfaces=60)
+            agent.max_varbinds = 50
+            client = SnmpClient(timeout=1.0)
+            table = await client.walk_columns(("127.0.0.1", port), INTERFACE_COLUMNS)
+            client.close()
+            transport.close()
+            return table
+
+        table = self.async_test(scenario())
+        # 5 columnas x 24 repeticiones piden 120 varbinds; el agente solo devuelve 50
+        for name in INTERFACE_COLUMNS:
+            self.assertEqual(sorted(table[name]), list(range(1, 61)))
+
+    def test_poll_many_devices_within_interval(self):
+        """Test que 500 dispositivos se sondean dentro de un ping_interval"""
+        from snmp import SnmpPoller
+
+        async def scenario():
+            agent, transport, port = await start_snmp_agent(interfaces=4, host="0.0.0.0")
+            poller = SnmpPoller.from_config({"timeout": 10, "retries": 3}, interval=10)
+            # Todo 127.0.0.0/8 llega a la interfaz loopback
+            targets = [f"127.0.{i // 250}.{i % 250 + 1}:{port}" for i in range(500)]
+            started = asyncio.get_running_loop().time()
+            results = await poller.poll_all(targets)
+            elapsed = asyncio.get_running_loop().time() - started
+            poller.close()
+            transport.close()
+            return results, elapsed
+
+        results, elapsed = self.async_test(scenario())
+        self.assertEqual(len(results), 500)
+        self.assertTrue(all(r["status"] == "online" for r in results))
+        self.assertLess(elapsed, 10)
+
+    def test_unreachable_device(self):
+        """Test que un equipo sin agente queda offline tras los reintentos"""
+        from snmp import SnmpClient, SnmpPoller
+
+        async def scenario():
+            poller = SnmpPoller(SnmpClient(timeout=0.05, retries=1))
+            result = await poller.poll_device("127.0.0.1:9")
+            poller.close()
+            return result, poller.summary()
+
+        result, summary = self.async_test(scenario())
+        self.assertEqual(result["status"], "offline")
+        self.assertEqual(summary["online"], 0)
+
+
+class StubHTTPServer:
+    """Servidor HTTP mínimo con keep-alive que cuenta conexiones y peticiones"""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.connections = 0
+        self.bodies = []
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                self.bodies.append(await reader.readexactly(length))
+                writer.write(f"HTTP/1.1 {self.status} OK\r\nContent-Length: 2\r\n\r\nok".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+
+class StubSMTPServer:
+    """Servidor SMTP mínimo que cuenta sesiones y mensajes"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.messages = []
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        writer.write(b"220 stub\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line[:4].upper()
+            if command == b"DATA":
+                writer.write(b"354 go\r\n")
+                await writer.drain()
+                lines = []
+                while True:
+                    data = await reader.readline()
+                    if data == b".\r\n":
+                        break
+                    lines.append(data)
+                self.messages.append(b"".join(lines))
+                writer.write(b"250 queued\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+
+class TestAlertDispatcher(AsyncTestCase):
+    """Tests para el despacho de alertas"""
+
+    RULES = {
+        "critical": {"immediate": True, "channels": ["webhook"]},
+        "high": {"delay_minutes": 5, "channels": ["webhook"]},
+        "low": {"delay_minutes": 60, "channels": ["dashboard"]},
+    }
+
+    @staticmethod
+    def make_alert(severity="critical", description="Escaneo", source="10.0.0.5"):
+        return {"type": "intrusion", "severity": severity, "source_ip": source,
+                "description": description}
+
+    def test_coalesce_and_dedupe(self):
+        """Test que alertas idénticas se fusionan y luego se suprimen"""
+        from alerts import AlertDispatcher
+        dispatcher = AlertDispatcher(self.RULES, {}, dedupe_window=600)
+        for _ in range(10000):
+            dispatcher.submit(self.make_alert(), now=1000.0)
+        self.assertEqual(dispatcher.get_stats()["pending"], 1)
+        self.assertEqual(dispatcher.stats["coalesced"], 9999)
+
+        due = dispatcher._take_due(1000.0)
+        self.assertEqual(due[0]["count"], 10000)
+        self.assertFalse(dispatcher.submit(self.make_alert(), now=1100.0))
+        self.assertTrue(dispatcher.submit(self.make_alert(), now=1700.0))
+
+    def test_escalation_delay(self):
+        """Test que delay_minutes retrasa el envío y resolve lo cancela"""
+        from alerts import AlertDispatcher
+        dispatcher = AlertDispatcher(self.RULES, {})
+        dispatcher.submit(self.make_alert("high", "a"), now=0.0)
+        dispatcher.submit(self.make_alert("high", "b"), now=0.0)
+        self.assertEqual(dispatcher._take_due(299.0), [])
+        self.assertTrue(dispatcher.resolve(self.make_alert("high", "b")))
+        due = dispatcher._take_due(301.0)
+        self.assertEqual([a["description"] for a in due], ["a"])
+
+    def test_resubmit_after_resolve_keeps_delay(self):
+        """Test que reenviar una alerta resuelta no hereda su entrada antigua del montículo"""
+        from alerts import AlertDispatcher
+        dispatcher = AlertDispatcher(self.RULES, {})
+        dispatcher.submit(self.make_alert("high"), now=0.0)
+        self.assertTrue(dispatcher.resolve(self.make_alert("high")))
+        self.assertTrue(dispatcher.submit(self.make_alert("high"), now=200.0))
+        self.assertEqual(dispatcher._take_due(301.0), [])
+        self.assertEqual(dispatcher.get_stats()["pending"], 1)
+        due = dispatcher._take_due(501.0)
+        self.assertEqual([a["first_seen"] for a in due], [200.0])
+
+    def test_max_pending_drops_low_severity(self):
+        """Test que con la cola llena solo se aceptan alertas graves y se cuentan las descartadas"""
+        from alerts import AlertDispatcher
+        dispatcher = AlertDispatcher(self.RULES, {}, max_pending=100)
+        for i in range(1000):
+            dispatcher.submit(self.make_alert("low", source=f"10.0.{i // 250}.{i % 250}"), now=0.0)
+        self.assertEqual(dispatcher.get_stats()["pending"], 100)
+        self.assertEqual(dispatcher.stats["dropped"], 900)
+        self.assertTrue(dispatcher.submit(self.make_alert("critical"), now=0.0))
+        self.assertEqual(dispatcher.get_stats()["pending"], 101)
+
+        # Resolver las pendientes no deja crecer el montículo con entradas huérfanas
+        for i in range(100):
+            dispatcher.resolve(self.make_alert("low", source=f"10.0.0.{i}"))
+            dispatcher.submit(self.make_alert("low", source=f"10.1.0.{i}"), now=0.0)
+            dispatcher.resolve(self.make_alert("low", source=f"10.1.0.{i}"))
+        self.assertLessEqual(len(dispatcher._heap), 2 * dispatcher.max_pending + 1)
+        self.assertEqual([a["severity"] for a in dispatcher._take_due(0.0)], ["critical"])
+
+    def test_rate_limit_keeps_most_severe(self):
+        """Test que max_alerts_per_hour conserva las alertas más graves"""
+        from alerts import AlertDispatcher
+        dispatcher = AlertDispatcher(self.RULES, {}, max_per_hour=2)
+        alerts = [self.make_alert("low", "l"), self.make_alert("critical", "c"),
+                  self.make_alert("high", "h")]
+        kept = dispatcher._apply_rate_limit(alerts, 0.0)
+        self.assertEqual([a["severity"] for a in kept], ["critical", "high"])
+        self.assertEqual(dispatcher._apply_rate_limit([self.make_alert()], 10.0), [])
+        self.assertEqual(dispatcher.stats["rate_limited"], 2)
+
+    def test_alert_storm_reuses_webhook_connection(self):
+        """Test que 10k alertas salen en pocos POST sobre una conexión"""
+        from alerts import AlertDispatcher, WebhookChannel
+        stub = StubHTTPServer()
+
+        async def scenario():
+            port = await stub.start()
+            channel = WebhookChannel(f"http://127.0.0.1:{port}/hook", retries=1)
+            dispatcher = AlertDispatcher(self.RULES, {"webhook": channel},
+                                         batch_window=0.05, max_per_hour=100000)
+            runner = asyncio.ensure_future(dispatcher.run())
+            await asyncio.sleep(0)
+            for i in range(10000):
+                dispatcher.submit(self.make_alert(description=f"evento {i % 2000}",
+                                                  source=f"10.0.{i % 5}.1"))
+            for _ in range(200):
+                if dispatcher.stats["sent"] + dispatcher.stats["failed"] >= 2000:
+                    break
+                await asyncio.sleep(0.02)
+            runner.cancel()
+            await dispatcher.close()
+            stub.server.close()
+            return dispatcher.stats
+
+        stats = self.async_test(scenario())
+        self.assertEqual(stats["sent"], 2000)
+        self.assertEqual(stats["coalesced"], 8000)
+        self.assertEqual(stub.connections, 1)
+        self.assertLessEqual(len(stub.bodies), 2)
+        payload = json.loads(stub.bodies[0])
+        self.assertEqual(payload["alerts"][0]["count"], 5)
+
+    def test_email_single_session_per_batch(self):
+        """Test una sesión SMTP por lote y resumen en tormentas"""
+        from alerts import EmailChannel
+        stub = StubSMTPServer()
+
+        async def scenario():
+            port = await stub.start()
+            channel = EmailChannel({"smtp_server": "127.0.0.1", "smtp_port": port,
+                                    "to_addresses": ["noc@example.com"]}, digest_threshold=10)
+            await channel.send([self.make_alert(description=str(i)) for i in range(3)])
+            await channel.send([self.make_alert(description=str(i)) for i in range(50)])
+            stub.server.close()
+
+        self.async_test(scenario())
+        self.assertEqual(stub.sessions, 2)
+        self.assertEqual(len(stub.messages), 4)
+        self.assertIn(b"50 alertas", stub.messages[-1])
+
+
+class TestDeviceInventory(unittest.TestCase):
+    """Tests para el inventario incremental de dispositivos"""
+
+    def setUp(self):
+        from inventory import DeviceInventory
+        self.inventory = DeviceInventory(device_timeout=300)
+
+    def test_merge_tracks_changes(self):
+        """Test altas, cambios de estado y last_seen sin delta"""
+        inventory = self.inventory
+        inventory.merge([{"ip": "10.0.0.1", "mac": "AA:BB:CC:00:00:01"},
+                         {"ip": "10.0.0.2", "mac": None}], now=1000.0)
+        base = inventory.version
+        record = inventory.lookup(mac="aa:bb:cc:00:00:01")
+        self.assertEqual(record.first_seen, 1000.0)
+
+        # Mismo barrido con otra latencia: no hay cambios visibles
+        inventory.merge([{"ip": "10.0.0.1", "mac": "AA:BB:CC:00:00:01", "latency": 3.0},
+                         {"ip": "10.0.0.2", "mac": None}], now=1010.0)
+        self.assertEqual(inventory.version, base)
+        self.assertEqual(record.last_seen, 1010.0)
+
+        # El host 2 deja de responder y el 1 cambia de IP (misma MAC)
+        inventory.merge([{"ip": "10.0.0.9", "mac": "aa:bb:cc:00:00:01"}], now=1020.0)
+        delta = inventory.since(base)
+        self.assertFalse(delta["full"])
+        self.assertEqual({d["key"]: d["status"] for d in delta["changed"]},
+                         {"aa:bb:cc:00:00:01": "online", "10.0.0.2": "offline"})
+        self.assertEqual(inventory.lookup(ip="10.0.0.9").to_dict()["key"], "aa:bb:cc:00:00:01")
+        self.assertIsNone(inventory.lookup(ip="10.0.0.1"))
+
+    def test_device_timeout_expiry(self):
+        """Test que device_timeout elimina el dispositivo y lo informa como baja"""
+        inventory = self.inventory
+        inventory.merge([{"ip": "10.0.0.2"}], now=0.0)
+        base = inventory.version
+        inventory.merge([], now=100.0)
+        self.assertEqual(len(inventory), 1)
+        inventory.merge([], now=301.0)
+        self.assertEqual(len(inventory), 0)
+        self.assertEqual(inventory.since(base)["removed"], ["10.0.0.2"])
+
+    def test_single_change_small_delta(self):
+        """Test que con 20k dispositivos un cambio produce un delta de un elemento"""
+        inventory = self.inventory
+        scan = [{"ip": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+                 "mac": f"02:00:00:{i // 65536:02x}:{i // 256 % 256:02x}:{i % 256:02x}"}
+                for i in range(20000)]
+        inventory.merge(scan, now=0.0)
+        self.assertEqual(len(inventory.take_delta()["added"]), 20000)
+
+        scan[123] = dict(scan[123], name="impresora")
+        inventory.merge(scan, now=10.0)
+        delta = inventory.take_delta()
+        self.assertEqual(len(delta["changed"]), 1)
+        self.assertEqual(delta["added"] + delta["removed"], [])
+        self.assertLess(len(json.dumps(delta)), 1024)
+        self.assertIsNone(inventory.take_delta())
+
+    def test_history_overflow_requests_resync(self):
+        """Test resincronía completa cuando el historial ya no cubre la versión"""
+        from inventory import DeviceInventory
+        inventory = DeviceInventory(history_size=5)
+        inventory.merge([{"ip": f"10.0.0.{i}"} for i in range(10)], now=0.0)
+        self.assertTrue(inventory.since(1)["full"])
+        self.assertFalse(inventory.since(inventory.version - 1)["full"])
+
+    def test_devices_since_endpoint(self):
+        """Test del parámetro ?since= del endpoint de dispositivos"""
+        client = TestClient(app)
+        data = client.get("/api/network/devices?since=0").json()
+        self.assertIn("version", data)
+        self.assertIn("added", data)
+
+
+class TestDeviceRecords(unittest.TestCase):
+    """Tests para los registros compactos de dispositivos"""
     
-    print("🔬 Ejecutando tests de rendimiento...")
+    def test_address_round_trip(self):
+        """Test IPs y MACs se guardan como enteros y vuelven al mismo texto"""
+        from records import format_key, int_to_ip, int_to_mac, ip_to_int, mac_to_int, make_key
+        
+        for ip in ("10.0.0.1", "192.168.1.254", "fe80::1", "::1"):
+            self.assertEqual(int_to_ip(ip_to_int(ip)), ip)
+        self.assertNotEqual(ip_to_int("::1"), ip_to_int("0.0.0.1"))
+        self.assertEqual(int_to_mac(mac_to_int("AA-BB-CC-00-00-01")), "aa:bb:cc:00:00:01")
+        self.assertEqual(format_key(make_key(None, ip_to_int("10.0.0.2"))), "10.0.0.2")
+        self.assertEqual(format_key(make_key(mac_to_int("aa:bb:cc:00:00:01"), 1)), "aa:bb:cc:00:00:01")
+    
+    def test_json_output_unchanged(self):
+        """Test la representación pública conserva campos y formatos"""
+        from datetime import datetime
+        from inventory import DeviceInventory
+        
+        inventory = DeviceInventory()
+        inventory.observe({"ip": "10.0.0.5", "mac": "AA:BB:CC:00:00:05",
+                           "manufacturer": "TP-Link", "latency": 2.5}, now=1000.0)
+        device = inventory.devices()[0]
+        self.assertEqual(device, {
+            "key": "aa:bb:cc:00:00:05", "ip": "10.0.0.5", "mac": "aa:bb:cc:00:00:05",
+            "name": "10.0.0.5", "type": "unknown", "status": "online",
+            "manufacturer": "TP-Link", "latency": 2.5,
+            "first_seen": datetime.fromtimestamp(1000.0).isoformat(),
+            "last_seen": datetime.fromtimestamp(1000.0).isoformat(),
+            "state_changed": datetime.fromtimestamp(1000.0).isoformat(),
+        })
+    
+    def test_interned_values_shared(self):
+        """Test fabricantes y estados repetidos comparten un único objeto"""
+        from inventory import DeviceInventory
+        
+        inventory = DeviceInventory()
+        for i in range(3):
+            inventory.observe({"ip": f"10.0.0.{i + 1}", "manufacturer": "".join(["TP-", "Link"])})
+        records = list(inventory.records.values())
+        self.assertIs(records[0].manufacturer, records[2].manufacturer)
+        self.assertIs(records[0].status, records[1].status)
+    
+    def test_record_smaller_than_dict(self):
+        """Test un registro compacto ocupa menos de la mitad que su diccionario"""
+        import tracemalloc
+        from records import DeviceRecord, ip_to_int, mac_to_int
+        
+        def measure(build):
+            tracemalloc.start()
+            items = [build(i) for i in range(2000)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            self.assertEqual(len(items), 2000)
+            return size
+        
+        compact = measure(lambda i: DeviceRecord(
+            mac_to_int(f"02:00:00:00:{i // 256:02x}:{i % 256:02x}"), ip_to_int(f"10.0.{i // 256}.{i % 256}"),
+            mac_to_int(f"02:00:00:00:{i // 256:02x}:{i % 256:02x}"), None, "unknown", "TP-Link", 1.5, 1000.0 + i))
+        
+        def as_dict(i):
+            mac, ip, now = f"02:00:00:00:{i // 256:02x}:{i % 256:02x}", f"10.0.{i // 256}.{i % 256}", 1000.0 + i
+            return {"key": mac, "ip": ip, "mac": mac, "name": ip, "type": "unknown", "status": "online",
+                    "manufacturer": "TP-Link", "latency": 1.5,
+                    "first_seen": now, "last_seen": now, "state_changed": now}
+        
+        plain = measure(as_dict)
+        self.assertLess(compact, plain / 2)
+
+class TestVendorIndex(unittest.TestCase):
+    """Tests para el índice de fabricantes OUI"""
+    
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmpdir.name, "oui.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write("Registry,Assignment,Organization Name,Organization Address\n"
+                    'MA-L,B827EB,Raspberry Pi Foundation,"Cambridge, GB"\n'
+                    "MA-L,70B3D5,IEEE Registration Authority,Piscataway US\n"
+                    "MA-M,70B3D51,Vendedor MA-M,Madrid ES\n"
+                    "MA-S,70B3D5F2A,Vendedor MA-S,Lima PE\n")
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def make_index(self):
+        from oui import VendorIndex
+        index = VendorIndex([self.csv_path], os.path.join(self.tmpdir.name, "oui.idx"))
+        self.addCleanup(index.close)
+        return index
+    
+    def test_longest_prefix_wins(self):
+        """Test los bloques de 36 y 28 bits prevalecen sobre su OUI de 24"""
+        index = self.make_index()
+        self.assertEqual(index.lookup("B8:27:EB:12:34:56"), "Raspberry Pi Foundation")
+        self.assertEqual(index.lookup("70:B3:D5:F2:A0:01"), "Vendedor MA-S")
+        self.assertEqual(index.lookup("70-b3-d5-1f-ff-ff"), "Vendedor MA-M")
+        self.assertEqual(index.lookup("70:B3:D5:80:00:00"), "IEEE Registration Authority")
+        self.assertEqual(index.lookup(0xB827EB000001), "Raspberry Pi Foundation")
+    
+    def test_unknown_and_local_macs(self):
+        """Test MACs sin asignar o administradas localmente no tienen fabricante"""
+        index = self.make_index()
+        self.assertIsNone(index.lookup("00:11:22:33:44:55"))
+        self.assertIsNone(index.lookup("BA:27:EB:12:34:56"))
+        self.assertIsNone(index.lookup(None))
+    
+    def test_lazy_build_and_rebuild(self):
+        """Test el índice se crea en la primera consulta y se regenera si el CSV cambia"""
+        import time
+        index = self.make_index()
+        self.assertFalse(os.path.exists(index.index_path))
+        index.lookup("B8:27:EB:00:00:01")
+        self.assertTrue(os.path.exists(index.index_path))
+        
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write("MA-L,001132,Synology Incorporated,Taipei TW\n")
+        os.utime(self.csv_path, (time.time() + 10, time.time() + 10))
+        index.load()
+        self.assertEqual(index.lookup("00:11:32:00:00:01"), "Synology Incorporated")
+    
+    def test_bundled_file_resolves_vendors(self):
+        """Test el CSV incluido con la aplicación resuelve fabricantes comunes"""
+        from oui import DEFAULT_SOURCES, VendorIndex
+        index = VendorIndex(DEFAULT_SOURCES, os.path.join(self.tmpdir.name, "bundled.idx"))
+        self.addCleanup(index.close)
+        self.assertEqual(index.lookup("00:50:56:01:02:03"), "VMware, Inc.")
+        self.assertEqual(index.lookup_many(["B8:27:EB:00:00:01", None]),
+                         ["Raspberry Pi Foundation", None])
+
+class TestAnomalyDetector(unittest.TestCase):
+    """Tests para la detección de anomalías en series temporales"""
+    
+    START = 1_700_000_000 - 1_700_000_000 % 3600
+    
+    def make_series(self, series=20, samples=240, seed=3):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        values = rng.normal(1000.0, 20.0, (samples, series))
+        buckets = np.arange(samples, dtype=np.int64) * 60 + self.START
+        names = [f"device.10.0.0.{i}:161.bytes_in" for i in range(series)]
+        return names, buckets, values
+    
+    def test_spike_detected_with_severity(self):
+        """Test un pico aislado se detecta una sola vez con su severidad"""
+        from anomaly import AnomalyDetector
+        names, buckets, values = self.make_series()
+        values[200, 7] = 1400.0
+        detector = AnomalyDetector(min_severity="medium")
+        
+        threats = detector.detect(names, buckets, values, now=buckets[-1] + 60)
+        self.assertEqual([t["source_ip"] for t in threats], ["10.0.0.7"])
+        self.assertEqual(threats[0]["type"], "anomaly")
+        self.assertEqual(threats[0]["severity"], "critical")
+        # Los buckets ya evaluados no vuelven a generar amenazas
+        self.assertEqual(detector.detect(names, buckets, values, now=buckets[-1] + 60), [])
+    
+    def test_threat_threshold_filters_severity(self):
+        """Test security.threat_threshold descarta anomalías de menor severidad"""
+        from anomaly import AnomalyDetector
+        names, buckets, values = self.make_series()
+        values[200, 3] = 1110.0
+        low = AnomalyDetector.from_config({"threat_threshold": "low"})
+        high = AnomalyDetector.from_config({"threat_threshold": "high"})
+        
+        threats = low.detect(names, buckets, values, now=buckets[-1] + 60)
+        self.assertIn("10.0.0.3", [t["source_ip"] for t in threats])
+        self.assertEqual(high.detect(names, buckets, values, now=buckets[-1] + 60), [])
+    
+    def test_current_bucket_and_counters(self):
+        """Test el bucket en curso se espera y los contadores se evalúan por incremento"""
+        import numpy as np
+        from anomaly import AnomalyDetector
+        names, buckets, values = self.make_series(series=2)
+        names = ["firewall.blocked_connections", "network.errors"]
+        values[:, 0] = np.cumsum(np.full(len(buckets), 10.0))
+        values[-1, 0] += 500
+        detector = AnomalyDetector(counters=["firewall.blocked_connections"])
+        
+        self.assertEqual(detector.detect(names, buckets, values, now=buckets[-1] + 1), [])
+        threats = detector.detect(names, buckets, values, now=buckets[-1] + 60)
+        self.assertEqual(len(threats), 1)
+        self.assertIn("firewall.blocked_connections", threats[0]["description"])
+        self.assertIsNone(threats[0]["source_ip"])
+    
+    def test_hourly_profile_removes_daily_pattern(self):
+        """Test con perfil horario el cambio de nivel esperado no es una anomalía"""
+        import numpy as np
+        from anomaly import AnomalyDetector
+        names, buckets, values = self.make_series(series=1, samples=180)
+        level = np.where((buckets // 3600) % 24 == (self.START // 3600 + 2) % 24, 5000.0, 1000.0)
+        values[:, 0] += level - 1000.0
+        profile = [(names[0], hour, 1000.0, 60) for hour in range(24)]
+        profile[(self.START // 3600 + 2) % 24] = (names[0], (self.START // 3600 + 2) % 24, 5000.0, 60)
+        
+        plain = AnomalyDetector()
+        self.assertEqual(len(plain.detect(names, buckets, values, now=buckets[-1] + 60)), 1)
+        seasonal = AnomalyDetector()
+        seasonal.load_profiles(profile)
+        self.assertEqual(seasonal.detect(names, buckets, values, now=buckets[-1] + 60), [])
+    
+    def test_window_snapshot_and_backfill(self):
+        """Test la ventana promedia por bucket, descarta lo antiguo y se recarga"""
+        from anomaly import SeriesWindow
+        from storage import TimeSeriesStore
+        window = SeriesWindow(step=60, length=3)
+        window.add({"a": 1.0, "b": None}, ts=self.START)
+        window.add({"a": 3.0, "b": 4.0}, ts=self.START + 30)
+        window.add({"a": 5.0}, ts=self.START + 240)
+        names, buckets, values = window.snapshot()
+        self.assertEqual(names, ["a", "b"])
+        self.assertEqual(buckets.tolist(), [self.START + 240])
+        self.assertEqual(values[0, 0], 5.0)
+        
+        store = TimeSeriesStore()
+        self.addCleanup(store.close)
+        store.record({"a": 1.0, "b": 2.0}, ts=self.START)
+        store.record({"a": 3.0}, ts=self.START + 10)
+        store.flush()
+        restored = SeriesWindow(step=60, length=10)
+        restored.backfill(store.rollups(60, self.START))
+        names, buckets, values = restored.snapshot()
+        self.assertEqual(values[0].tolist(), [2.0, 2.0])
+    
+    def test_pass_over_large_matrix(self):
+        """Test una pasada sobre 10k series x 1440 minutos tarda menos de un segundo"""
+        import time
+        names, buckets, values = self.make_series(series=10000, samples=1440)
+        from anomaly import AnomalyDetector
+        detector = AnomalyDetector()
+        
+        started = time.perf_counter()
+        detector.detect(names, buckets, values, now=buckets[-1] + 60)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+class TestExport(unittest.TestCase):
+    """Tests para la exportación por partes"""
+    
+    BASE = 1_700_000_000
+    
+    def setUp(self):
+        from threatlog import ThreatLog
+        from storage import TimeSeriesStore
+        self.log = ThreatLog(":memory:")
+        self.log.add_many({
+            "type": "intrusion",
+            "severity": ("low", "high")[i % 2],
+            "source_ip": f"10.0.0.{i % 7}",
+            "description": 'Escaneo, "lento"' if i == 0 else "Escaneo",
+            "timestamp": self.BASE + i,
+        } for i in range(1000))
+        self.store = TimeSeriesStore()
+        for i in range(300):
+            self.store.record({"network.errors": i, "firewall.blocked_connections": 2 * i},
+                              ts=self.BASE + 10 * i)
+        self.store.flush()
+    
+    def tearDown(self):
+        self.log.close()
+        self.store.close()
+    
+    def test_threat_rows_by_range_in_batches(self):
+        """Test el rango y los filtros se recorren por lotes en orden cronológico"""
+        rows = list(self.log.iter_rows(self.BASE + 100, self.BASE + 900, severity="high",
+                                       batch_size=37))
+        self.assertEqual(len(rows), 400)
+        self.assertEqual(rows[0][1], self.BASE + 101)
+        self.assertEqual(rows[-1][1], self.BASE + 899)
+        self.assertEqual([r[0] for r in rows], sorted(r[0] for r in rows))
+        self.assertEqual(list(self.log.iter_rows(self.BASE + 5000)), [])
+    
+    def test_threat_rows_out_of_order_timestamps(self):
+        """Test eventos insertados con marcas de tiempo anteriores no se pierden"""
+        self.log.add_many({"type": "anomaly", "severity": "medium",
+                           "timestamp": self.BASE + 500.5} for _ in range(3))
+        rows = list(self.log.iter_rows(self.BASE + 500, self.BASE + 502, batch_size=2))
+        self.assertEqual([r[1] for r in rows], [self.BASE + 500, self.BASE + 500.5,
+                                                self.BASE + 500.5, self.BASE + 500.5,
+                                                self.BASE + 501])
+        self.assertEqual(len({r[0] for r in rows}), 5)
+    
+    def test_csv_and_ndjson_stream_in_chunks(self):
+        """Test CSV con cabecera y comillas, y NDJSON línea a línea"""
+        import csv
+        import io
+        from export import THREAT_COLUMNS, encode
+        from serialization import loads
+        
+        chunks = list(encode("csv", THREAT_COLUMNS, self.log.iter_rows(batch_size=100), chunk_rows=250))
+        self.assertEqual(len(chunks), 4)
+        table = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+        self.assertEqual(table[0], [name for name, _ in THREAT_COLUMNS])
+        self.assertEqual(len(table), 1001)
+        self.assertEqual(table[1][5], 'Escaneo, "lento"')
+        
+        lines = b"".join(encode("ndjson", THREAT_COLUMNS, self.log.iter_rows(until=self.BASE + 3))).splitlines()
+        self.assertEqual([loads(line)["id"] for line in lines], [1, 2, 3])
+        self.assertTrue(loads(lines[0])["timestamp"].startswith("20"))
+        # Sin filas queda solo la cabecera
+        self.assertEqual(b"".join(encode("csv", THREAT_COLUMNS, iter(()))), b"id,timestamp,type,severity,source_ip,description\n")
+    
+    def test_stats_rows_merged_in_time_order(self):
+        """Test las series se intercalan por tiempo, crudas o desde agregados"""
+        series = ["firewall.blocked_connections", "network.errors"]
+        rows = list(self.store.iter_rows(series, self.BASE, self.BASE + 3000, batch_size=50))
+        self.assertEqual(len(rows), 600)
+        self.assertEqual([r[0] for r in rows], sorted(r[0] for r in rows))
+        
+        hourly = list(self.store.iter_rows(series, 0, self.BASE + 3000, step=3600))
+        self.assertEqual(sum(r[2] for r in hourly if r[1] == "network.errors"), 300)
+    
+    def test_export_endpoint(self):
+        """Test la API responde por partes y valida formato y conjunto"""
+        client = TestClient(app)
+        enabled = {"dashboard": {"features": {"export_data": True}}}
+        with patch("app.config", enabled), patch("app.security_monitor.threat_log", self.log), \
+                patch("app.timeseries", self.store):
+            response = client.get(f"/api/export/threats?format=ndjson&since={self.BASE + 990}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+            self.assertIn("attachment", response.headers["content-disposition"])
+            self.assertEqual(len(response.content.splitlines()), 10)
+            
+            response = client.get("/api/export/stats?step=1m&metrics=errors")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.text.startswith("timestamp,series,count,avg,min,max"))
+            
+            self.assertEqual(client.get("/api/export/stats?step=5m").status_code, 400)
+            self.assertEqual(client.get("/api/export/threats?format=xml").status_code, 400)
+            self.assertEqual(client.get("/api/export/users").status_code, 404)
+        self.assertEqual(client.get("/api/export/devices").status_code, 404)
+
+class TestReportGenerator(AsyncTestCase):
+    """Tests para los informes calculados en el pool de procesos"""
+    
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from datetime import date, datetime
+        from storage import TimeSeriesStore
+        from threatlog import ThreatLog
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "sentinel.db")
+        self.monday = date(2025, 1, 6)
+        start = datetime(2025, 1, 6).timestamp()
+        
+        store = TimeSeriesStore(self.db_path)
+        threats = ThreatLog(self.db_path)
+        for hour in range(7 * 24):
+            ts = start + hour * 3600
+            store.record({
+                "ping.8.8.8.8.up": 0.0 if hour == 30 else 1.0,
+                "ping.8.8.8.8.latency": 10.0 + hour % 5,
+                "inventory.total": 10,
+                "inventory.online": 8,
+                "ports.probes": 100,
+                "ports.deviations": 5,
+                "ports.critical": 1,
+            }, ts=ts)
+            threats.add({"type": "intrusion", "severity": "high", "source_ip": "10.0.0.9",
+                         "description": "x", "timestamp": ts})
+        store.flush()
+        store.close()
+        threats.close()
+    
+    def make_generator(self):
+        from reports import ReportGenerator
+        generator = ReportGenerator(self.db_path, max_workers=1,
+                                    output_dir=os.path.join(self.tmpdir.name, "reports"))
+        self.addCleanup(generator.close)
+        return generator
+    
+    def test_daily_report_sections(self):
+        """Test disponibilidad, latencia, amenazas y puertos de un día"""
+        from datetime import timedelta
+        generator = self.make_generator()
+        report = self.async_test(generator.generate("daily", self.monday + timedelta(days=1)))
+        
+        self.assertEqual(report["days"], 1)
+        self.assertAlmostEqual(report["availability"]["targets"]["8.8.8.8"], 100 * 23 / 24, places=1)
+        self.assertEqual(report["availability"]["devices_online_pct"], 80.0)
+        self.assertEqual(report["latency"]["targets"]["8.8.8.8"]["max_ms"], 14.0)
+        self.assertEqual(report["threats"]["total"], 24)
+        self.assertEqual(report["threats"]["top_sources"], {"10.0.0.9": 24})
+        self.assertEqual(report["ports"]["compliance_pct"], 95.0)
+    
+    def test_weekly_report_reuses_daily_aggregates(self):
+        """Test el informe semanal combina los agregados diarios en caché"""
+        from datetime import timedelta
+        generator = self.make_generator()
+        for offset in range(7):
+            self.async_test(generator.generate("daily", self.monday + timedelta(days=offset)))
+        self.assertEqual(generator.computed, 7)
+        
+        weekly = self.async_test(generator.generate("weekly", self.monday))
+        self.assertEqual(generator.computed, 7)
+        self.assertEqual(weekly["threats"]["total"], 7 * 24)
+        self.assertAlmostEqual(weekly["availability"]["targets"]["8.8.8.8"], 100 * (1 - 1 / 168), places=1)
+        
+        path = generator.write(weekly, self.monday)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["period"], "weekly")
+        with self.assertRaises(ValueError):
+            self.async_test(generator.generate("monthly", self.monday))
+    
+    def test_warning_pings_count_as_available(self):
+        """Test que solo "offline" cuenta como caída en la serie de disponibilidad"""
+        from app import report_series
+        audit = {"probes": 0, "total_deviations": 0, "critical_deviations": 0}
+        values = report_series([
+            {"host": "a", "status": "online", "latency": 5.0},
+            {"host": "b", "status": "warning", "latency": 450.0},
+            {"host": "c", "status": "offline", "latency": None},
+        ], audit)
+        self.assertEqual([values[f"ping.{h}.up"] for h in "abc"], [1.0, 1.0, 0.0])
+
+class TestMaintenance(AsyncTestCase):
+    """Tests para la retención por lotes, las copias y la limpieza de logs"""
+    
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from storage import TimeSeriesStore
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = TimeSeriesStore(os.path.join(self.tmpdir.name, "sentinel.db"))
+        self.addCleanup(self.store.close)
+        self.now = 1_700_000_000
+        for day in range(10):
+            for minute in range(0, 1440, 10):
+                ts = self.now - day * 86400 - minute * 60
+                self.store.record({"a": day, "b": minute, "c": 1.0}, ts=ts)
+        self.store.flush()
+    
+    def make_worker(self, **kwargs):
+        from maintenance import MaintenanceWorker
+        return MaintenanceWorker(
+            self.store, old_data_days=3, batch_size=50, batch_pause=0,
+            log_dir=os.path.join(self.tmpdir.name, "logs"),
+            backup_dir=os.path.join(self.tmpdir.name, "backups"), **kwargs
+        )
+    
+    def test_prune_in_batches(self):
+        """Test de borrado por lotes reanudando en la serie pendiente"""
+        cutoff = self.now - 3 * 86400
+        expired = self.store.query("SELECT COUNT(*) FROM ts_samples WHERE ts < ?", (cutoff,))[0][0]
+        deleted, after = self.store.prune(0, cutoff, batch_size=100)
+        self.assertEqual(deleted, 100)
+        self.assertEqual(after, "")
+        
+        worker = self.make_worker()
+        total = self.async_test(worker.prune(now=self.now))
+        self.assertGreater(total, expired - 100)
+        self.assertEqual(
+            self.store.query("SELECT COUNT(*) FROM ts_samples WHERE ts < ?", (cutoff,))[0][0], 0)
+        self.assertEqual(
+            self.store.query("SELECT COUNT(*) FROM ts_rollup WHERE bucket < ?", (cutoff - 3600,))[0][0], 0)
+        self.assertEqual(
+            self.store.query("SELECT COUNT(*) FROM ts_samples WHERE ts >= ?", (cutoff,))[0][0],
+            3 * 3 * 144 + 3)
+        
+        freed = self.async_test(worker.compact())
+        self.assertGreater(freed, 0)
+        self.assertEqual(self.store.query("PRAGMA freelist_count")[0][0], 0)
+
+    def test_compact_skipped_without_incremental_vacuum(self):
+        """Test que sin auto_vacuum incremental no se cuentan páginas como liberadas"""
+        import sqlite3
+        from storage import TimeSeriesStore
+        path = os.path.join(self.tmpdir.name, "legacy.db")
+        # Base creada antes de auto_vacuum=INCREMENTAL: el pragma ya no surte efecto
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE legacy (data BLOB)")
+        conn.executemany("INSERT INTO legacy VALUES (?)", [(b"x" * 4000,) for _ in range(50)])
+        conn.commit()
+        conn.execute("DELETE FROM legacy")
+        conn.commit()
+        conn.close()
+        store = TimeSeriesStore(path)
+        self.addCleanup(store.close)
+        self.assertGreater(store.query("PRAGMA freelist_count")[0][0], 0)
+
+        self.store = store
+        self.assertEqual(self.async_test(self.make_worker().compact()), 0)
+        self.assertGreater(store.query("PRAGMA freelist_count")[0][0], 0)
+
+    def test_backup_config_falls_back_to_database(self):
+        """Test que database.backup_* aplica si maintenance.backup no lo define"""
+        from maintenance import MaintenanceWorker
+        database = {"backup_enabled": False, "backup_interval": 600}
+        worker = MaintenanceWorker.from_config(self.store, {}, {}, database)
+        self.assertFalse(worker.backup_enabled)
+        self.assertEqual(worker.backup_interval, 600)
+
+        worker = MaintenanceWorker.from_config(
+            self.store, {"backup": {"enabled": True, "interval": 7200}}, {}, database)
+        self.assertTrue(worker.backup_enabled)
+        self.assertEqual(worker.backup_interval, 7200)
+
+    def test_backup_consistent_during_writes(self):
+        """Test de copia comprimida coherente mientras se sigue escribiendo"""
+        import gzip
+        import sqlite3
+        import threading
+        worker = self.make_worker(backup_retention=2, backup_pages=4)
+        expected = self.store.query("SELECT COUNT(*) FROM ts_samples")[0][0]
+        
+        stop = threading.Event()
+        def ingest():
+            ts = self.now + 1
+            while not stop.is_set():
+                self.store.record({"d": 1.0}, ts=ts)
+                self.store.flush()
+                ts += 1
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        try:
+            path = worker.backup(now=self.now)
+        finally:
+            stop.set()
+            writer.join()
+        
+        self.assertTrue(path.endswith(".db.gz"))
+        restored = os.path.join(self.tmpdir.name, "restored.db")
+        with gzip.open(path, "rb") as src, open(restored, "wb") as dst:
+            dst.write(src.read())
+        conn = sqlite3.connect(restored)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+        self.assertGreaterEqual(conn.execute("SELECT COUNT(*) FROM ts_samples").fetchone()[0], expected)
+        
+        # Rotación: solo las `retention` copias más recientes
+        worker.backup(now=self.now + 60)
+        worker.backup(now=self.now + 120)
+        self.assertEqual(len(worker.backups()), 2)
+        self.assertFalse(os.path.exists(path))
+    
+    def test_old_logs_and_rotation(self):
+        """Test de limpieza de logs antiguos y archivo rotativo"""
+        import logging
+        from maintenance import configure_logging
+        worker = self.make_worker(old_logs_days=30)
+        os.makedirs(worker.log_dir)
+        old = os.path.join(worker.log_dir, "sentinel.log.3")
+        recent = os.path.join(worker.log_dir, "sentinel.log")
+        for path in (old, recent):
+            Path(path).write_text("x")
+        os.utime(old, (self.now - 40 * 86400, self.now - 40 * 86400))
+        os.utime(recent, (self.now, self.now))
+        self.assertEqual(worker.remove_old_logs(now=self.now), [old])
+        self.assertTrue(os.path.exists(recent))
+        
+        root = logging.getLogger()
+        level = root.level
+        handler = configure_logging({"file": recent, "max_size_mb": 1, "backup_count": 2})
+        try:
+            self.assertEqual(handler.maxBytes, 1024 * 1024)
+            self.assertEqual(handler.backupCount, 2)
+            self.assertIn(handler, root.handlers)
+        finally:
+            root.removeHandler(handler)
+            handler.close()
+            root.setLevel(level)
+
+class TestThreatIntel(unittest.TestCase):
+    """Tests para el índice de indicadores y su uso en syslog y firewall"""
+    
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.feed = os.path.join(self.tmpdir.name, "local_blacklist.txt")
+        Path(self.feed).write_text(
+            "# comentario\n"
+            "203.0.113.66\n"
+            "198.51.100.0/24  # red completa\n"
+            "198.51.0.0/16\n"
+            "10.9.9.9/32\n"
+            "2001:db8:bad::/48\n"
+            "0.0.0.0 malware.example\n"
+            "*.phish.test\n"
+            "no es un indicador\n"
+        )
+    
+    def make_intel(self):
+        from threat_intel import ThreatIntel
+        intel = ThreatIntel.from_config({
+            "sources": ["local_blacklist", "virustotal"], "feed_dir": self.tmpdir.name,
+        })
+        intel.reload()
+        return intel
+    
+    def test_match_ips_networks_and_domains(self):
+        """Test de coincidencias exactas, por prefijo más largo y por dominio padre"""
+        intel = self.make_intel()
+        self.assertEqual(intel.indicators.stats()["ips"], 2)
+        self.assertEqual(intel.match("203.0.113.66"), ("203.0.113.66", "local_blacklist"))
+        self.assertEqual(intel.match("198.51.100.7"), ("198.51.100.0/24", "local_blacklist"))
+        self.assertEqual(intel.match("198.51.7.1"), ("198.51.0.0/16", "local_blacklist"))
+        self.assertEqual(intel.match("10.9.9.9")[0], "10.9.9.9")
+        self.assertEqual(intel.match("2001:db8:bad:1::5")[0], "2001:db8:bad::/48")
+        self.assertEqual(intel.match("cdn.Malware.Example")[0], "malware.example")
+        self.assertEqual(intel.match("login.phish.test")[0], "phish.test")
+        for value in ("203.0.113.67", "0.0.0.0", "example", "notmalware.example", "", None):
+            self.assertIsNone(intel.match(value))
+        self.assertEqual(intel.match_many(["203.0.113.66", "192.0.2.1"])[1], None)
+    
+    def test_reload_swaps_snapshot(self):
+        """Test de recarga solo con cambios y sustitución atómica del índice"""
+        import time
+        intel = self.make_intel()
+        self.assertFalse(intel.reload())
+        previous = intel.indicators
+        with open(self.feed, "a") as f:
+            f.write("192.0.2.1\n")
+        os.utime(self.feed, (time.time() + 5, time.time() + 5))
+        self.assertTrue(intel.reload())
+        self.assertIsNot(intel.indicators, previous)
+        self.assertIsNotNone(intel.match("192.0.2.1"))
+        # Quien aún tenga la instantánea anterior sigue consultándola sin cambios
+        self.assertIsNone(previous.match("192.0.2.1"))
+    
+    def test_firewall_and_syslog_matching(self):
+        """Test de amenazas por indicadores en el log del firewall y en syslog"""
+        from firewall_log import FirewallLogAnalyzer
+        from syslog_server import SyslogThreatSink
+        intel = self.make_intel()
+        analyzer = FirewallLogAnalyzer(intel=intel)
+        chunk = (
+            b"[UFW BLOCK] IN=eth0 SRC=203.0.113.66 DST=10.0.0.1 PROTO=TCP SPT=1 DPT=22\n"
+            b"[UFW ALLOW] IN=eth0 SRC=198.51.100.9 DST=10.0.0.1 PROTO=TCP SPT=1 DPT=443\n"
+            b"[UFW ALLOW] IN=eth0 SRC=192.0.2.50 DST=10.0.0.1 PROTO=TCP SPT=1 DPT=443\n"
+        )
+        threats = analyzer.feed(chunk, now=1000.0)
+        self.assertEqual(sorted(t["source_ip"] for t in threats), ["198.51.100.9", "203.0.113.66"])
+        self.assertTrue(all(t["type"] == "threat_intel" for t in threats))
+        # Una sola amenaza por fuente y ventana
+        self.assertEqual(analyzer.feed(chunk, now=1001.0), [])
+        
+        notified = []
+        sink = SyslogThreatSink(Mock(), threat_severity=3, notify=notified.extend, intel=intel)
+        pending = sink([{"severity": 6, "host": "fw1", "app": "sshd", "received_at": 1000.0,
+                         "message": "Accepted password for root from 203.0.113.66 port 5022"}])
+        pending.close()
+        self.assertEqual([t["source_ip"] for t in notified], ["203.0.113.66"])
+        self.assertIn("sshd", notified[0]["description"])
     
-    # Test velocidad de escaneo de dispositivos
-    monitor = NetworkMonitor()
-    start_time = time.time()
+    def test_device_matches_expire(self):
+        """Test que los avisos por dispositivo caducan tras update_interval"""
+        monitor = SecurityMonitor()
+        monitor.intel = self.make_intel()
+        monitor.intel.update_interval = 3600
+        from types import SimpleNamespace
+        records = [SimpleNamespace(ip_text="203.0.113.66", name=None),
+                   SimpleNamespace(ip_text="192.0.2.1", name="pc")]
+        self.assertEqual(len(monitor.match_devices(records, now=1000.0)), 1)
+        self.assertEqual(monitor.match_devices(records, now=2000.0), [])
+        self.assertEqual(len(monitor.match_devices(records, now=4700.0)), 1)
+        self.assertEqual(list(monitor.intel_reported.values()), [4700.0])
+
+class TestProxyLog(unittest.TestCase):
+    """Tests para el analizador del access.log del proxy"""
+    
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        categories = os.path.join(self.tmpdir.name, "categories")
+        os.makedirs(categories)
+        Path(categories, "malware.txt").write_text("# lista\nbad.example\n")
+        Path(categories, "news.txt").write_text("news.example\n")
+        self.config = {
+            "log_path": os.path.join(self.tmpdir.name, "access.log"),
+            "category_dir": categories,
+            "category_feeds": {"news": os.path.join(categories, "news.txt")},
+            "blocked_categories": ["malware", "phishing"],
+            "window": 600, "resolution": 60, "workers": 2,
+        }
+        self.start = 1_760_000_040  # múltiplo de 60
     
-    async def performance_test():
-        devices = await monitor.scan_devices()
-        return len(devices)
+    def squid_lines(self, count: int, start: int) -> str:
+        codes = ("TCP_HIT/200", "TCP_MISS/200", "TCP_MEM_HIT/200", "TCP_DENIED/403")
+        hosts = ("http://www.news.example/a", "http://cdn.bad.example/x.exe", "http://ok.example/")
+        lines = []
+        for i in range(count):
+            host = hosts[i % 3]
+            lines.append(f"{start + i}.{i % 1000:03d}    12 10.0.0.{i % 4} {codes[i % 4]} 1000 GET "
+                         f"{host} - HIER_DIRECT/93.184.216.34 text/html\n")
+        lines.append(f"{start + count}.000 5 10.0.0.9 TCP_TUNNEL/200 500 CONNECT bad.example:443 "
+                     f"- HIER_DIRECT/1.2.3.4 -\n")
+        lines.append("línea basura\n")
+        return "".join(lines)
     
-    devices_count = run_async_test(performance_test())
-    end_time = time.time()
+    def test_classification_and_window(self):
+        """Test de categorías, bloqueos y tasa de aciertos en la ventana"""
+        from proxy_log import ProxyLogMonitor
+        Path(self.config["log_path"]).write_text(self.squid_lines(1200, self.start))
+        monitor = ProxyLogMonitor.from_config(self.config, state_dir=self.tmpdir.name)
+        self.assertTrue(monitor.filtering)
+        monitor.poll()
+        
+        stats = monitor.stats(now=self.start + 1200)
+        self.assertEqual(stats["lines"], 1202)
+        self.assertEqual(stats["unparsed"], 1)
+        self.assertEqual(stats["requests"], 1201)
+        self.assertEqual(stats["categories"], {"news": 400, "malware": 401})
+        # Denegadas por Squid (1 de cada 4) o de categoría bloqueada (1 de cada 3) más el CONNECT
+        self.assertEqual(stats["blocked"], 300 + 400 - 100 + 1)
+        self.assertEqual(stats["top_blocked_domains"][0][0], "cdn.bad.example")
+        # Ventana de 600 s: los últimos 10 buckets de 60 s y el bucket en curso
+        self.assertEqual(stats["window"]["requests"], 601)
+        self.assertEqual(stats["cache_hit_ratio"], 0.6667)
+        
+        # Lo nuevo se procesa de forma incremental desde el offset guardado
+        with open(self.config["log_path"], "a") as f:
+            f.write(self.squid_lines(4, self.start + 1300))
+        monitor.poll()
+        self.assertEqual(monitor.stats()["requests"], 1206)
     
-    scan_time = end_time - start_time
-    print(f"✅ Escaneo de {devices_count} dispositivos: {scan_time:.2f}s")
+    def test_parallel_ranges_match_sequential(self):
+        """Test de análisis por tramos en varios procesos igual al secuencial"""
+        from proxy_log import ProxyLogMonitor, parse_range
+        Path(self.config["log_path"]).write_text(self.squid_lines(3000, self.start))
+        monitor = ProxyLogMonitor.from_config(self.config, state_dir=self.tmpdir.name)
+        monitor.range_size = 16 * 1024
+        summary = monitor.analyze_file(self.config["log_path"])
+        
+        size = os.path.getsize(self.config["log_path"])
+        sequential = parse_range(self.config["log_path"], 0, size, monitor._options())
+        self.assertEqual(summary["lines"], sequential["lines"])
+        self.assertEqual(summary["buckets"], sequential["buckets"])
+        self.assertEqual(summary["categories"], sequential["categories"])
+    
+    def test_common_log_format(self):
+        """Test del formato common de Squid con y sin código de caché"""
+        from proxy_log import ProxyLogParser, load_categories
+        parser = ProxyLogParser(load_categories({"malware": os.path.join(self.tmpdir.name,
+                                                                          "categories", "malware.txt")}),
+                                ["malware"], log_format="common")
+        summary = parser.parse(
+            b'10.0.0.1 - - [18/Oct/2026:10:00:05 +0000] "GET http://a.bad.example/ HTTP/1.1" '
+            b'200 512 "-" "curl" TCP_MISS:HIER_DIRECT\n'
+            b'10.0.0.2 - - [18/Oct/2026:10:00:59 +0000] "GET http://ok.example/ HTTP/1.1" 200 100 '
+            b'TCP_MEM_HIT:HIER_NONE\n'
+            b'10.0.0.3 - - [18/Oct/2026:10:01:00 +0000] "CONNECT ok.example:443 HTTP/1.1" 403 0\n'
+        )
+        self.assertEqual(summary["unparsed"], 0)
+        first, second = sorted(summary["buckets"].items())
+        self.assertEqual(first[1][:4], [2, 1, 1, 1])
+        self.assertEqual(second[1][:2], [1, 1])
+        with self.assertRaises(ValueError):
+            ProxyLogParser(log_format="apache")
+
+class TestClusterNode(AsyncTestCase):
+    """Tests para el modo multi-proceso"""
+
+    def setUp(self):
+        import tempfile
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lock_path = os.path.join(self.tmpdir.name, "sentinel.lock")
+        self.socket_path = os.path.join(self.tmpdir.name, "sentinel.sock")
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmpdir.cleanup()
+
+    def make_node(self):
+        from cluster import ClusterNode
+        return ClusterNode(self.lock_path, self.socket_path, retry_interval=0.02)
+
+    def test_single_leader_lock(self):
+        """Test que solo un proceso obtiene el cerrojo de monitor"""
+        first, second = self.make_node(), self.make_node()
+        self.assertTrue(first.try_lock())
+        self.assertFalse(second.try_lock())
+        self.async_test(first.stop())
+        self.assertTrue(second.try_lock())
+        self.async_test(second.stop())
+
+    def test_follower_receives_state_and_takes_over(self):
+        """Test difusión de instantáneas, comandos remotos y relevo del líder"""
+        leader, follower = self.make_node(), self.make_node()
+        received, frames, elected = {}, [], []
+
+        async def wait_for(condition):
+            for _ in range(200):
+                if condition():
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+
+        async def scenario():
+            leader.commands["scan"] = lambda: {"devices_found": 3}
+            leader.start()
+            await wait_for(lambda: leader.is_leader)
+            leader.publish_snapshot("devices", {"total": 3})
+
+            follower.on_snapshot = received.__setitem__
+            follower.on_frame = lambda frame, key: frames.append((frame, key))
+
+            async def on_elected():
+                elected.append(True)
+            follower.on_elected = on_elected
+            follower.start()
+            await wait_for(lambda: "devices" in received)
+            leader.publish_frame('{"type":"network_update"}', "network_update")
+            await wait_for(lambda: frames)
+            reply = await follower.request("scan", timeout=2)
+
+            # El líder se detiene: el seguidor toma el relevo
+            await leader.stop()
+            await wait_for(lambda: elected)
+            role = follower.role
+            await follower.stop()
+            return reply, role
+
+        reply, role = self.async_test(scenario())
+        self.assertEqual(received["devices"], {"total": 3})
+        self.assertEqual(frames, [('{"type":"network_update"}', "network_update")])
+        self.assertEqual(reply, {"devices_found": 3})
+        self.assertEqual(role, "leader")
+
+    def test_follower_forwards_reads_to_leader(self):
+        """Test que un seguidor pide al líder el estado que solo vive en memoria"""
+        import app as app_module
+        from unittest.mock import AsyncMock
+        follower = Mock(is_leader=False)
+        follower.request = AsyncMock(side_effect=lambda name, args: {"from": "leader", "read": name})
+        client = TestClient(app)
+        with patch.object(app_module, "cluster", follower):
+            for path, name in (("/api/security/firewall", "firewall_stats"),
+                               ("/api/security/proxy", "proxy_stats"),
+                               ("/api/security/alerts", "alert_stats"),
+                               ("/api/network/ports?host=192.0.2.10", "port_audit")):
+                self.assertEqual(client.get(path).json(), {"from": "leader", "read": name})
+        follower.request.assert_any_call("port_audit", {"host": "192.0.2.10"})
+
+    def test_threat_counters_shared_between_processes(self):
+        """Test que los contadores se leen de la base y ven las escrituras de otra conexión"""
+        from threatlog import ThreatLog
+        path = os.path.join(self.tmpdir.name, "threats.db")
+        reader, writer = ThreatLog(), ThreatLog()
+        reader.open(path)
+        writer.open(path)
+        self.assertEqual(reader.total, 0)
+        writer.add_many([{"type": "syslog", "severity": "high"}] * 3)
+        self.assertEqual(reader.total, 3)
+        self.assertEqual(reader.count(severity="high"), 3)
+        reader.close()
+        writer.close()
+
+    def test_read_only_snapshots_do_not_refresh(self):
+        """Test que un seguidor sirve la instantánea recibida aunque esté vencida"""
+        from cache import SnapshotStore
+        store = SnapshotStore(ttl=0)
+        store.read_only = True
+        store.publish("stats", {"source": "leader"})
+        snapshot = self.async_test(store.get_or_refresh("stats", lambda: {"source": "local"}))
+        self.assertEqual(snapshot.value, {"source": "leader"})
+
+
+def make_middleware_app(limiter=None, compressor=None):
+    """App mínima con los middlewares de rendimiento"""
+    from fastapi import FastAPI
+    from fastapi.responses import Response, StreamingResponse
+    from middleware import CompressionMiddleware, RateLimitMiddleware
+    test_app = FastAPI()
+
+    @test_app.get("/big")
+    async def big():
+        return {"devices": [{"ip": f"10.0.0.{i}", "status": "online"} for i in range(500)]}
+
+    @test_app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @test_app.get("/cors")
+    async def cors():
+        body = json.dumps({"devices": list(range(1000))})
+        return Response(body, media_type="application/json", headers={"Vary": "Origin"})
+
+    @test_app.get("/stream")
+    async def stream():
+        return StreamingResponse((b"linea\n" * 500 for _ in range(5)), media_type="text/plain")
+
+    if compressor is not None:
+        test_app.add_middleware(CompressionMiddleware, compressor=compressor)
+    if limiter is not None:
+        test_app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    return test_app
+
+
+class TestMiddleware(unittest.TestCase):
+    """Tests para limitación de peticiones y compresión"""
+
+    def test_token_bucket(self):
+        """Test ráfaga, recarga y tiempo de espera"""
+        from middleware import RateLimiter
+        limiter = RateLimiter(requests_per_minute=60, burst_size=3, enabled=True)
+        self.assertEqual([limiter.acquire("a", now=0.0) for _ in range(3)], [0.0] * 3)
+        self.assertAlmostEqual(limiter.acquire("a", now=0.0), 1.0)
+        self.assertEqual(limiter.acquire("b", now=0.0), 0.0)
+        self.assertEqual(limiter.acquire("a", now=1.0), 0.0)
+        self.assertEqual(limiter.rejected, 1)
+
+    def test_idle_bucket_eviction(self):
+        """Test que los buckets inactivos (ya llenos) se eliminan"""
+        from middleware import RateLimiter
+        limiter = RateLimiter(requests_per_minute=60, burst_size=3, enabled=True)
+        for i in range(100):
+            limiter.acquire(f"10.0.0.{i}", now=0.0)
+        limiter.acquire("10.0.1.1", now=2.0)
+        self.assertEqual(len(limiter.buckets), 101)
+        self.assertEqual(limiter.evict_idle(now=4.0), 100)
+        self.assertEqual(list(limiter.buckets), ["10.0.1.1"])
+
+    def test_rate_limit_middleware(self):
+        """Test respuesta 429 con Retry-After y bucket propio para la API key"""
+        from middleware import RateLimiter
+        limiter = RateLimiter()
+        limiter.configure({"rate_limiting": {"enabled": True, "requests_per_minute": 6,
+                                             "burst_size": 2}}, {"key": "secreta"})
+        client = TestClient(make_middleware_app(limiter=limiter))
+        codes = [client.get("/small").status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        response = client.get("/small")
+        self.assertEqual(response.headers["retry-after"], "10")
+        self.assertEqual(client.get("/small", headers={"X-API-Key": "secreta"}).status_code, 200)
+
+    def test_api_key_bucket_uses_api_rate_limit(self):
+        """Test que la API key tiene su propio ritmo (integration.api.rate_limit)"""
+        from middleware import API_KEY_CLIENT, RateLimiter
+        limiter = RateLimiter()
+        limiter.configure({"rate_limiting": {"enabled": True, "requests_per_minute": 60,
+                                             "burst_size": 2}},
+                          {"key": "secreta", "rate_limit": 600, "burst_size": 5})
+        self.assertEqual([limiter.acquire(API_KEY_CLIENT, now=0.0) for _ in range(6)],
+                         [0.0] * 5 + [0.1])
+        self.assertEqual(limiter.acquire(API_KEY_CLIENT, now=0.1), 0.0)
+        self.assertEqual([limiter.acquire("10.0.0.1", now=0.0) for _ in range(2)], [0.0] * 2)
+        self.assertAlmostEqual(limiter.acquire("10.0.0.1", now=0.0), 1.0)
+
+    def test_compression_threshold_and_negotiation(self):
+        """Test gzip por encima del umbral, identidad por debajo y streaming"""
+        from middleware import Compressor
+        compressor = Compressor(enabled=True, minimum_size=1024)
+        client = TestClient(make_middleware_app(compressor=compressor))
+
+        big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(big.headers["content-encoding"], "gzip")
+        self.assertLess(int(big.headers["content-length"]), len(big.content))
+        self.assertEqual(len(big.json()["devices"]), 500)
+
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", small.headers)
+
+        refused = client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+        self.assertNotIn("content-encoding", refused.headers)
+
+        streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(streamed.headers["content-encoding"], "gzip")
+        self.assertEqual(streamed.text, "linea\n" * 2500)
+
+    def test_compression_merges_vary(self):
+        """Test que la compresión añade Accept-Encoding al Vary de la aplicación"""
+        from middleware import Compressor
+        client = TestClient(make_middleware_app(compressor=Compressor(enabled=True, minimum_size=1024)))
+        response = client.get("/cors", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Origin, Accept-Encoding")
+        self.assertEqual(len(response.json()["devices"]), 1000)
+
+    def test_compressed_body_cached_per_object(self):
+        """Test que el mismo cuerpo (instantánea en caché) se comprime una sola vez"""
+        import gzip
+        from middleware import Compressor
+        compressor = Compressor(enabled=True, offload_size=4096)
+        body = json.dumps({"devices": list(range(2000))}).encode()
+        loop = asyncio.new_event_loop()
+        try:
+            with patch.object(compressor, "compress", wraps=compressor.compress) as compress:
+                first = loop.run_until_complete(compressor.compress_body("gzip", body))
+                second = loop.run_until_complete(compressor.compress_body("gzip", body))
+                loop.run_until_complete(compressor.compress_body("gzip", bytes(bytearray(body))))
+        finally:
+            loop.close()
+        self.assertIs(first, second)
+        self.assertEqual(compress.call_count, 2)
+        self.assertEqual(gzip.decompress(first), body)
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests para el registro de métricas"""
+
+    def test_exposition_format(self):
+        """Test del texto de exposición para contadores, medidores e histogramas"""
+        from metrics import MetricsRegistry
+        registry = MetricsRegistry()
+        requests = registry.counter("req_total", "Peticiones", ("route",))
+        requests.labels("/api/x").inc()
+        requests.labels("/api/x").inc(2)
+        registry.gauge("depth", "Cola").set_function(lambda: 7)
+        histogram = registry.histogram("latency_seconds", "Latencia", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        self.assertIn("# TYPE req_total counter", text)
+        self.assertIn('req_total{route="/api/x"} 3', text)
+        self.assertIn("depth 7", text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_seconds_count 3", text)
+        self.assertIs(registry.counter("req_total", "Peticiones", ("route",)), requests)
+
+    def test_hot_path_overhead(self):
+        """Test que inc() y observe() cuestan bastante menos de un microsegundo"""
+        import timeit
+        from metrics import MetricsRegistry
+        registry = MetricsRegistry()
+        counter = registry.counter("c_total", "c")
+        histogram = registry.histogram("h_seconds", "h")
+        calls = 200000
+        inc_cost = min(timeit.repeat(counter.inc, number=calls, repeat=3)) / calls
+        observe_cost = min(timeit.repeat(lambda: histogram.observe(0.02), number=calls, repeat=3)) / calls
+        self.assertLess(inc_cost, 1e-6)
+        self.assertLess(observe_cost, 1e-6)
+
+    def test_metrics_and_health_endpoints(self):
+        """Test /metrics con latencia por ruta y uptime real en /health"""
+        client = TestClient(app)
+        health = client.get("/health").json()
+        self.assertIsInstance(health["uptime"], float)
+        self.assertIn("last_scan_age", health)
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('sentinel_http_requests_total{method="GET",route="/health",status="200"}',
+                      response.text)
+        self.assertIn("sentinel_scan_duration_seconds_count", response.text)
+
+
+class TestSerialization(unittest.TestCase):
+    """Tests para la capa de serialización JSON"""
+    
+    def test_dumps_matches_stdlib(self):
+        """Test el codificador rápido produce el mismo JSON que json.dumps"""
+        from serialization import dumps, loads
+        
+        value = {"devices": ({"ip": "10.0.0.1", "latency": 1.5, "mac": None},),
+                 "name": "Cámara", "total": 1}
+        body = dumps(value)
+        self.assertIsInstance(body, bytes)
+        self.assertEqual(loads(body), json.loads(json.dumps(value)))
+        self.assertNotIn(b" ", dumps({"a": [1, 2]}))
+    
+    def test_dumps_unknown_types(self):
+        """Test tipos sin representación JSON se convierten a texto o lista"""
+        from datetime import datetime
+        from serialization import dumps, loads
+        
+        decoded = loads(dumps({"when": datetime(2025, 1, 2, 3, 4, 5), "tags": {"a"}, 1: "x"}))
+        self.assertTrue(decoded["when"].startswith("2025-01-02T03:04:05"))
+        self.assertEqual(decoded["tags"], ["a"])
+        self.assertEqual(decoded["1"], "x")
+    
+    def test_response_passes_encoded_bytes(self):
+        """Test la respuesta no vuelve a codificar cuerpos ya serializados"""
+        from serialization import FastJSONResponse
+        
+        response = FastJSONResponse(b'{"ok":true}')
+        self.assertEqual(response.body, b'{"ok":true}')
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(json.loads(FastJSONResponse({"ok": True}).body), {"ok": True})
+    
+    def test_snapshot_encoded_once_per_version(self):
+        """Test el cuerpo de una instantánea se codifica una vez por versión"""
+        from cache import SnapshotStore
+        
+        store = SnapshotStore()
+        snapshot = store.publish("devices", {"total": 1})
+        body = store.encoded("devices", snapshot)
+        self.assertIs(store.encoded("devices", snapshot), body)
+        
+        newer = store.publish("devices", {"total": 2})
+        self.assertEqual(json.loads(store.encoded("devices", newer)), {"total": 2})
+
+class TestBenchmarks(AsyncTestCase):
+    """Tests para la suite de benchmarks y el comparador"""
+    
+    def test_broadcast_delivers_every_frame(self):
+        """Test cada suscriptor recibe todas las tramas medidas"""
+        from benchmarks.sentinel_bench import bench_broadcast
+        
+        result = self.async_test(bench_broadcast(20, 5))
+        self.assertEqual(result["delivered"], 100)
+        self.assertEqual(result["dropped"], 0)
+        self.assertGreaterEqual(result["p99_ms"], result["p50_ms"])
+    
+    def test_scan_against_fake_network(self):
+        """Test barrido de una red simulada determinista"""
+        from benchmarks.sentinel_bench import bench_scan
+        
+        first = self.async_test(bench_scan("10.0.0.0/26", 16))
+        second = self.async_test(bench_scan("10.0.0.0/26", 16))
+        self.assertEqual(first["hosts"], 62)
+        self.assertEqual(first["online"], second["online"])
+        self.assertGreater(first["hosts_per_second"], 0)
+    
+    def test_compare_flags_regressions_by_direction(self):
+        """Test latencia que sube y rendimiento que baja son regresiones"""
+        from benchmarks.compare import compare
+        
+        baseline = {"results": {"rest": {"requests_per_second": 1000, "overall": {"p99_ms": 10.0, "max_ms": 20}},
+                                "scan": {"hosts": 254, "hosts_per_second": 500}}}
+        current = {"results": {"rest": {"requests_per_second": 700, "overall": {"p99_ms": 9.0, "max_ms": 90}},
+                               "scan": {"hosts": 254, "hosts_per_second": 900}}}
+        rows = {row[0]: row[4] for row in compare(baseline, current, threshold=0.1)}
+        
+        self.assertTrue(rows["rest.requests_per_second"])
+        self.assertFalse(rows["rest.overall.p99_ms"])
+        self.assertFalse(rows["scan.hosts_per_second"])
+        # Métricas ruidosas o sin dirección no se comparan
+        self.assertNotIn("rest.overall.max_ms", rows)
+        self.assertNotIn("scan.hosts", rows)
+
+def run_performance_tests():
+    """Tests de rendimiento: suite de benchmarks en modo reducido"""
+    from benchmarks.sentinel_bench import run_suite
+    
+    print("🔬 Ejecutando tests de rendimiento...")
     
-    # Test velocidad de ping
-    start_time = time.time()
-    result = run_async_test(monitor.ping_host("google.com"))
-    ping_time = time.time() - start_time
+    document = run_async_test(run_suite(quick=True))
+    results = document["results"]
+    rest = results["rest"]
+    print(f"✅ API REST: {rest['requests_per_second']} req/s "
+          f"(p50 {rest['overall']['p50_ms']} ms, p99 {rest['overall']['p99_ms']} ms)")
+    for count, broadcast in results["broadcast"].items():
+        print(f"✅ Difusión a {count} clientes: p99 {broadcast['p99_ms']} ms")
+    print(f"✅ Escaneo: {results['scan']['hosts_per_second']} hosts/s")
+    print(f"✅ Memoria: {results['memory']['growth_per_iteration_bytes']} bytes/ciclo")
     
-    print(f"✅ Ping a Google: {ping_time:.2f}s (latencia: {result.get('latency', 'N/A')})")
+    # Resultados comparables entre commits con benchmarks/compare.py
+    output = Path(__file__).parent / "logs" / "benchmark.json"
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(json.dumps(document, indent=2), encoding="utf-8")
+    print(f"📄 Resultados en {output}")
 
 def run_integration_tests():
     """Tests de integración"""
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Inteligencia de amenazas - Sentinel Dashboard
+Índice de indicadores (IPs, redes CIDR y dominios) con recarga atómica
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEED_DIR = str(Path(__file__).parent / "config" / "threat_intel")
+DEFAULT_UPDATE_INTERVAL = 3600
+DEFAULT_CACHE_SIZE = 65536
+
+# Formato hosts: "0.0.0.0 dominio" bloquea el dominio, no la dirección
+SINKHOLES = frozenset(("0.0.0.0", "127.0.0.1", "::", "::1"))
+DOMAIN_RE = re.compile(r"^[a-z0-9_-]+(?:\.[a-z0-9_-]+)+$")
+IPV4_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+
+# (indicador, fuente)
+Match = Tuple[str, str]
+MISSING = object()
+
+
+def ip_key(value: str) -> Optional[Tuple[int, int]]:
+    """(bits de la familia, entero) de una IP en texto, o None si no es una IP"""
+    try:
+        return 32, int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+    except (OSError, TypeError):
+        pass
+    try:
+        return 128, int.from_bytes(socket.inet_pton(socket.AF_INET6, value), "big")
+    except (OSError, TypeError):
+        return None
+
+
+def parse_indicator(line: str) -> Optional[Tuple[str, object]]:
+    """Interpretar una línea de feed: ("ip", (bits, entero)), ("net", red) o ("domain", nombre)"""
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    fields = line.replace(",", " ").split()
+    value = fields[0]
+    if len(fields) > 1 and value in SINKHOLES:
+        value = fields[1]
+    if "/" in value:
+        try:
+            network = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            return None
+        if network.prefixlen == network.max_prefixlen:
+            return "ip", (network.max_prefixlen, int(network.network_address))
+        return "net", network
+    key = ip_key(value)
+    if key is not None:
+        return "ip", key
+    name = value.lower().strip(".")
+    if name.startswith("*."):
+        name = name[2:]
+    if DOMAIN_RE.match(name):
+        return "domain", name
+    return None
+
+
+class IndicatorSet:
+    """Instantánea inmutable de indicadores
+
+    Las IPs exactas y los dominios van en tablas hash; las redes, en una
+    tabla por longitud de prefijo, que se recorren de la más específica a la
+    más general. Una consulta cuesta como mucho una búsqueda por longitud de
+    prefijo presente (IPs) o por etiqueta (dominios).
+    """
+
+    def __init__(self, sources: Sequence[str] = (), cache_size: int = DEFAULT_CACHE_SIZE):
+        self.sources = list(sources)
+        self.ips: Dict[int, Dict[int, int]] = {32: {}, 128: {}}
+        self.networks: Dict[int, Dict[int, Dict[int, int]]] = {32: {}, 128: {}}
+        self.domains: Dict[str, int] = {}
+        self.cache_size = cache_size
+        self._cache: Dict[str, Optional[Match]] = {}
+        self._lengths: Dict[int, List[Tuple[int, Dict[int, int]]]] = {32: [], 128: []}
+
+    def add(self, kind: str, value, source: int):
+        """Añadir un indicador ya interpretado (solo durante la construcción)"""
+        if kind == "ip":
+            self.ips[value[0]].setdefault(value[1], source)
+        elif kind == "net":
+            bits = value.max_prefixlen
+            table = self.networks[bits].setdefault(value.prefixlen, {})
+            table.setdefault(int(value.network_address) >> (bits - value.prefixlen), source)
+        else:
+            self.domains.setdefault(value, source)
+
+    def freeze(self) -> "IndicatorSet":
+        """Fijar el orden de búsqueda de las redes (de /32 hacia /0)"""
+        for bits, tables in self.networks.items():
+            self._lengths[bits] = [(bits - length, tables[length])
+                                   for length in sorted(tables, reverse=True)]
+        return self
+
+    @classmethod
+    def load(cls, feeds: Dict[str, str], cache_size: int = DEFAULT_CACHE_SIZE) -> "IndicatorSet":
+        """Construir el índice desde los archivos de feed {fuente: ruta}"""
+        indicators = cls(list(feeds), cache_size)
+        for source, (name, path) in enumerate(feeds.items()):
+            invalid = 0
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    # Vía rápida: la mayoría de las líneas son una IP sola
+                    key = ip_key(line.strip())
+                    if key is not None:
+                        indicators.ips[key[0]].setdefault(key[1], source)
+                        continue
+                    parsed = parse_indicator(line)
+                    if parsed is None:
+                        if line.split("#", 1)[0].strip():
+                            invalid += 1
+                        continue
+                    indicators.add(parsed[0], parsed[1], source)
+            if invalid:
+                logger.warning(f"Feed {name}: {invalid} líneas no reconocidas en {path}")
+        return indicators.freeze()
+
+    def __len__(self) -> int:
+        stats = self.stats()
+        return stats["ips"] + stats["networks"] + stats["domains"]
+
+    def stats(self) -> Dict:
+        return {
+            "ips": sum(len(table) for table in self.ips.values()),
+            "networks": sum(len(t) for tables in self.networks.values() for t in tables.values()),
+            "domains": len(self.domains),
+            "sources": self.sources,
+        }
+
+    def _match_ip(self, bits: int, number: int, value: str) -> Optional[Match]:
+        source = self.ips[bits].get(number)
+        if source is not None:
+            return value, self.sources[source]
+        for shift, table in self._lengths[bits]:
+            source = table.get(number >> shift)
+            if source is not None:
+                family = socket.AF_INET if bits == 32 else socket.AF_INET6
+                network = socket.inet_ntop(family, (number >> shift << shift).to_bytes(bits // 8, "big"))
+                return f"{network}/{bits - shift}", self.sources[source]
+        return None
+
+    def _match_domain(self, name: str) -> Optional[Match]:
+        domains = self.domains
+        name = name.lower().rstrip(".")
+        while True:
+            source = domains.get(name)
+            if source is not None:
+                return name, self.sources[source]
+            dot = name.find(".")
+            if dot < 0:
+                return None
+            name = name[dot + 1:]
+
+    def match(self, value: Optional[str]) -> Optional[Match]:
+        """Indicador que cubre una IP o un dominio (o cualquiera de sus padres)"""
+        if not value:
+            return None
+        found = self._cache.get(value, MISSING)
+        if found is not MISSING:
+            return found
+        key = ip_key(value)
+        found = self._match_ip(key[0], key[1], value) if key is not None else self._match_domain(value)
+        if len(self._cache) >= self.cache_size:
+            # Las fuentes se repiten mucho: basta con vaciar la caché al llenarse
+            self._cache.clear()
+        self._cache[value] = found
+        return found
+
+
+class ThreatIntel:
+    """Feeds locales de indicadores con recarga periódica
+
+    La recarga construye un índice nuevo aparte y lo publica con una sola
+    asignación: las consultas en curso siguen con la instantánea anterior y
+    nunca esperan a la recarga.
+    """
+
+    def __init__(self, feeds: Dict[str, str], update_interval: float = DEFAULT_UPDATE_INTERVAL,
+                 severity: str = "high", cache_size: int = DEFAULT_CACHE_SIZE):
+        self.feeds = dict(feeds)
+        self.update_interval = update_interval
+        self.severity = severity
+        self.cache_size = cache_size
+        self.indicators = IndicatorSet().freeze()
+        self.loaded_at = 0.0
+        self._signature: Optional[Tuple] = None
+
+    @classmethod
+    def from_config(cls, intel_config: Dict) -> "ThreatIntel":
+        """Crear el índice a partir de `security.threat_intelligence`
+
+        Cada fuente se lee de `<feed_dir>/<fuente>.txt` salvo que `feeds` indique
+        otra ruta; las fuentes sin archivo se ignoran.
+        """
+        feed_dir = intel_config.get("feed_dir", DEFAULT_FEED_DIR)
+        paths = intel_config.get("feeds", {})
+        feeds = {source: paths.get(source, os.path.join(feed_dir, f"{source}.txt"))
+                 for source in intel_config.get("sources", [])}
+        feeds.update((source, path) for source, path in paths.items() if source not in feeds)
+        return cls(
+            feeds,
+            update_interval=intel_config.get("update_interval", DEFAULT_UPDATE_INTERVAL),
+            severity=intel_config.get("severity", "high"),
+            cache_size=intel_config.get("cache_size", DEFAULT_CACHE_SIZE),
+        )
+
+    def _available(self) -> Dict[str, str]:
+        return {source: path for source, path in self.feeds.items() if os.path.exists(path)}
+
+    def reload(self, force: bool = False) -> bool:
+        """Reconstruir el índice si algún feed cambió; devuelve True si se publicó uno nuevo"""
+        feeds = self._available()
+        signature = tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                          for path in feeds.values())
+        if not force and signature == self._signature:
+            return False
+        started = time.time()
+        indicators = IndicatorSet.load(feeds, self.cache_size)
+        self.indicators = indicators
+        self._signature = signature
+        self.loaded_at = time.time()
+        logger.info(f"Inteligencia de amenazas: {len(indicators)} indicadores de "
+                    f"{', '.join(feeds) or 'ningún feed'} en {self.loaded_at - started:.2f}s")
+        return True
+
+    def match(self, value: Optional[str]) -> Optional[Match]:
+        return self.indicators.match(value)
+
+    def match_many(self, values: Iterable[Optional[str]]) -> List[Optional[Match]]:
+        match = self.indicators.match
+        return [match(value) for value in values]
+
+    def threat(self, value: str, found: Match, context: str,
+               timestamp: Optional[float] = None) -> Dict:
+        """Amenaza para un valor que coincide con un indicador"""
+        indicator, source = found
+        return {
+            "type": "threat_intel",
+            "severity": self.severity,
+            "source_ip": value if ip_key(value) is not None else None,
+            "description": f"{context}: {value} figura en {source} ({indicator})",
+            "timestamp": time.time() if timestamp is None else timestamp,
+        }
+
+    def scan_text(self, values: Iterable[Optional[str]], text: str, context: str,
+                  timestamp: Optional[float] = None) -> List[Dict]:
+        """Amenazas para los valores dados y las IPv4 que aparezcan en `text`"""
+        match = self.indicators.match
+        threats = []
+        checked = set()
+        for value in list(values) + IPV4_RE.findall(text):
+            if value in checked:
+                continue
+            checked.add(value)
+            found = match(value)
+            if found is not None:
+                threats.append(self.threat(value, found, context, timestamp))
+        return threats
+
+    async def run(self):
+        """Tarea de fondo: recargar los feeds cada update_interval"""
+        while True:
+            try:
+                await asyncio.to_thread(self.reload)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error recargando los feeds de amenazas: {e}")
+            await asyncio.sleep(self.update_interval)
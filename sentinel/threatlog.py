@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Registro de amenazas - Sentinel Dashboard
+Eventos persistentes indexados con contadores incrementales y paginación por cursor
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+DEFAULT_PRUNE_BATCH = 5000
+DEFAULT_EXPORT_BATCH = 5000
+
+FILTER_COLUMNS = ("severity", "type", "source_ip")
+
+
+def parse_timestamp(value) -> float:
+    """Aceptar epoch o ISO 8601 y devolver epoch en segundos"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+class ThreatLog(SQLiteStore):
+    """Registro de amenazas con índices por tiempo, severidad, tipo e IP"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS threat_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            source_ip TEXT,
+            description TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_threat_ts ON threat_events (ts)",
+        "CREATE INDEX IF NOT EXISTS idx_threat_severity ON threat_events (severity, id)",
+        "CREATE INDEX IF NOT EXISTS idx_threat_type ON threat_events (type, id)",
+        "CREATE INDEX IF NOT EXISTS idx_threat_source ON threat_events (source_ip, id)",
+        """CREATE TABLE IF NOT EXISTS threat_counters (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID""",
+    )
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        return {
+            "id": row[0],
+            "timestamp": datetime.fromtimestamp(row[1]).isoformat(),
+            "type": row[2],
+            "severity": row[3],
+            "source_ip": row[4],
+            "description": row[5],
+        }
+
+    def _apply_counters(self, delta: Dict[str, Counter], sign: int):
+        """Actualizar los contadores persistidos (dentro de la transacción)"""
+        rows = [(dimension, key, sign * count)
+                for dimension, counter in delta.items() for key, count in counter.items()]
+        self.conn.executemany(
+            """INSERT INTO threat_counters (dimension, key, count) VALUES (?, ?, ?)
+               ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count""",
+            rows,
+        )
+
+    def add_many(self, threats: Iterable[Dict]) -> int:
+        """Insertar amenazas en lote y actualizar los contadores"""
+        rows = []
+        delta = {"total": Counter(), "severity": Counter(), "type": Counter()}
+        for threat in threats:
+            ts = parse_timestamp(threat["timestamp"]) if threat.get("timestamp") else time.time()
+            rows.append((ts, threat["type"], threat["severity"],
+                         threat.get("source_ip"), threat.get("description")))
+            delta["total"]["all"] += 1
+            delta["severity"][threat["severity"]] += 1
+            delta["type"][threat["type"]] += 1
+        if not rows:
+            return 0
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    """INSERT INTO threat_events (ts, type, severity, source_ip, description)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    rows,
+                )
+                self._apply_counters(delta, 1)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def add(self, threat: Dict) -> int:
+        """Insertar una amenaza"""
+        return self.add_many([threat])
+
+    def _counter(self, dimension: str, key: str) -> int:
+        """Leer un contador de la base: ve también lo que escriben otros procesos"""
+        rows = self.query(
+            "SELECT count FROM threat_counters WHERE dimension = ? AND key = ?", (dimension, key)
+        )
+        return rows[0][0] if rows else 0
+
+    @property
+    def total(self) -> int:
+        return self._counter("total", "all")
+
+    def count(self, severity: Optional[str] = None, type: Optional[str] = None) -> int:
+        """Contador por severidad o tipo (búsqueda por clave primaria)"""
+        if severity is not None:
+            return self._counter("severity", severity)
+        if type is not None:
+            return self._counter("type", type)
+        return self.total
+
+    def recent(self, limit: int = 100) -> List[Dict]:
+        """Últimas amenazas registradas, de la más antigua a la más reciente"""
+        rows = self.query(
+            """SELECT id, ts, type, severity, source_ip, description
+               FROM threat_events ORDER BY id DESC LIMIT ?""",
+            (limit,),
+        )
+        return [self._row_to_dict(row) for row in reversed(rows)]
+
+    def search(
+        self,
+        severity: Optional[str] = None,
+        type: Optional[str] = None,
+        source_ip: Optional[str] = None,
+        since=None,
+        cursor: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Dict:
+        """Consulta paginada por cursor, de la más reciente a la más antigua"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        for column, value in zip(FILTER_COLUMNS, (severity, type, source_ip)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+
+        # Los detectores pueden registrar marcas de tiempo del inicio del
+        # intervalo: el id no sigue al ts, así que se filtra por ts
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(parse_timestamp(since))
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.query(
+            f"""SELECT id, ts, type, severity, source_ip, description
+                FROM threat_events {where} ORDER BY id DESC LIMIT ?""",
+            params + [limit + 1],
+        )
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return {
+            "items": [self._row_to_dict(row) for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }
+
+    def iter_rows(
+        self,
+        since=None,
+        until=None,
+        severity: Optional[str] = None,
+        type: Optional[str] = None,
+        source_ip: Optional[str] = None,
+        batch_size: int = DEFAULT_EXPORT_BATCH,
+    ) -> Iterator[Tuple]:
+        """Filas (id, ts, tipo, severidad, IP, descripción) en orden cronológico
+
+        Recorre el rango por lotes con una clave (ts, id) creciente sobre el
+        índice de tiempo: la memoria no depende del tamaño del rango y el lock
+        solo se retiene durante cada consulta.
+        """
+        clauses, params = ["(ts, id) > (?, ?)"], []
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(parse_timestamp(until))
+        for column, value in zip(FILTER_COLUMNS, (severity, type, source_ip)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+
+        where = " AND ".join(clauses)
+        last = (parse_timestamp(since), 0) if since is not None else (float("-inf"), 0)
+        while True:
+            rows = self.query(
+                f"""SELECT id, ts, type, severity, source_ip, description
+                    FROM threat_events WHERE {where} ORDER BY ts, id LIMIT ?""",
+                list(last) + params + [batch_size],
+            )
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def prune(self, retention_days: float, batch_size: int = DEFAULT_PRUNE_BATCH) -> int:
+        """Eliminar un lote de eventos más antiguos que la retención"""
+        cutoff = time.time() - retention_days * 86400
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT id, type, severity FROM threat_events
+                   WHERE ts < ? ORDER BY ts LIMIT ?""",
+                (cutoff, batch_size),
+            ).fetchall()
+            if not rows:
+                return 0
+            delta = {"total": Counter(), "severity": Counter(), "type": Counter()}
+            for _, type_, severity in rows:
+                delta["total"]["all"] += 1
+                delta["severity"][severity] += 1
+                delta["type"][type_] += 1
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "DELETE FROM threat_events WHERE id = ?", [(row[0],) for row in rows]
+                )
+                self._apply_counters(delta, -1)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)